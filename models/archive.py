@@ -0,0 +1,270 @@
+import os
+import sys
+import gzip
+import time
+import struct
+import tarfile
+import logging
+import tempfile
+import contextlib
+from models.parser import DiagramRecord
+from typing import Union, List, Iterable, Iterator, Set, Tuple
+from enum import Enum
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+
+# <--------------------------- BuildArchive ---------------------------->
+# <--------------------------- BuildArchive ---------------------------->
+
+class BuildArchive:
+    """
+    Writes a tree straight into a tar or zip archive as its records are parsed, without
+    creating anything on disk. Headers are written as the records arrive, so memory only
+    grows with the names in the open folders, which are kept to skip repeated ones. The
+    central directory of a zip is spooled to a temporary file once it gets large.
+    """
+
+    class ArchiveFormats(Enum):
+        TAR = 'tar'
+        TAR_GZ = 'tar.gz'
+        TAR_ZST = 'tar.zst'
+        ZIP = 'zip'
+
+    Formats = ArchiveFormats
+
+    EXTENSIONS = {'.tar': Formats.TAR, '.tar.gz': Formats.TAR_GZ, '.tgz': Formats.TAR_GZ, '.tar.zst': Formats.TAR_ZST, '.tzst': Formats.TAR_ZST, '.zip': Formats.ZIP}
+    FOLDER_MODE = 0o755
+    FILE_MODE = 0o644
+    # The default of the gzip tool; headers compress well without the slower levels.
+    GZIP_LEVEL = 6
+    # Bytes collected before a write to the output or its compressor.
+    CHUNK_SIZE = 1024 * 1024
+    # Size of the zip central directory kept in memory before it is spooled to disk.
+    SPOOL_SIZE = 8 * 1024 * 1024
+
+    # ustar header fields after the name: mode, uid, gid, size, mtime, checksum, type,
+    # link name, magic, version, user, group, device numbers and the name prefix.
+    TAR_HEADER = struct.Struct('100s8s8s8s12s12s8s1s100s6s2s32s32s8s8s155s12x')
+    TAR_NAME_SIZE = 100
+    TAR_PREFIX_SIZE = 155
+    TAR_CHECKSUM_OFFSET = 148
+    TAR_PREFIX_OFFSET = 345
+
+    ZIP_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+    ZIP_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+    ZIP64_EXTRA = struct.Struct('<HHQ')
+    ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+    ZIP64_LOCATOR = struct.Struct('<IIQI')
+    ZIP_END = struct.Struct('<IHHHHIIH')
+    ZIP_UTF8_FLAG = 0x800
+    ZIP_VERSION = 20
+    ZIP64_VERSION = 45
+    ZIP_MADE_BY_UNIX = 3 << 8
+    ZIP_FOLDER_ATTRIBUTE = 0x10
+    ZIP_LIMIT = 0xFFFFFFFF
+    ZIP_COUNT_LIMIT = 0xFFFF
+
+    @staticmethod
+    def get_format(path: str, format: Union[None, str] = None) -> 'BuildArchive.Formats':
+        """
+        Returns the requested format, or the one of the file extension. Stdout is a
+        plain tar unless told otherwise.
+        """
+        if format:
+            return BuildArchive.Formats(format)
+        if path == '-':
+            return BuildArchive.Formats.TAR
+        name = path.lower()
+        for extension, extension_format in BuildArchive.EXTENSIONS.items():
+            if name.endswith(extension):
+                return extension_format
+        raise ValueError(f"Can't tell the archive format of '{path}'. Use one of the extensions {', '.join(BuildArchive.EXTENSIONS)} or '--archive-format'.")
+
+    @staticmethod
+    def write(records: Iterable[DiagramRecord], path: str, format: 'BuildArchive.Formats') -> int:
+        """
+        Writes the records into an archive at a path, or on stdout for '-', and returns
+        the number of entries. A file is written aside and renamed into place.
+        """
+        if format == BuildArchive.Formats.TAR_ZST and zstandard is None:
+            raise ValueError(f"The '{format.value}' format needs the 'zstandard' package.")
+        if path == '-':
+            if sys.stdout.isatty():
+                raise ValueError("Refusing to write an archive to a terminal. Redirect stdout or give a file path.")
+            count = BuildArchive.write_stream(records, sys.stdout.buffer, format)
+            sys.stdout.buffer.flush()
+            return count
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                count = BuildArchive.write_stream(records, file, format)
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+        logging.info(f"Wrote {count} entries to {path}")
+        return count
+
+    @staticmethod
+    def write_stream(records: Iterable[DiagramRecord], stream, format: 'BuildArchive.Formats') -> int:
+        mtime = int(time.time())
+        entries = BuildArchive.unique(records)
+        if format == BuildArchive.Formats.ZIP:
+            return BuildArchive.write_zip(entries, stream, mtime)
+        with BuildArchive.compress(stream, format) as output:
+            return BuildArchive.write_tar(entries, output, mtime)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def compress(stream, format: 'BuildArchive.Formats'):
+        if format == BuildArchive.Formats.TAR_GZ:
+            with gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=BuildArchive.GZIP_LEVEL, mtime=0) as output:
+                yield output
+        elif format == BuildArchive.Formats.TAR_ZST:
+            with zstandard.ZstdCompressor().stream_writer(stream, closefd=False) as output:
+                yield output
+        else:
+            yield stream
+
+    @staticmethod
+    def unique(records: Iterable[DiagramRecord]) -> Iterator[Tuple[str, bool]]:
+        """
+        Yields the archive name and folder flag of every record, leaving out names
+        repeated in the same folder listing, which a build would create only once. The
+        entries of a folder listed twice are only compared within each listing, since
+        comparing across them means keeping every path; extractors overwrite the repeats.
+        """
+        # Names of the children of every open folder, the destination first.
+        siblings: List[Set[str]] = [set()]
+        for record in records:
+            del siblings[record.depth + 1:]
+            if record.name in siblings[-1]:
+                if record.is_folder:
+                    siblings.append(set())
+                continue
+            siblings[-1].add(record.name)
+            if record.is_folder:
+                siblings.append(set())
+            name = record.full_path if os.sep == '/' else record.full_path.replace(os.sep, '/')
+            yield name, record.is_folder
+
+    @staticmethod
+    def get_tar_templates(mtime: int) -> Tuple[bytes, bytes]:
+        """
+        Returns empty folder and file headers with the checksum field blank, to be
+        completed with a name.
+        """
+        templates = []
+        for mode, type in [(BuildArchive.FOLDER_MODE, tarfile.DIRTYPE), (BuildArchive.FILE_MODE, tarfile.REGTYPE)]:
+            templates.append(BuildArchive.TAR_HEADER.pack(
+                b'', b'%07o\0' % mode, b'0000000\0', b'0000000\0', b'00000000000\0', b'%011o\0' % mtime, b' ' * 8, type,
+                b'', tarfile.POSIX_MAGIC[:6], tarfile.POSIX_MAGIC[6:], b'', b'', b'0000000\0', b'0000000\0', b''))
+        return templates[0], templates[1]
+
+    @staticmethod
+    def get_tar_header(template: bytes, name: bytes) -> Union[None, bytes]:
+        """
+        Fills a ustar header template with a name, split into a prefix at a slash when
+        it is long. Returns None when the name doesn't fit.
+        """
+        prefix = b''
+        if len(name) > BuildArchive.TAR_NAME_SIZE:
+            split = name.rfind(b'/', 0, min(len(name) - 1, BuildArchive.TAR_PREFIX_SIZE + 1))
+            if split <= 0 or len(name) - split - 1 > BuildArchive.TAR_NAME_SIZE:
+                return None
+            prefix, name = name[:split], name[split + 1:]
+        header = bytearray(template)
+        header[:len(name)] = name
+        header[BuildArchive.TAR_PREFIX_OFFSET:BuildArchive.TAR_PREFIX_OFFSET + len(prefix)] = prefix
+        checksum = sum(template) + sum(name) + sum(prefix)
+        header[BuildArchive.TAR_CHECKSUM_OFFSET:BuildArchive.TAR_CHECKSUM_OFFSET + 7] = b'%06o\0' % checksum
+        return bytes(header)
+
+    @staticmethod
+    def write_tar(entries: Iterable[Tuple[str, bool]], stream, mtime: int) -> int:
+        """
+        Writes one ustar header per entry, or a pax header for names ustar can't hold,
+        then the end of archive padded to a whole record.
+        """
+        folder_template, file_template = BuildArchive.get_tar_templates(mtime)
+        buffer = bytearray()
+        size = 0
+        count = 0
+        for name, is_folder in entries:
+            encoded = name.encode('utf-8', 'surrogateescape') + (b'/' if is_folder else b'')
+            header = None
+            if encoded.isascii():
+                header = BuildArchive.get_tar_header(folder_template if is_folder else file_template, encoded)
+            if header is None:
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.DIRTYPE if is_folder else tarfile.REGTYPE
+                info.mode = BuildArchive.FOLDER_MODE if is_folder else BuildArchive.FILE_MODE
+                info.mtime = mtime
+                header = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            buffer += header
+            count += 1
+            if len(buffer) >= BuildArchive.CHUNK_SIZE:
+                size += len(buffer)
+                stream.write(bytes(buffer))
+                buffer.clear()
+        size += len(buffer) + 2 * tarfile.BLOCKSIZE
+        buffer += tarfile.NUL * (2 * tarfile.BLOCKSIZE + -size % tarfile.RECORDSIZE)
+        stream.write(bytes(buffer))
+        return count
+
+    @staticmethod
+    def get_dos_time(mtime: int) -> Tuple[int, int]:
+        local = time.localtime(mtime)
+        return local.tm_hour << 11 | local.tm_min << 5 | local.tm_sec // 2, max(local.tm_year - 1980, 0) << 9 | local.tm_mon << 5 | local.tm_mday
+
+    @staticmethod
+    def write_zip(entries: Iterable[Tuple[str, bool]], stream, mtime: int) -> int:
+        """
+        Writes a stored, empty local header per entry and then the central directory,
+        with zip64 records once the offsets or the entry count outgrow the classic ones.
+        """
+        dos_time, dos_date = BuildArchive.get_dos_time(mtime)
+        buffer = bytearray()
+        offset = 0
+        count = 0
+        with tempfile.SpooledTemporaryFile(max_size=BuildArchive.SPOOL_SIZE) as directory:
+            for name, is_folder in entries:
+                encoded = name.encode('utf-8', 'surrogateescape') + (b'/' if is_folder else b'')
+                is_zip64 = offset >= BuildArchive.ZIP_LIMIT
+                version = BuildArchive.ZIP64_VERSION if is_zip64 else BuildArchive.ZIP_VERSION
+                buffer += BuildArchive.ZIP_LOCAL_HEADER.pack(0x04034b50, version, BuildArchive.ZIP_UTF8_FLAG, 0, dos_time, dos_date, 0, 0, 0, len(encoded), 0)
+                buffer += encoded
+                extra = BuildArchive.ZIP64_EXTRA.pack(0x0001, 8, offset) if is_zip64 else b''
+                mode = (0o040000 | BuildArchive.FOLDER_MODE) if is_folder else (0o100000 | BuildArchive.FILE_MODE)
+                attributes = mode << 16 | (BuildArchive.ZIP_FOLDER_ATTRIBUTE if is_folder else 0)
+                directory.write(BuildArchive.ZIP_CENTRAL_HEADER.pack(
+                    0x02014b50, BuildArchive.ZIP_MADE_BY_UNIX | version, version, BuildArchive.ZIP_UTF8_FLAG, 0, dos_time, dos_date,
+                    0, 0, 0, len(encoded), len(extra), 0, 0, 0, attributes, min(offset, BuildArchive.ZIP_LIMIT)))
+                directory.write(encoded + extra)
+                offset += BuildArchive.ZIP_LOCAL_HEADER.size + len(encoded)
+                count += 1
+                if len(buffer) >= BuildArchive.CHUNK_SIZE:
+                    stream.write(bytes(buffer))
+                    buffer.clear()
+            stream.write(bytes(buffer))
+            buffer.clear()
+            directory_size = directory.tell()
+            directory.seek(0)
+            while True:
+                chunk = directory.read(BuildArchive.CHUNK_SIZE)
+                if not chunk:
+                    break
+                stream.write(chunk)
+        if count >= BuildArchive.ZIP_COUNT_LIMIT or offset >= BuildArchive.ZIP_LIMIT or directory_size >= BuildArchive.ZIP_LIMIT:
+            end_offset = offset + directory_size
+            buffer += BuildArchive.ZIP64_END.pack(0x06064b50, BuildArchive.ZIP64_END.size - 12, BuildArchive.ZIP_MADE_BY_UNIX | BuildArchive.ZIP64_VERSION, BuildArchive.ZIP64_VERSION, 0, 0, count, count, directory_size, offset)
+            buffer += BuildArchive.ZIP64_LOCATOR.pack(0x07064b50, 0, end_offset, 1)
+        buffer += BuildArchive.ZIP_END.pack(0x06054b50, 0, 0, min(count, BuildArchive.ZIP_COUNT_LIMIT), min(count, BuildArchive.ZIP_COUNT_LIMIT), min(directory_size, BuildArchive.ZIP_LIMIT), min(offset, BuildArchive.ZIP_LIMIT), 0)
+        stream.write(bytes(buffer))
+        return count
@@ -0,0 +1,293 @@
+import os
+import sys
+import mmap
+import array
+import struct
+import logging
+from models.parser import DiagramRecord
+from models.tree2 import ContainerNode, Node, StructNode, Tree
+from typing import Union, List, Iterable, Iterator, Callable, Dict, Tuple, Any
+
+
+
+# <--------------------------- BinaryTree ---------------------------->
+# <--------------------------- BinaryTree ---------------------------->
+
+class BinaryTree:
+    """
+    Compact on-disk tree format that can be memory-mapped and read in place.
+
+    Layout (little endian):
+        header        magic, version, node count, name count, name bytes length
+        name_offsets  uint32[name count + 1], into the name bytes
+        node_names    uint32[node count], index into the interned names
+        parents       int32[node count], -1 for the root
+        child_offsets uint32[node count + 1], children of i are [offsets[i], offsets[i + 1])
+        kinds         uint8[node count], 1 for folders
+        names         utf-8 bytes
+    Nodes are stored breadth first, so the children of a node are contiguous.
+    """
+
+    MAGIC = b'FGTB'
+    VERSION = 1
+    FILE_EXTENSION = '.fgt'
+    HEADER = struct.Struct('<4sHHIIQ')
+    KIND_FILE = 0
+    KIND_FOLDER = 1
+
+    @staticmethod
+    def is_binary(path: str) -> bool:
+        """
+        Checks whether a file starts with the binary tree magic.
+        """
+        try:
+            with open(path, 'rb') as file:
+                return file.read(len(BinaryTree.MAGIC)) == BinaryTree.MAGIC
+        except OSError:
+            return False
+
+    @staticmethod
+    def write(path: str, root_name: str, root: Any, get_children: Callable[[Any], Iterable[Tuple[str, bool, Any]]]) -> int:
+        """
+        Writes the tree below `root`, where `get_children` yields (name, is folder, handle)
+        for a handle. Returns the number of nodes written.
+        """
+        interned: Dict[str, int] = {}
+        name_offsets = array.array('I', [0])
+        name_bytes = bytearray()
+        node_names = array.array('I')
+        parents = array.array('i')
+        child_offsets = array.array('I')
+        kinds = bytearray()
+
+        def add_node(name: str, is_folder: bool, parent: int):
+            name_id = interned.get(name)
+            if name_id is None:
+                name_id = interned[name] = len(interned)
+                name_bytes.extend(name.encode('utf-8'))
+                name_offsets.append(len(name_bytes))
+            node_names.append(name_id)
+            parents.append(parent)
+            kinds.append(BinaryTree.KIND_FOLDER if is_folder else BinaryTree.KIND_FILE)
+
+        handles = [root]
+        add_node(root_name, True, -1)
+        index = 0
+        while index < len(handles):
+            child_offsets.append(len(handles))
+            if kinds[index] == BinaryTree.KIND_FOLDER:
+                for name, is_folder, handle in get_children(handles[index]):
+                    add_node(name, is_folder, index)
+                    handles.append(handle if is_folder else None)
+            # Handles are only needed until their children are queued.
+            handles[index] = None
+            index += 1
+        child_offsets.append(len(handles))
+
+        arrays = [name_offsets, node_names, parents, child_offsets]
+        if sys.byteorder != 'little':
+            for values in arrays:
+                values.byteswap()
+        header = BinaryTree.HEADER.pack(BinaryTree.MAGIC, BinaryTree.VERSION, 0, len(handles), len(interned), len(name_bytes))
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(header)
+            for values in arrays:
+                file.write(values.tobytes())
+            file.write(kinds)
+            file.write(name_bytes)
+        os.replace(temp_path, path)
+        logging.info(f"Wrote {len(handles)} nodes to binary tree: {path}")
+        return len(handles)
+
+    @staticmethod
+    def save_tree(tree: Tree, path: str) -> int:
+        """
+        Writes a tree to a binary tree file.
+        """
+        get_children = lambda node: ((child.name, child.is_container(), child) for child in node.children)
+        return BinaryTree.write(path, tree.base_dir.name, tree.base_dir, get_children)
+
+    @staticmethod
+    def save_records(records: Iterable[DiagramRecord], root_name: str, path: str) -> int:
+        """
+        Writes parsed diagram records to a binary tree file without building tree nodes.
+        """
+        root: List[Tuple[str, bool, Any]] = []
+        stack = [root]
+        for record in records:
+            del stack[record.depth + 1:]
+            children = [] if record.is_folder else None
+            stack[-1].append((record.name, record.is_folder, children))
+            if record.is_folder:
+                stack.append(children)
+        return BinaryTree.write(path, root_name, root, lambda children: children)
+
+    @staticmethod
+    def open(path: str) -> 'BinaryTreeFile':
+        """
+        Memory-maps a binary tree file.
+        """
+        return BinaryTreeFile(path)
+
+    @staticmethod
+    def records(path: str) -> Iterator[DiagramRecord]:
+        """
+        Yields the entries of a binary tree file in diagram order.
+        """
+        file = BinaryTree.open(path)
+        try:
+            yield from file.records()
+        finally:
+            file.close()
+
+    @staticmethod
+    def load(path: str) -> Tree:
+        """
+        Opens a binary tree file as a tree whose nodes are created on first access.
+        """
+        return BinaryTree.open(path).tree()
+
+
+# <--------------------------- BinaryTreeFile ---------------------------->
+# <--------------------------- BinaryTreeFile ---------------------------->
+
+class BinaryTreeFile:
+    """
+    Read-only view over a memory-mapped binary tree file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < BinaryTree.HEADER.size:
+            raise ValueError(f"'{path}' is not a binary tree file.")
+        magic, version, _, self.node_count, name_count, name_length = BinaryTree.HEADER.unpack_from(self.buffer, 0)
+        if magic != BinaryTree.MAGIC:
+            raise ValueError(f"'{path}' is not a binary tree file.")
+        if version != BinaryTree.VERSION:
+            raise ValueError(f"'{path}' uses binary tree version {version}, expected {BinaryTree.VERSION}.")
+        view = memoryview(self.buffer)
+        position = BinaryTree.HEADER.size
+        self.name_offsets, position = BinaryTreeFile.read_array(view, position, 'I', name_count + 1)
+        self.node_names, position = BinaryTreeFile.read_array(view, position, 'I', self.node_count)
+        self.parents, position = BinaryTreeFile.read_array(view, position, 'i', self.node_count)
+        self.child_offsets, position = BinaryTreeFile.read_array(view, position, 'I', self.node_count + 1)
+        self.kinds = view[position:position + self.node_count]
+        position += self.node_count
+        self.names = view[position:position + name_length]
+        if position + name_length > len(self.buffer):
+            raise ValueError(f"'{path}' is truncated.")
+        self.name_cache: Dict[int, str] = {}
+
+    @staticmethod
+    def read_array(view: memoryview, position: int, typecode: str, count: int) -> Tuple[Union[memoryview, array.array], int]:
+        """
+        Returns a zero-copy view of an array in the file and the position after it.
+        """
+        end = position + count * 4
+        if end > len(view):
+            raise ValueError("Binary tree file is truncated.")
+        if sys.byteorder == 'little':
+            return view[position:end].cast(typecode), end
+        values = array.array(typecode, view[position:end])
+        values.byteswap()
+        return values, end
+
+    def name(self, index: int) -> str:
+        """
+        Returns the name of a node, decoding every interned name once.
+        """
+        name_id = self.node_names[index]
+        name = self.name_cache.get(name_id)
+        if name is None:
+            name = self.name_cache[name_id] = str(self.names[self.name_offsets[name_id]:self.name_offsets[name_id + 1]], 'utf-8')
+        return name
+
+    def is_folder(self, index: int) -> bool:
+        return self.kinds[index] == BinaryTree.KIND_FOLDER
+
+    def parent(self, index: int) -> int:
+        return self.parents[index]
+
+    def children(self, index: int) -> range:
+        return range(self.child_offsets[index], self.child_offsets[index + 1])
+
+    def records(self) -> Iterator[DiagramRecord]:
+        """
+        Yields the entries below the root in diagram order, without creating nodes.
+        """
+        stack = [(self.children(0), '')]
+        while stack:
+            children, parent_path = stack[-1]
+            if not children:
+                stack.pop()
+                continue
+            index = children[0]
+            stack[-1] = (children[1:], parent_path)
+            name = self.name(index)
+            full_path = os.path.join(parent_path, name) if parent_path else name
+            is_folder = self.is_folder(index)
+            yield DiagramRecord(len(stack) - 1, name, is_folder, full_path)
+            if is_folder:
+                stack.append((self.children(index), full_path))
+
+    def node(self, index: int) -> Union[Node, 'LazyContainerNode']:
+        """
+        Creates the node stored at an index, without its parent.
+        """
+        if self.is_folder(index):
+            return LazyContainerNode(self.name(index), self, index)
+        return Node(self.name(index))
+
+    def tree(self) -> Tree:
+        """
+        Returns a tree with a lazily loaded root.
+        """
+        root = LazyContainerNode(self.name(0), self, 0)
+        StructNode._load_root(root)
+        return Tree(root)
+
+    def close(self):
+        """
+        Releases the memory map; nodes that were not loaded yet can't be loaded after this.
+        """
+        for name in ('name_offsets', 'node_names', 'parents', 'child_offsets', 'kinds', 'names'):
+            value = getattr(self, name)
+            if isinstance(value, memoryview):
+                value.release()
+        self.buffer.close()
+
+
+# <--------------------------- LazyContainerNode ---------------------------->
+# <--------------------------- LazyContainerNode ---------------------------->
+
+class LazyContainerNode(ContainerNode):
+    """
+    Container node of a binary tree file whose children are created on first access.
+    """
+
+    def __init__(self, name: str, file: BinaryTreeFile, index: int):
+        super().__init__(name)
+        self.file = file
+        self.index = index
+        self._children = None
+
+    @property
+    def children(self) -> List[Union[Node, ContainerNode]]:
+        if self._children is None:
+            self._children = []
+            for index in self.file.children(self.index):
+                self.attach(self.file.node(index))
+        return self._children
+
+    @children.setter
+    def children(self, children: List[Union[Node, ContainerNode]]):
+        self._children = children
+
+    def is_loaded(self) -> bool:
+        """
+        Checks if the children of the node were created.
+        """
+        return self._children is not None
@@ -1,20 +1,86 @@
 import os
-import shutil
+import sys
 import argparse
 import logging
 import pathlib
+import asyncio
+import heapq
+import marshal
+import itertools
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from abc import ABC, abstractmethod
 from utils.helpers import CLIUtils, PathUtils
 from models.abstractGenerator import AbstarctGenerator
+from models.parser import DiagramParser
+from models.cache import DiagramCache
+from models.dialects import DialectRegistry
+from models.binary import BinaryTree
+from models.jsontree import TreeJson
+from models.includes import DiagramIncluder
+from models.filters import PathFilter
+from models.plan import BuildPlan
+from models.trash import TrashBin
+from models.staging import StagedBuild
+from models.journal import BuildJournal
+from models.archive import BuildArchive
+from models.storage import StorageBackend, LocalStorage, MemoryStorage, LatencyStorage
+from typing import Union, Iterable, Iterator, AsyncIterator, List, Dict, Tuple
+from enum import Enum
 
 
 
 class Builder(AbstarctGenerator):
 
+    class BuildEngines(Enum):
+        PATHS = 'paths'
+        DIR_FD = 'dir-fd'
+
+    Engines = BuildEngines
+
+    class OverrideModes(Enum):
+        DELETE = 'delete'
+        TRASH = 'trash'
+
+    Overrides = OverrideModes
+
+    # Records grouped by depth per round of the '--jobs' mode; bounds the memory it holds.
+    BATCH_SIZE = 4096
+    # Threads of an async build when the request doesn't set '--jobs'.
+    ASYNC_JOBS = 4
+    # A subtree bigger than 1 / (processes * SHARDS_PER_PROCESS) of the tree is split further.
+    SHARDS_PER_PROCESS = 4
+    # Errors listed in the response of a sharded build; the rest are only counted.
+    MAX_REPORTED_ERRORS = 20
+
     @staticmethod
     def parse_arguments(parser: argparse.ArgumentParser):
         parser.add_argument('-o', '--override', action="store_true", default=False, help="Is Override to use. Default is 'build'.")
-        parser.add_argument('source', type=str, help="Path to the ASCII folder diagram file.")
+        parser.add_argument('--override-mode', type=str, choices=[mode.value for mode in Builder.Overrides], default=Builder.Overrides.DELETE.value, help="How '-o' clears the destination. 'trash' renames it aside and deletes it in the background while building. Default is 'delete'.")
+        parser.add_argument('--trash-retention', type=int, default=0, help="Number of the newest trashed destinations to keep with '--override-mode trash'. Default is 0.")
+        parser.add_argument('--staged', action="store_true", default=False, help="Build into a hidden sibling folder and swap it in when complete, so the destination is never seen half built. The replaced tree stays in '.<name>.previous' for rollback, next to a '.<name>.lock' file.")
+        parser.add_argument('--journal', action="store_true", default=False, help="Record the progress of the build in a '.<name>.journal' file next to the destination, so an interrupted build can be continued with '--resume'.")
+        parser.add_argument('--resume', action="store_true", default=False, help="Continue an interrupted '--journal' build, skipping the entries it completed without checking them. Needs the same source, filters and '--processes'.")
+        parser.add_argument('-a', '--append', action="store_true", default=False, help="Build into a non-empty destination, creating only the entries that are missing.")
+        parser.add_argument('--parse-mode', type=str, choices=[mode.value for mode in DiagramParser.Modes], default=DiagramParser.Modes.LINES.value, help="How to read the diagram. 'mmap' scans the raw bytes of large files, 'parallel' splits them across processes, unless they have @include entries or brace expressions. Default is 'lines'.")
+        parser.add_argument('--parse-jobs', type=int, default=None, help="Number of processes used by the 'parallel' parse mode. Default is the CPU count.")
+        parser.add_argument('--dialect', type=str, choices=['auto'] + DialectRegistry.get_names(), default='auto', help="Notation of the diagram. Default is 'auto', which detects it from the start of the file.")
+        parser.add_argument('--no-expand', action="store_true", default=False, help="Keep brace expressions such as 'shard_{000..999}/' as literal names.")
+        parser.add_argument('--include', action="append", default=[], metavar="GLOB", help="Only build entries matching the glob (e.g. 'src/users/**') and the folders leading to them. Can be repeated.")
+        parser.add_argument('--exclude', action="append", default=[], metavar="GLOB", help="Skip entries matching the glob, with everything below them. Can be repeated.")
+        parser.add_argument('--max-depth', type=int, default=None, help="Only build entries down to this many levels.")
+        parser.add_argument('--engine', type=str, choices=[engine.value for engine in Builder.Engines], default=Builder.Engines.PATHS.value, help="How entries are created. 'dir-fd' creates them relative to open folder descriptors instead of by full path, which is faster on deep trees. Default is 'paths'.")
+        parser.add_argument('-j', '--jobs', type=int, default=None, help="Number of threads creating folders and files. Helps on network file systems. Default is one at a time.")
+        parser.add_argument('--processes', type=int, default=None, help="Number of processes building separate subtrees, for trees of millions of entries. Default is to build in this process.")
+        parser.add_argument('--dry-run', action="store_true", default=False, help="Print the build plan and its statistics without creating anything.")
+        parser.add_argument('--save-plan', type=str, default=None, metavar="PATH", help=f"Write the compiled build plan to a '{BuildPlan.FILE_EXTENSION}' file, which can be built later as the source.")
+        parser.add_argument('--archive', type=str, default=None, metavar="PATH", help="Write the tree into an archive file, or '-' for stdout, instead of creating it. Nothing is written to the destination.")
+        parser.add_argument('--archive-format', type=str, choices=[format.value for format in BuildArchive.Formats], default=None, help="Format of '--archive'. Default is taken from its extension, or 'tar' on stdout. 'tar.zst' needs the 'zstandard' package.")
+        parser.add_argument('--storage', type=str, choices=[LocalStorage.name, MemoryStorage.name], default=LocalStorage.name, help="Where the tree is built. 'memory' builds it in memory and discards it, to measure the rest of the build. Default is 'local'.")
+        parser.add_argument('--storage-latency', type=float, default=None, metavar="MS", help="Delay every storage operation by this many milliseconds, to simulate slow storage.")
+        parser.add_argument('--no-cache', action="store_true", default=False, help="Always parse the diagram instead of reusing a cached parse.")
+        parser.add_argument('source', type=str, help="Path to the ASCII folder diagram file (optionally .gz, .xz or .bz2), '-' for stdin, or a binary tree, JSON tree or build plan file.")
         parser.add_argument('dist', nargs='?', type=str, default=None, help="Path to the destination folder. Default is the current folder.")
 
     @staticmethod
@@ -22,56 +88,143 @@ class Builder(AbstarctGenerator):
         request_data = {
             "args": args.__dict__,
         }   
-        request_data['args']["dist"] = request_data['args']["dist"] if request_data['args']["dist"] else PathUtils.join_paths(os.getcwd(), PathUtils.get_folder_name(request_data['args']["source"]))
-        if PathUtils.is_path_exists(request_data['args']["dist"]):
-            if not PathUtils.is_folder_empty(request_data['args']["dist"]):
-                if request_data['args']["override"]:
-                    shutil.rmtree(request_data['args']["dist"])
-                    PathUtils.create_folder(request_data['args']["dist"])
+        request_data['args']["dist"] = request_data['args']["dist"] if request_data['args']["dist"] else PathUtils.join_paths(os.getcwd(), DiagramParser.get_root_name(request_data['args']["source"]))
+        if request_data['args'].get("override") and request_data['args'].get("append"):
+            raise ValueError("Use either the '-o' flag to override or the '-a' flag to append, not both.")
+        if request_data['args'].get("trash_retention", 0) < 0:
+            raise ValueError("Trash retention can't be negative.")
+        if request_data['args'].get("resume") and (request_data['args'].get("override") or request_data['args'].get("append") or request_data['args'].get("staged")):
+            raise ValueError("The '--resume' flag continues the interrupted build as it was and can't be combined with '-o', '-a' or '--staged'.")
+        if request_data['args'].get("journal") and request_data['args'].get("staged"):
+            raise ValueError("A failed staged build is deleted, so there is nothing to journal. Use either '--journal' or '--staged'.")
+        storage = Builder.get_storage(request_data)
+        is_trash = request_data['args']["override"] and Builder.Overrides(request_data['args'].get("override_mode", Builder.Overrides.DELETE.value)) == Builder.Overrides.TRASH
+        if not storage.is_local and (request_data['args'].get("staged") or request_data['args'].get("journal") or request_data['args'].get("resume") or is_trash):
+            raise ValueError(f"The '--staged', '--journal', '--resume' and '--override-mode trash' options only work with the '{LocalStorage.name}' storage.")
+        if request_data['args'].get("archive"):
+            if any(request_data['args'].get(flag) for flag in ["override", "append", "journal", "resume", "staged", "dry_run"]):
+                raise ValueError("The '--archive' option writes no files and can't be combined with '-o', '-a', '--journal', '--resume', '--staged' or '--dry-run'.")
+            return Builder.generate_archive(request_data)
+        if request_data['args'].get("dry_run"):
+            return Builder.generate(request_data)
+        if request_data['args'].get("staged"):
+            return Builder.generate_staged(request_data)
+        if storage.exists(request_data['args']["dist"]):
+            if not storage.is_empty(request_data['args']["dist"]):
+                if request_data['args'].get("append") or request_data['args'].get("resume"):
+                    pass
+                elif request_data['args']["override"]:
+                    Builder.clear_dist(request_data)
                 else: 
                     raise ValueError("Destination folder is not empty. Use the '-o' flag to override, or the '-a' flag to append.")
             else:   
                 pass
         else:
-            PathUtils.create_folder(request_data['args']["dist"])
+            storage.mkdir(request_data['args']["dist"], parents=True)
+            logging.info(f"Created folder: {request_data['args']['dist']}")
+        if is_trash:
+            # Runs alongside the build, and also removes trash left by an interrupted run.
+            TrashBin.clean(request_data['args']["dist"], request_data['args'].get("trash_retention", 0))
         Builder.generate(request_data)
 
     @staticmethod
-    def dist_tests(dist):
+    def generate_staged(request_data):
+        """
+        Builds into a stage and swaps it in for the destination. A failed build removes
+        its stage and leaves the destination as it was.
+        """
+        dist = request_data['args']["dist"]
+        if request_data['args'].get("append"):
+            raise ValueError("A staged build starts from an empty folder and can't append.")
+        storage = Builder.get_storage(request_data)
+        if storage.exists(dist) and not (storage.is_folder(dist) and (storage.is_empty(dist) or request_data['args']["override"])):
+            raise ValueError("Destination folder is not empty. Use the '-o' flag to replace it.")
+        stage = StagedBuild.create_stage(dist)
+        try:
+            # A failed stage is deleted, so there is nothing to resume.
+            results = Builder.generate({**request_data, "args": {**request_data['args'], "dist": stage}})
+        except BaseException:
+            TrashBin.delete([stage])
+            raise
+        StagedBuild.swap(stage, dist)
+        return results
+
+    @staticmethod
+    def generate_archive(request_data):
+        """
+        Streams the tree into an archive and leaves the destination alone. The diagram is
+        parsed without the cache, which would hold every record to store them.
+        """
+        args = request_data['args']
+        Builder.check_source(args["source"])
+        format = BuildArchive.get_format(args["archive"], args.get("archive_format"))
+        if isinstance(args["source"], str) and BuildPlan.is_plan(args["source"]):
+            records = BuildPlan.load(args["source"]).records()
+        else:
+            records = Builder.get_records({**request_data, "args": {**args, "no_cache": True}})
+        count = BuildArchive.write(records, args["archive"], format)
+        results = {"status": True, "message": f"Wrote {count} entries to a {format.value} archive."}
+        if args["archive"] == '-':
+            # Stdout carries the archive.
+            print(results["message"], file=sys.stderr)
+            return results
+        return Builder.handle_response(results)
+
+    @staticmethod
+    def clear_dist(request_data):
+        """
+        Empties the destination for '-o', either deleting it in place or moving it to
+        the trash, which is emptied in the background once the build starts.
+        """
+        dist = request_data['args']["dist"]
+        if Builder.Overrides(request_data['args'].get("override_mode", Builder.Overrides.DELETE.value)) == Builder.Overrides.TRASH:
+            TrashBin.move(dist)
+            return
+        storage = Builder.get_storage(request_data)
+        storage.remove(dist)
+        storage.mkdir(dist, parents=True)
+
+    @staticmethod
+    def dist_tests(dist, storage: Union[None, StorageBackend] = None):
+        storage = storage or LocalStorage()
         return [
             { "function": lambda: PathUtils.is_path_format_valid(dist), "errorMessage": "Destination folder path is invalid." },
-            { "function": lambda: PathUtils.is_path_exists(dist), "errorMessage": "Destination folder does not exist." },        
-            { "function": lambda: PathUtils.is_folder(dist), "errorMessage": "Destination is not a folder." },
+            { "function": lambda: storage.exists(dist), "errorMessage": "Destination folder does not exist." },        
+            { "function": lambda: storage.is_folder(dist), "errorMessage": "Destination is not a folder." },
         ]
 
     @staticmethod
     def source_tests(source):
+        if DiagramParser.is_stdin(source):
+            return [
+                { "function": lambda: not sys.stdin.isatty(), "errorMessage": "No diagram was piped to stdin." },
+            ]
         return [
             { "function": lambda: PathUtils.is_path_format_valid(source), "errorMessage": "Source file path is invalid." },
             { "function": lambda: PathUtils.is_path_exists(source), "errorMessage": "Source file does not exist."},
             { "function": lambda: PathUtils.is_file(source), "errorMessage": "Source isn't a file."},
-            { "function": lambda: PathUtils.get_file_extension(source) == '.txt', "errorMessage": "Source file is not a text file."},
+            { "function": lambda: PathUtils.get_file_extension(DiagramParser.strip_compression(source)) in ['.txt', BinaryTree.FILE_EXTENSION, *TreeJson.FILE_EXTENSIONS, BuildPlan.FILE_EXTENSION], "errorMessage": "Source file is not a text, binary tree, JSON tree or build plan file."},
             { "function": lambda: not PathUtils.is_file_empty(source), "errorMessage": "Source file is empty."},
         ]
     
     @staticmethod
-    def is_dist_valid(dist):
-        for test in Builder.dist_tests(dist):
-            if not test["function"]:
+    def is_dist_valid(dist, storage: Union[None, StorageBackend] = None):
+        for test in Builder.dist_tests(dist, storage):
+            if not test["function"]():
                 return {"status": False, "message": test["errorMessage"]}
         return {"status": True, "message": "Destination folder is valid."}  
     
     @staticmethod
     def is_source_valid(source):
-        for test in Builder.dist_tests(source):
-            if not test["function"]:
+        for test in Builder.source_tests(source):
+            if not test["function"]():
                 return {"status": False, "message": test["errorMessage"]}
         return {"status": True, "message": "Source folder is valid."}
     
 
     @staticmethod
-    def check_dist(dist):
-        dist_results = Builder.is_dist_valid(dist)
+    def check_dist(dist, storage: Union[None, StorageBackend] = None):
+        dist_results = Builder.is_dist_valid(dist, storage)
         if not dist_results["status"]:
             raise ValueError(dist_results["message"])
         return dist_results
@@ -84,48 +237,439 @@ class Builder(AbstarctGenerator):
         return source_results
     
     @staticmethod
-    def handle_generate(request_data):
-        logging.info("Generating folders and files...")
+    def get_path_filter(request_data):
+        args = request_data['args']
+        return PathFilter(args.get('include'), args.get('exclude'), args.get('max_depth'))
+
+    @staticmethod
+    def get_records(request_data):
         source = request_data['args']['source']
-        dist = request_data['args']['dist']
-        
-        with open(source, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        
-        current_path = [dist]
-        for line in lines:
-            stripped_line = line.rstrip()
-            if stripped_line:
-                # Calculate depth based on the leading tree structure characters
-                depth = len(stripped_line) - len(stripped_line.lstrip(' │├└'))
-                # Extract folder or file name after the tree structure characters
-                item_name = stripped_line.split('─')[-1].strip()
-                print(item_name)
-                if item_name.endswith('/'):
-                    item_name = item_name[:-1]
-                    is_folder = True
-                else:
-                    is_folder = False
-                
-                # Adjust the current path based on the depth
-                while len(current_path) > depth + 1:  # Adjust +1 because dist is already in the path
-                    current_path.pop()
-                current_path.append(item_name)
-                
-                item_path = os.path.join(*current_path)
-                if is_folder:
-                    if not os.path.exists(item_path):
-                        os.makedirs(item_path)
+        path_filter = Builder.get_path_filter(request_data)
+        if BinaryTree.is_binary(source):
+            return path_filter.filter_records(BinaryTree.records(source))
+        if TreeJson.is_json(source):
+            return path_filter.filter_records(TreeJson.records(source))
+        mode = DiagramParser.Modes(request_data['args'].get('parse_mode', DiagramParser.Modes.LINES.value))
+        dialect = request_data['args'].get('dialect', 'auto')
+        dialect = None if dialect == 'auto' else dialect
+        expand = not request_data['args'].get('no_expand', False)
+        includer = DiagramIncluder()
+        parse = lambda: DiagramParser.records(source, mode, request_data['args'].get('parse_jobs'), dialect, expand, includer, path_filter)
+        # Stdin can't be hashed without buffering it, so it is always parsed.
+        if request_data['args'].get('no_cache', False) or DiagramParser.is_stdin(source):
+            return parse()
+        return DiagramCache().records(source, parse, f"dialect={dialect or 'auto'};expand={expand};{path_filter.describe()}", lambda: includer.dependencies)
+
+    @staticmethod
+    def needs_plan(request_data) -> bool:
+        """
+        Checks whether the build needs its whole plan up front. Other builds stream the
+        records of the source straight to the engine.
+        """
+        args = request_data['args']
+        if isinstance(args['source'], str) and BuildPlan.is_plan(args['source']):
+            return True
+        return any(args.get(flag) for flag in ['dry_run', 'save_plan', 'append', 'journal', 'resume'])
+
+    @staticmethod
+    def get_build_records(request_data) -> Iterator:
+        """
+        Returns the records to create, read from the plan when the build needs one.
+        """
+        if Builder.needs_plan(request_data):
+            return Builder.get_plan(request_data).records()
+        return BuildPlan.unique(Builder.get_records(request_data))
+
+    @staticmethod
+    def get_plan(request_data) -> BuildPlan:
+        """
+        Returns the plan of the build, reduced to the missing entries when appending.
+        """
+        source = request_data['args']['source']
+        if isinstance(source, str) and BuildPlan.is_plan(source):
+            plan = BuildPlan.load(source)
+        else:
+            plan = BuildPlan.compile(Builder.get_records(request_data))
+            if request_data['args'].get('save_plan'):
+                plan.save(request_data['args']['save_plan'])
+        if request_data['args'].get('append'):
+            plan = plan.get_missing(Builder.snapshot(request_data['args']['dist'], Builder.get_storage(request_data)))
+        return plan
+
+    @staticmethod
+    def snapshot(dist: str, storage: StorageBackend) -> Dict[str, bool]:
+        """
+        Lists everything below the destination in one scandir walk, as relative path ->
+        is folder. Symlinked folders are listed but not entered.
+        """
+        existing: Dict[str, bool] = {}
+        if not storage.is_folder(dist):
+            return existing
+        folders = ['']
+        while folders:
+            folder = folders.pop()
+            for entry in storage.scandir(os.path.join(dist, folder)):
+                path = os.path.join(folder, entry.name) if folder else entry.name
+                existing[path] = entry.is_folder
+                if entry.is_folder and not entry.is_link:
+                    folders.append(path)
+        logging.info(f"Found {len(existing)} existing entries in {dist}.")
+        return existing
+
+    @staticmethod
+    def create_entry(item_path: str, is_folder: bool, storage: StorageBackend, exist_ok: bool = False):
+        """
+        Creates one planned entry, whose parent already exists, with a single mkdir
+        or an exclusive create. An existing file is reported unless `exist_ok` is set.
+        """
+        if is_folder:
+            try:
+                storage.mkdir(item_path)
+                logging.info(f"Created directory: {item_path}")
+            except FileExistsError:
+                pass
+        else:
+            try:
+                storage.create_file(item_path)
+                logging.info(f"Created file: {item_path}")
+            except FileExistsError:
+                if not exist_ok:
+                    logging.warning(f"File already exists: {item_path}")
+
+    @staticmethod
+    def create_entries_at(records: Iterable, dist: str):
+        """
+        Creates the entries relative to a descriptor of their parent folder, so the kernel
+        never resolves a full path again. Descriptors are kept for the open ancestors
+        only, opened when a first child needs them and closed as the depth unwinds.
+        """
+        if not {os.mkdir, os.open} <= os.supports_dir_fd:
+            raise ValueError(f"The '{Builder.Engines.DIR_FD.value}' engine isn't supported on this platform.")
+        flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+        # [path, name, descriptor or None] of dist and every open folder.
+        stack = [[dist, None, os.open(dist, flags)]]
+        try:
+            for record in records:
+                while len(stack) > record.depth + 1:
+                    descriptor = stack.pop()[2]
+                    if descriptor is not None:
+                        os.close(descriptor)
+                parent = stack[-1]
+                if parent[2] is None:
+                    parent[2] = os.open(parent[1], flags, dir_fd=stack[-2][2])
+                item_path = os.path.join(parent[0], record.name)
+                if record.is_folder:
+                    try:
+                        os.mkdir(record.name, dir_fd=parent[2])
                         logging.info(f"Created directory: {item_path}")
+                    except FileExistsError:
+                        pass
+                    stack.append([item_path, record.name, None])
                 else:
-                    parent_dir = os.path.dirname(item_path)
-                    if not os.path.exists(parent_dir):
-                        os.makedirs(parent_dir)
-                        PathUtils.create_file(item_path)
-                    logging.info(f"Created file: {item_path}")
-        
+                    try:
+                        os.close(os.open(record.name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666, dir_fd=parent[2]))
+                        logging.info(f"Created file: {item_path}")
+                    except FileExistsError:
+                        logging.warning(f"File already exists: {item_path}")
+        finally:
+            for _, _, descriptor in stack:
+                if descriptor is not None:
+                    os.close(descriptor)
+
+    @staticmethod
+    def create_entries(records: Iterable, dist: str, jobs: int, storage: StorageBackend):
+        """
+        Creates the entries with a thread pool, in batches of records that are created
+        one depth level at a time, so every parent exists before its children start.
+        """
+        records = iter(records)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            batch = Builder.read_batch(records)
+            while batch:
+                for _, entries in Builder.get_levels(batch, dist):
+                    for _ in executor.map(lambda entry: Builder.create_entry(*entry, storage), entries.items()):
+                        pass
+                batch = Builder.read_batch(records)
+
+    @staticmethod
+    def read_batch(records: Iterator) -> List:
+        return list(itertools.islice(records, Builder.BATCH_SIZE))
+
+    @staticmethod
+    def get_levels(records: Iterable, dist: str) -> List[Tuple[int, Dict[str, bool]]]:
+        """
+        Groups a batch of records by depth, shallowest first, as path -> is folder.
+        """
+        levels: Dict[int, Dict[str, bool]] = {}
+        for record in records:
+            # A repeated path is a no-op in a serial build, so only its first entry is kept.
+            levels.setdefault(record.depth, {}).setdefault(os.path.join(dist, record.full_path), record.is_folder)
+        return sorted(levels.items())
+
+    @staticmethod
+    def shard_records(records: Iterable, processes: int) -> Tuple[List[str], List[bytes]]:
+        """
+        Splits a tree into subtrees balanced across the processes. Returns the folders
+        that must exist before the shards start, parents first, and one marshalled
+        list of (parent path, depths, names, folder flags) subtrees per shard.
+        """
+        depths = array('I')
+        names: List[str] = []
+        folders = bytearray()
+        for record in records:
+            depths.append(record.depth)
+            names.append(record.name)
+            folders.append(record.is_folder)
+        target = max(1, len(names) // (processes * Builder.SHARDS_PER_PROCESS))
+
+        heads: List[str] = []
+        # (path of the parent, first index, end index) of every subtree still to place.
+        queue = deque(Builder.get_subtrees(depths, '', 0, len(names)))
+        # Path -> subtrees; subtrees with the same path go to the same shard.
+        units: Dict[str, List[Tuple[str, int, int]]] = {}
+        while queue:
+            parent_path, start, end = queue.popleft()
+            path = os.path.join(parent_path, names[start])
+            if folders[start] and (depths[start] == 0 or end - start > target) and path not in units:
+                heads.append(path)
+                queue.extend(Builder.get_subtrees(depths, path, start + 1, end))
+            else:
+                units.setdefault(path, []).append((parent_path, start, end))
+
+        # Largest first onto the least loaded shard.
+        loads = [(0, index) for index in range(processes)]
+        shards: List[List[Tuple[str, bytes, List[str], bytes]]] = [[] for _ in range(processes)]
+        for subtrees in sorted(units.values(), key=lambda subtrees: -sum(end - start for _, start, end in subtrees)):
+            load, index = heapq.heappop(loads)
+            for parent_path, start, end in subtrees:
+                shards[index].append((parent_path, depths[start:end].tobytes(), names[start:end], bytes(folders[start:end])))
+                load += end - start
+            heapq.heappush(loads, (load, index))
+        return heads, [marshal.dumps(shard) for shard in shards if shard]
+
+    @staticmethod
+    def get_subtrees(depths: array, parent_path: str, start: int, end: int) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yields the (parent path, first index, end index) of every child subtree in a range.
+        """
+        if start >= end:
+            return
+        depth = depths[start]
+        first = start
+        for index in range(start + 1, end):
+            if depths[index] == depth:
+                yield parent_path, first, index
+                first = index
+        yield parent_path, first, end
+
+    @staticmethod
+    def build_shard(dist: str, shard: bytes, storage: StorageBackend, exist_ok: bool = False) -> Dict:
+        """
+        Creates the subtrees of one shard. An entry that fails is reported and its
+        subtree skipped, so one bad path doesn't stop the rest of the shard. With
+        `exist_ok`, the shard is redone after an interruption and existing files are fine.
+        """
+        created = 0
+        errors: List[str] = []
+        for parent_path, depth_bytes, names, folders in marshal.loads(shard):
+            depths = array('I')
+            depths.frombytes(depth_bytes)
+            base = depths[0]
+            paths = [os.path.join(dist, parent_path)]
+            skip_depth = None
+            for depth, name, is_folder in zip(depths, names, folders):
+                level = depth - base
+                if skip_depth is not None:
+                    if level > skip_depth:
+                        continue
+                    skip_depth = None
+                del paths[level + 1:]
+                item_path = os.path.join(paths[level], name)
+                paths.append(item_path)
+                try:
+                    Builder.create_entry(item_path, bool(is_folder), storage, exist_ok)
+                    created += 1
+                except OSError as error:
+                    errors.append(f"{item_path}: {error.strerror or error}.")
+                    skip_depth = level
+        return {"created": created, "errors": errors}
+
+    @staticmethod
+    def create_sharded(records: Iterable, dist: str, processes: int, storage: StorageBackend, journal: Union[None, BuildJournal] = None) -> Dict:
+        """
+        Creates the top level folders, and the folders above oversized subtrees, here,
+        then builds the shards on a process pool and merges their results. Shards the
+        journal lists as completed are skipped, and those completed without errors
+        are added to it.
+        """
+        heads, shards = Builder.shard_records(records, processes)
+        for path in heads:
+            Builder.create_entry(os.path.join(dist, path), True, storage)
+        created = len(heads)
+        errors: List[str] = []
+        done = set(journal.completed) if journal else set()
+        # A shard the interrupted build didn't complete may be partly built already.
+        exist_ok = bool(journal and journal.is_resumed)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(Builder.build_shard, dist, shard, storage, exist_ok): index for index, shard in enumerate(shards) if index not in done}
+            for future in as_completed(futures):
+                result = future.result()
+                created += result["created"]
+                errors.extend(result["errors"])
+                if journal and not result["errors"]:
+                    journal.write(futures[future])
+        logging.info(f"Created {created} entries in {len(futures)} shards, {len(shards) - len(futures)} already completed.")
+        if errors:
+            message = '\n'.join(errors[:Builder.MAX_REPORTED_ERRORS])
+            if len(errors) > Builder.MAX_REPORTED_ERRORS:
+                message += f"\n... and {len(errors) - Builder.MAX_REPORTED_ERRORS} more."
+            return {"status": False, "message": f"{len(errors)} entries could not be created:\n{message}"}
         return {"status": True, "message": "Folders and files created successfully."}
 
+    @staticmethod
+    async def generate_async(request_data) -> AsyncIterator[Dict]:
+        """
+        Builds like `generate` without blocking the event loop, yielding the path of every
+        entry once it exists. All file system work runs on a pool of '--jobs' threads, and
+        only one batch of records is read ahead of the consumer. When the build is cancelled
+        or the consumer stops early, queued entries are dropped and running ones finish
+        before the build reports what it created.
+        """
+        args = request_data['args']
+        storage = Builder.get_storage(request_data)
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=args.get('jobs') or Builder.ASYNC_JOBS)
+        # Future -> (path, is folder) of every entry submitted but not yet yielded.
+        pending = {}
+        created = 0
+        is_complete = False
+        try:
+            await loop.run_in_executor(executor, Builder.check_source, args['source'])
+            await loop.run_in_executor(executor, Builder.check_dist, args['dist'], storage)
+            records = await loop.run_in_executor(executor, Builder.get_build_records, request_data)
+            batch = await loop.run_in_executor(executor, Builder.read_batch, records)
+            while batch:
+                for _, entries in Builder.get_levels(batch, args['dist']):
+                    pending = {executor.submit(Builder.create_entry, path, is_folder, storage): (path, is_folder) for path, is_folder in entries.items()}
+                    finished = asyncio.Queue()
+                    for future in pending:
+                        future.add_done_callback(lambda future: loop.call_soon_threadsafe(finished.put_nowait, future))
+                    while pending:
+                        future = await finished.get()
+                        path, is_folder = pending.pop(future)
+                        future.result()
+                        created += 1
+                        yield {"path": path, "is_folder": is_folder}
+                batch = await loop.run_in_executor(executor, Builder.read_batch, records)
+            is_complete = True
+        finally:
+            for future in pending:
+                future.cancel()
+            await asyncio.shield(loop.run_in_executor(None, executor.shutdown))
+            if is_complete:
+                logging.info(f"Created {created} entries in {args['dist']}.")
+            else:
+                finished = [path for future, (path, _) in pending.items() if not future.cancelled() and future.exception() is None]
+                for path in finished:
+                    logging.info(f"Created before stopping: {path}")
+                logging.warning(f"Build stopped after creating {created + len(finished)} entries in {args['dist']}.")
+
+    @staticmethod
+    def handle_generate(request_data):
+        logging.info("Generating folders and files...")
+        dist = request_data['args']['dist']
+        jobs = request_data['args'].get('jobs')
+        processes = request_data['args'].get('processes')
+        if jobs is not None and jobs < 1:
+            raise ValueError("Number of jobs must be at least 1.")
+        if processes is not None and processes < 1:
+            raise ValueError("Number of processes must be at least 1.")
+        engine = Builder.Engines(request_data['args'].get('engine', Builder.Engines.PATHS.value))
+        if engine == Builder.Engines.DIR_FD and ((jobs or 1) > 1 or (processes or 1) > 1):
+            raise ValueError(f"The '{engine.value}' engine builds in one thread and can't be combined with '--jobs' or '--processes'.")
+        storage = Builder.get_storage(request_data)
+        # Both call the operating system directly, from here or from other processes.
+        if engine == Builder.Engines.DIR_FD and not isinstance(storage, LocalStorage):
+            raise ValueError(f"The '{engine.value}' engine opens folder descriptors and only builds with the '{LocalStorage.name}' storage.")
+        if (processes or 1) > 1 and not storage.is_local:
+            raise ValueError(f"A build with '--processes' only works with the '{LocalStorage.name}' storage.")
+
+        plan = Builder.get_plan(request_data) if Builder.needs_plan(request_data) else None
+        if request_data['args'].get('dry_run'):
+            return Builder.handle_dry_run(plan)
+        if plan is not None:
+            logging.info(f"Build plan: {plan.describe()}")
+        is_sharded = bool(processes and processes > 1)
+        journal = Builder.get_journal(request_data, plan, f"shards={processes}" if is_sharded else BuildJournal.ORDERED_LAYOUT) if plan is not None else None
+        records = plan.records() if plan is not None else BuildPlan.unique(Builder.get_records(request_data))
+        try:
+            if is_sharded:
+                results = Builder.create_sharded(records, dist, processes, storage, journal)
+            else:
+                if journal:
+                    # The '--jobs' engine reads whole batches, so its progress is recorded per batch.
+                    interval = Builder.BATCH_SIZE if jobs and jobs > 1 else BuildJournal.INTERVAL
+                    exists = (lambda record: storage.exists(os.path.join(dist, record.full_path))) if journal.is_resumed else None
+                    records = journal.track(plan, journal.get_done(), interval, exists)
+                if jobs and jobs > 1:
+                    Builder.create_entries(records, dist, jobs, storage)
+                elif engine == Builder.Engines.DIR_FD:
+                    Builder.create_entries_at(records, dist)
+                else:
+                    for record in records:
+                        Builder.create_entry(os.path.join(dist, record.full_path), record.is_folder, storage)
+                results = {"status": True, "message": "Folders and files created successfully."}
+        finally:
+            if journal:
+                journal.close()
+        if journal and results["status"]:
+            journal.finish()
+        return results
+
+    @staticmethod
+    def get_storage(request_data) -> StorageBackend:
+        """
+        Returns the storage of the build, created from the arguments on first use unless
+        the request brings its own.
+        """
+        if request_data.get('storage') is None:
+            args = request_data['args']
+            storage = MemoryStorage() if args.get('storage') == MemoryStorage.name else LocalStorage()
+            if args.get('storage_latency'):
+                storage = LatencyStorage(storage, args['storage_latency'] / 1000)
+            request_data['storage'] = storage
+        return request_data['storage']
+
+    @staticmethod
+    def get_journal(request_data, plan: BuildPlan, layout: str) -> Union[None, BuildJournal]:
+        """
+        Opens the journal of the build to resume, or starts a new one for '--journal'. A
+        journal that can't be created is reported and the build runs without it.
+        """
+        args = request_data['args']
+        if not args.get('journal') and not args.get('resume'):
+            return None
+        # The journal lives on the local disk, next to the destination.
+        if not Builder.get_storage(request_data).is_local:
+            raise ValueError(f"The '--journal' and '--resume' flags only work with the '{LocalStorage.name}' storage.")
+        fingerprint = BuildJournal.get_fingerprint(plan, layout)
+        if args.get('resume'):
+            journal = BuildJournal.open(args['dist'], fingerprint)
+            if layout == BuildJournal.ORDERED_LAYOUT:
+                logging.info(f"Skipping {journal.get_done()} of {len(plan)} operations completed before.")
+            return journal
+        try:
+            return BuildJournal.create(args['dist'], fingerprint)
+        except OSError as error:
+            logging.warning(f"Building without a journal, since {BuildJournal.get_path(args['dist'])} can't be written: {error.strerror or error}.")
+            return None
+
+    @staticmethod
+    def handle_dry_run(plan: BuildPlan):
+        for operation, record in plan.steps():
+            print(f"{operation.value:<6} {record.full_path}")
+        return {"status": True, "message": f"Dry run: {plan.describe()}"}
+
     @staticmethod
     def handle_response(results):
         print(results["message"])
@@ -134,7 +678,8 @@ class Builder(AbstarctGenerator):
     @staticmethod
     def generate(request_data):
         Builder.check_source(request_data['args']["source"])
-        Builder.check_dist(request_data['args']["dist"])
+        if not request_data['args'].get("dry_run"):
+            Builder.check_dist(request_data['args']["dist"], Builder.get_storage(request_data))
         results = Builder.handle_generate(request_data)
         reponse_data = Builder.handle_response(results)
         return reponse_data
@@ -0,0 +1,238 @@
+import os
+import json
+import zlib
+import marshal
+import struct
+import hashlib
+import itertools
+import logging
+import tempfile
+from models.parser import DiagramParser, DiagramRecord
+from models.includes import DiagramIncluder
+from typing import Union, Iterable, Iterator, Callable, Dict, Tuple, Any, BinaryIO
+
+
+
+# <--------------------------- DiagramCache ---------------------------->
+# <--------------------------- DiagramCache ---------------------------->
+
+class DiagramCache:
+    """
+    On-disk cache of parsed diagrams, keyed by the diagram bytes and the parser version.
+    Entries also record the mtimes of included files and are dropped once one changes.
+
+    An entry is the magic followed by blocks of zlib compressed, marshalled rows, each
+    prefixed with its size. The dependencies come last, in one more block, followed by
+    its offset, so entries are written and read one block at a time.
+    """
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'fg')
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    FILE_EXTENSION = '.fgc'
+    STATS_FILE = 'stats.json'
+    READ_SIZE = 1 << 20
+    MAGIC = b'FGDC'
+    VERSION = 2
+    BLOCK_HEADER = struct.Struct('<I')
+    TRAILER = struct.Struct('<Q')
+    # Rows per block; bounds the memory of a cached parse.
+    BLOCK_ROWS = 4096
+
+    def __init__(self, directory: Union[None, str] = None, max_size: Union[None, int] = None):
+        self.directory = directory or os.environ.get('FG_CACHE_DIR') or DiagramCache.DEFAULT_DIRECTORY
+        self.max_size = max_size if max_size is not None else int(os.environ.get('FG_CACHE_SIZE', DiagramCache.DEFAULT_MAX_SIZE))
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: str, variant: str = '') -> str:
+        """
+        Returns the content address of a diagram file, parsed with the given options.
+        """
+        digest = hashlib.sha256(f"fg-parser-{DiagramParser.VERSION}\0fg-cache-{DiagramCache.VERSION}\0{variant}\0".encode('utf-8'))
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(DiagramCache.READ_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_entry_path(self, key: str) -> str:
+        """
+        Returns the path of the cache entry for a key.
+        """
+        return os.path.join(self.directory, key + DiagramCache.FILE_EXTENSION)
+
+    @staticmethod
+    def read_block(file: BinaryIO) -> Any:
+        header = file.read(DiagramCache.BLOCK_HEADER.size)
+        if len(header) < DiagramCache.BLOCK_HEADER.size:
+            raise EOFError("Truncated cache entry.")
+        size, = DiagramCache.BLOCK_HEADER.unpack(header)
+        return marshal.loads(zlib.decompress(file.read(size)))
+
+    @staticmethod
+    def write_block(file: BinaryIO, value: Any) -> int:
+        """
+        Appends a block and returns its size in the file.
+        """
+        data = zlib.compress(marshal.dumps(value))
+        file.write(DiagramCache.BLOCK_HEADER.pack(len(data)))
+        file.write(data)
+        return DiagramCache.BLOCK_HEADER.size + len(data)
+
+    def load(self, key: str) -> Union[None, Iterator[Tuple[int, str, bool, str]]]:
+        """
+        Returns the cached rows for a key, read one block at a time, or None on a miss.
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            file = open(entry_path, 'rb')
+        except OSError:
+            return None
+        try:
+            if file.read(len(DiagramCache.MAGIC)) != DiagramCache.MAGIC:
+                raise ValueError("Not a cache entry.")
+            file.seek(-DiagramCache.TRAILER.size, os.SEEK_END)
+            end, = DiagramCache.TRAILER.unpack(file.read(DiagramCache.TRAILER.size))
+            file.seek(end)
+            dependencies = DiagramCache.read_block(file)
+            if not DiagramIncluder.is_fresh(dependencies):
+                file.close()
+                return None
+            file.seek(len(DiagramCache.MAGIC))
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            file.close()
+            return None
+        # The modification time doubles as the last access time for the LRU policy.
+        os.utime(entry_path)
+        return DiagramCache.read_rows(file, end)
+
+    @staticmethod
+    def read_rows(file: BinaryIO, end: int) -> Iterator[Tuple[int, str, bool, str]]:
+        with file:
+            while file.tell() < end:
+                yield from DiagramCache.read_block(file)
+
+    def store(self, key: str, records: Iterable[DiagramRecord], dependencies: Union[None, Callable[[], Dict[str, int]]] = None) -> Iterator[DiagramRecord]:
+        """
+        Yields the records of a diagram while writing them to a new entry, then evicts the
+        least recently used entries. An entry that outgrows the size limit is dropped
+        without buffering the rest, and so is one whose records aren't all read.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError as error:
+            logging.warning(f"Not caching the diagram: {error}")
+            yield from records
+            return
+        file = os.fdopen(descriptor, 'wb')
+        is_complete = False
+        try:
+            file.write(DiagramCache.MAGIC)
+            size = len(DiagramCache.MAGIC)
+            block = []
+            for record in records:
+                if file is not None:
+                    block.append(tuple(record))
+                    if len(block) == DiagramCache.BLOCK_ROWS:
+                        size += DiagramCache.write_block(file, block)
+                        block = []
+                        if size > self.max_size:
+                            logging.info(f"Not caching the diagram: it outgrew the {self.max_size} byte cache.")
+                            file.close()
+                            file = None
+                yield record
+            if file is not None:
+                size += DiagramCache.write_block(file, block)
+                end = size
+                size += DiagramCache.write_block(file, (dependencies() if dependencies else None) or {})
+                file.write(DiagramCache.TRAILER.pack(end))
+                if size + DiagramCache.TRAILER.size <= self.max_size:
+                    file.close()
+                    os.replace(temp_path, self.get_entry_path(key))
+                    is_complete = True
+        finally:
+            if file is not None:
+                file.close()
+            if not is_complete:
+                os.remove(temp_path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size limit.
+        """
+        entries = []
+        with os.scandir(self.directory) as scanner:
+            for entry in scanner:
+                if entry.name.endswith(DiagramCache.FILE_EXTENSION):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                logging.info(f"Evicted cached diagram: {path}")
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def records(self, source: str, parse: Callable[[], Iterator[DiagramRecord]], variant: str = '', dependencies: Union[None, Callable[[], Dict[str, int]]] = None) -> Iterator[DiagramRecord]:
+        """
+        Yields the records of a diagram from the cache, or from `parse` while filling the cache.
+        `dependencies` returns the path -> mtime of the files the parse read besides the source.
+        """
+        key = self.key(source, variant)
+        rows = self.load(key)
+        if rows is not None:
+            self.hits += 1
+            self.save_stats(hits=1)
+            logging.info(f"Diagram cache hit: {source}")
+            count = 0
+            try:
+                for row in rows:
+                    yield DiagramRecord._make(row)
+                    count += 1
+                return
+            except (OSError, ValueError, EOFError, TypeError, zlib.error) as error:
+                # Parsing yields the same records, so it picks up after the last one read.
+                logging.warning(f"Dropping the damaged cache entry of {source}: {error}")
+                os.remove(self.get_entry_path(key))
+                yield from itertools.islice(parse(), count, None)
+                return
+        self.misses += 1
+        self.save_stats(misses=1)
+        logging.info(f"Diagram cache miss: {source}")
+        yield from self.store(key, parse(), dependencies)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit and miss counters accumulated across runs.
+        """
+        try:
+            with open(os.path.join(self.directory, DiagramCache.STATS_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def save_stats(self, hits: int = 0, misses: int = 0):
+        """
+        Adds to the hit and miss counters accumulated across runs. The file is replaced,
+        never rewritten in place, so a reader or a crash can't see it half written.
+        """
+        stats = self.stats()
+        stats["hits"] = stats.get("hits", 0) + hits
+        stats["misses"] = stats.get("misses", 0) + misses
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                    json.dump(stats, file)
+                os.replace(temp_path, os.path.join(self.directory, DiagramCache.STATS_FILE))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as error:
+            logging.warning(f"Could not update diagram cache stats: {error}")
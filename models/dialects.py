@@ -0,0 +1,322 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Union, List, Iterable, Iterator, Tuple
+
+
+
+# <--------------------------- DiagramDialect ---------------------------->
+# <--------------------------- DiagramDialect ---------------------------->
+
+class DiagramDialect(ABC):
+    """
+    Turns the lines of one diagram notation into (depth, name, is folder) tokens.
+    """
+
+    name = ''
+    # Notations that don't mark folders get them from the entries nested below.
+    infer_folders = False
+
+    @abstractmethod
+    def tokenize_line(self, line: str) -> Union[None, Tuple[int, str, bool]]:
+        """
+        Splits a single line into its depth, name and folder flag.
+        """
+        pass
+
+    @abstractmethod
+    def score(self, lines: List[str]) -> int:
+        """
+        Rates how likely the sample lines are written in this dialect.
+        """
+        pass
+
+    def prepare(self, lines: List[str]) -> 'DiagramDialect':
+        """
+        Returns the dialect configured for a sample of the source.
+        """
+        return self
+
+    def tokenize(self, lines: Iterable[str]) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Yields (line number, depth, name, is folder) for every entry line.
+        """
+        tokenize_line = self.tokenize_line
+        for line_no, line in enumerate(lines, 1):
+            token = tokenize_line(line)
+            if token:
+                yield (line_no,) + token
+
+    @staticmethod
+    def split_name(name: str) -> Tuple[str, bool]:
+        """
+        Strips the trailing folder marker from a name.
+        """
+        if name.endswith('/'):
+            return name[:-1], True
+        return name, False
+
+
+# <--------------------------- BoxDialect ---------------------------->
+# <--------------------------- BoxDialect ---------------------------->
+
+class BoxDialect(DiagramDialect):
+    """
+    `├──` / `└──` / `│` diagrams indented by four columns per level.
+
+    A root line such as `my-app/`, written in column 0 without a connector, is the parent
+    of the entries below it when the next entry has its connector in column 0 as well;
+    everything up to the next root line is then nested one level deeper.
+    """
+
+    name = 'box'
+    PREFIX_CHARS = ' │├└─'
+    CONNECTOR_CHARS = ('├', '└')
+    INDENT_WIDTH = 4
+
+    def find_connector(self, line: str, prefix_length: int) -> int:
+        """
+        Returns the column of the last connector in the prefix, or -1.
+        """
+        return max(line.rfind(char, 0, prefix_length) for char in self.CONNECTOR_CHARS)
+
+    def tokenize_line(self, line: str) -> Union[None, Tuple[int, str, bool]]:
+        stripped_line = line.rstrip()
+        item = stripped_line.lstrip(self.PREFIX_CHARS)
+        prefix_length = len(stripped_line) - len(item)
+        connector = self.find_connector(stripped_line, prefix_length)
+        if not item and connector < 0:
+            return None
+        depth = (connector if connector >= 0 else prefix_length) // self.INDENT_WIDTH
+        return (depth,) + DiagramDialect.split_name(item.strip())
+
+    def is_root_line(self, line: str) -> bool:
+        """
+        Checks whether an entry line starts in column 0 without a connector.
+        """
+        return line[:1] not in self.PREFIX_CHARS
+
+    @staticmethod
+    def nest_depth(depth: int, is_root: bool, shift: int, is_pending: bool) -> Tuple[int, int, bool]:
+        """
+        Applies the root line rule to the depth of an entry, given the shift and whether
+        a root line still waits for its first child. Returns the nested depth and the
+        state after the entry.
+        """
+        if is_root:
+            return depth, 0, True
+        if is_pending:
+            shift = 1 if depth == 0 else 0
+        return depth + shift, shift, False
+
+    def tokenize(self, lines: Iterable[str]) -> Iterator[Tuple[int, int, str, bool]]:
+        tokenize_line = self.tokenize_line
+        prefix_chars = self.PREFIX_CHARS
+        shift, is_pending = 0, False
+        for line_no, line in enumerate(lines, 1):
+            token = tokenize_line(line)
+            if not token:
+                continue
+            # `nest_depth`, inlined since this runs once per line.
+            if line[:1] not in prefix_chars:
+                shift, is_pending = 0, True
+                yield (line_no,) + token
+                continue
+            if is_pending:
+                shift, is_pending = (1 if token[0] == 0 else 0), False
+            yield (line_no, token[0] + shift) + token[1:]
+
+    def score(self, lines: List[str]) -> int:
+        return sum(1 for line in lines if '├' in line or '└' in line)
+
+    def is_listing_root(self, line: str) -> bool:
+        """
+        Checks whether the first line of a diagram is the root `tree` prints above the
+        entries, which isn't an entry itself.
+        """
+        return line.strip() == '.'
+
+    def strip_listing(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Blanks out the root and summary lines of `tree` output, keeping the line numbers.
+        """
+        is_first = True
+        for line in lines:
+            stripped_line = line.strip()
+            if not stripped_line:
+                yield line
+                continue
+            if (is_first and self.is_listing_root(line)) or GnuTreeDialect.SUMMARY_PATTERN.match(stripped_line):
+                line = ''
+            is_first = False
+            yield line
+
+
+# <--------------------------- GnuTreeDialect ---------------------------->
+# <--------------------------- GnuTreeDialect ---------------------------->
+
+class GnuTreeDialect(BoxDialect):
+    """
+    Output of GNU `tree`: a root line, no-break space indentation and a summary line.
+    """
+
+    name = 'gnu'
+    infer_folders = True
+    SUMMARY_PATTERN = re.compile(r'^\d+ director(y|ies)(, \d+ files?)?$')
+
+    def is_listing_root(self, line: str) -> bool:
+        # The root line names the listed folder itself, whatever its name.
+        return not any(char in line for char in self.CONNECTOR_CHARS)
+
+    def tokenize(self, lines: Iterable[str]) -> Iterator[Tuple[int, int, str, bool]]:
+        tokenize_line = self.tokenize_line
+        for line_no, line in enumerate(self.strip_listing(line.replace('\xa0', ' ') for line in lines), 1):
+            token = tokenize_line(line)
+            if token:
+                yield (line_no,) + token
+
+    def score(self, lines: List[str]) -> int:
+        entries = super().score(lines)
+        first_line = next((line.strip() for line in lines if line.strip()), '')
+        if entries and (first_line == '.' or any('\xa0' in line for line in lines) or any(GnuTreeDialect.SUMMARY_PATTERN.match(line.strip()) for line in lines)):
+            return entries + 1
+        return 0
+
+
+# <--------------------------- AsciiDialect ---------------------------->
+# <--------------------------- AsciiDialect ---------------------------->
+
+class AsciiDialect(BoxDialect):
+    """
+    `|--` / `+--` / `` `-- `` diagrams, as printed by `tree --charset=ascii`. Like GNU
+    `tree` output, a `.` root line and the summary line are skipped and folders are
+    inferred from their entries; another root line is kept as the parent of the entries
+    below it, as in box diagrams.
+    """
+
+    name = 'ascii'
+    infer_folders = True
+    PREFIX_CHARS = ' |+`-'
+    CONNECTOR_CHARS = ('|', '+', '`')
+    LINE_PATTERN = re.compile(r'^[ |]*[|+`]--')
+
+    def find_connector(self, line: str, prefix_length: int) -> int:
+        # '|' is also the continuation bar, so only a char followed by a dash connects.
+        for index in range(prefix_length - 2, -1, -1):
+            if line[index] in self.CONNECTOR_CHARS and line[index + 1] == '-':
+                return index
+        return -1
+
+    def tokenize(self, lines: Iterable[str]) -> Iterator[Tuple[int, int, str, bool]]:
+        return super().tokenize(self.strip_listing(lines))
+
+    def score(self, lines: List[str]) -> int:
+        return sum(1 for line in lines if AsciiDialect.LINE_PATTERN.match(line))
+
+
+# <--------------------------- TabDialect ---------------------------->
+# <--------------------------- TabDialect ---------------------------->
+
+class TabDialect(DiagramDialect):
+    """
+    Outlines indented by one tab per level.
+    """
+
+    name = 'tabs'
+    infer_folders = True
+
+    def tokenize_line(self, line: str) -> Union[None, Tuple[int, str, bool]]:
+        name = line.strip()
+        if not name:
+            return None
+        return (len(line) - len(line.lstrip('\t')),) + DiagramDialect.split_name(name)
+
+    def score(self, lines: List[str]) -> int:
+        return sum(1 for line in lines if line.startswith('\t'))
+
+
+# <--------------------------- MarkdownDialect ---------------------------->
+# <--------------------------- MarkdownDialect ---------------------------->
+
+class MarkdownDialect(DiagramDialect):
+    """
+    Nested markdown lists; other markdown lines are ignored.
+    """
+
+    name = 'markdown'
+    infer_folders = True
+    LINE_PATTERN = re.compile(r'^(?P<indent>[ \t]*)[-*+][ \t]+(?P<name>.*)$')
+
+    def __init__(self, indent_width: int = 2):
+        self.indent_width = indent_width
+
+    def prepare(self, lines: List[str]) -> 'MarkdownDialect':
+        indents = []
+        for line in lines:
+            match = MarkdownDialect.LINE_PATTERN.match(line.rstrip('\r\n'))
+            if match:
+                indent = len(match.group('indent').expandtabs(4))
+                if indent:
+                    indents.append(indent)
+        return MarkdownDialect(min(indents) if indents else self.indent_width)
+
+    def tokenize_line(self, line: str) -> Union[None, Tuple[int, str, bool]]:
+        match = MarkdownDialect.LINE_PATTERN.match(line.rstrip())
+        if not match:
+            return None
+        depth = len(match.group('indent').expandtabs(4)) // self.indent_width
+        return (depth,) + DiagramDialect.split_name(match.group('name').strip().strip('`').strip())
+
+    def score(self, lines: List[str]) -> int:
+        return sum(1 for line in lines if MarkdownDialect.LINE_PATTERN.match(line.rstrip()))
+
+
+# <--------------------------- DialectRegistry ---------------------------->
+# <--------------------------- DialectRegistry ---------------------------->
+
+class DialectRegistry:
+    __dialects__: List[DiagramDialect] = []
+
+    # Only this many characters from the start of a source are used to pick its dialect.
+    SAMPLE_SIZE = 4096
+
+    @staticmethod
+    def register(dialect: DiagramDialect):
+        DialectRegistry.__dialects__.append(dialect)
+        return dialect
+
+    @staticmethod
+    def get(name: str) -> Union[None, DiagramDialect]:
+        for dialect in DialectRegistry.__dialects__:
+            if dialect.name == name:
+                return dialect
+        return None
+
+    @staticmethod
+    def get_all() -> List[DiagramDialect]:
+        return DialectRegistry.__dialects__
+
+    @staticmethod
+    def get_names() -> List[str]:
+        return [dialect.name for dialect in DialectRegistry.__dialects__]
+
+    @staticmethod
+    def sniff(sample: str) -> DiagramDialect:
+        """
+        Picks the dialect that best matches a sample; earlier registrations win ties.
+        """
+        lines = sample.splitlines()
+        if len(sample) >= DialectRegistry.SAMPLE_SIZE and lines:
+            lines.pop()
+        best, best_score = DialectRegistry.__dialects__[0], 0
+        for dialect in DialectRegistry.__dialects__:
+            score = dialect.score(lines)
+            if score > best_score:
+                best, best_score = dialect, score
+        return best
+
+
+DialectRegistry.register(BoxDialect())
+DialectRegistry.register(GnuTreeDialect())
+DialectRegistry.register(AsciiDialect())
+DialectRegistry.register(MarkdownDialect())
+DialectRegistry.register(TabDialect())
@@ -0,0 +1,130 @@
+import re
+from typing import Union, List, Iterable, Iterator, Tuple, Callable
+
+
+
+# <--------------------------- BraceExpander ---------------------------->
+# <--------------------------- BraceExpander ---------------------------->
+
+class BraceExpander:
+    """
+    Shell style brace expansion for diagram entries: `user_{model,controller}.ts`,
+    `shard_{000..999}/`, `{a..f}` and `{0..100..10}`. Braces that hold neither a
+    comma list nor a range are kept as they are.
+    """
+
+    RANGE_PATTERN = re.compile(r'^(-?\d+)\.\.(-?\d+)(?:\.\.(-?\d+))?$')
+    CHAR_RANGE_PATTERN = re.compile(r'^([A-Za-z])\.\.([A-Za-z])(?:\.\.(-?\d+))?$')
+
+    @staticmethod
+    def has_expansion(name: str) -> bool:
+        return '{' in name and BraceExpander.find_group(name) is not None
+
+    @staticmethod
+    def find_group(text: str) -> Union[None, Tuple[int, int, Callable[[], Iterable[str]]]]:
+        """
+        Returns the start and end of the first expandable group and a factory for its options.
+        """
+        start = text.find('{')
+        while start >= 0:
+            depth = 0
+            commas = []
+            end = -1
+            for index in range(start, len(text)):
+                char = text[index]
+                if char == '{':
+                    depth += 1
+                elif char == '}':
+                    depth -= 1
+                    if depth == 0:
+                        end = index
+                        break
+                elif char == ',' and depth == 1:
+                    commas.append(index)
+            if end < 0:
+                return None
+            if commas:
+                bounds = [start] + commas + [end]
+                options = [text[bounds[index] + 1:bounds[index + 1]] for index in range(len(bounds) - 1)]
+                return start, end, lambda: options
+            content = text[start + 1:end]
+            match = BraceExpander.RANGE_PATTERN.match(content)
+            if match:
+                return start, end, lambda: BraceExpander.number_range(*match.groups())
+            match = BraceExpander.CHAR_RANGE_PATTERN.match(content)
+            if match:
+                return start, end, lambda: BraceExpander.char_range(*match.groups())
+            start = text.find('{', start + 1)
+        return None
+
+    @staticmethod
+    def get_step(first: int, last: int, step: Union[None, str]) -> int:
+        step = abs(int(step)) if step else 1
+        return (step or 1) if last >= first else -(step or 1)
+
+    @staticmethod
+    def number_range(first: str, last: str, step: Union[None, str] = None) -> Iterator[str]:
+        """
+        Yields a numeric range, zero padded when either end is written with leading zeros.
+        """
+        is_padded = any(len(value.lstrip('-')) > 1 and value.lstrip('-')[0] == '0' for value in (first, last))
+        width = max(len(first), len(last)) if is_padded else 0
+        first_value, last_value = int(first), int(last)
+        step_value = BraceExpander.get_step(first_value, last_value, step)
+        for value in range(first_value, last_value + (1 if step_value > 0 else -1), step_value):
+            yield str(value).zfill(width) if width else str(value)
+
+    @staticmethod
+    def char_range(first: str, last: str, step: Union[None, str] = None) -> Iterator[str]:
+        step_value = BraceExpander.get_step(ord(first), ord(last), step)
+        for value in range(ord(first), ord(last) + (1 if step_value > 0 else -1), step_value):
+            yield chr(value)
+
+    @staticmethod
+    def expand(text: str) -> Iterator[str]:
+        """
+        Lazily yields every expansion of a name, left to right like the shell.
+        """
+        group = BraceExpander.find_group(text)
+        if group is None:
+            yield text
+            return
+        start, end, options = group
+        prefix, suffix = text[:start], text[end + 1:]
+        has_suffix_braces = '{' in suffix
+        for option in options():
+            for expanded_option in (BraceExpander.expand(option) if '{' in option else (option,)):
+                if has_suffix_braces:
+                    for rest in BraceExpander.expand(suffix):
+                        yield prefix + expanded_option + rest
+                else:
+                    yield prefix + expanded_option + suffix
+
+    @staticmethod
+    def expand_tokens(tokens: Iterable[Tuple[int, int, str, bool]]) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Expands (line number, depth, name, is folder) tokens. The entries nested under
+        an expanded folder are buffered once, as written, and replayed for every copy,
+        so memory follows the size of the spec rather than of the expanded tree.
+        """
+        tokens = iter(tokens)
+        token = next(tokens, None)
+        while token is not None:
+            line_no, depth, name, is_folder = token
+            if not BraceExpander.has_expansion(name):
+                yield token
+                token = next(tokens, None)
+                continue
+            if not is_folder:
+                for expanded_name in BraceExpander.expand(name):
+                    yield line_no, depth, expanded_name, False
+                token = next(tokens, None)
+                continue
+            subtree: List[Tuple[int, int, str, bool]] = []
+            token = next(tokens, None)
+            while token is not None and token[1] > depth:
+                subtree.append(token)
+                token = next(tokens, None)
+            for expanded_name in BraceExpander.expand(name):
+                yield line_no, depth, expanded_name, True
+                yield from BraceExpander.expand_tokens(subtree)
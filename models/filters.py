@@ -0,0 +1,169 @@
+import re
+from models.parser import DiagramRecord
+from typing import Union, List, Iterable, Iterator, Tuple, Any
+
+
+
+# <--------------------------- PathPattern ---------------------------->
+# <--------------------------- PathPattern ---------------------------->
+
+class PathPattern:
+    """
+    Glob over '/' separated entry paths: `*` and `?` stay within a name, `**` spans
+    folders, and a pattern without '/' matches the name at any depth.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.segments = [segment for segment in pattern.strip('/').split('/') if segment]
+        self.segment_patterns = [None if segment == '**' else re.compile(PathPattern.translate(segment) + r'\Z') for segment in self.segments]
+        if len(self.segments) == 1 and self.segments[0] != '**':
+            self.regex = re.compile(r'(?:.*/)?' + PathPattern.translate(self.segments[0]) + r'\Z', re.DOTALL)
+            self.is_anywhere = True
+        else:
+            self.regex = re.compile(PathPattern.translate_path(self.segments) + r'\Z', re.DOTALL)
+            self.is_anywhere = False
+
+    @staticmethod
+    def translate(segment: str) -> str:
+        """
+        Translates one glob segment into a regex that never crosses a '/'.
+        """
+        result = ''
+        index = 0
+        while index < len(segment):
+            char = segment[index]
+            if char == '*':
+                result += '[^/]*'
+            elif char == '?':
+                result += '[^/]'
+            elif char == '[':
+                end = segment.find(']', index + 2)
+                if end < 0:
+                    result += re.escape(char)
+                else:
+                    chars = segment[index + 1:end].replace('\\', '\\\\')
+                    result += '[' + ('^' + chars[1:] if chars[0] in '!^' else chars) + ']'
+                    index = end
+            else:
+                result += re.escape(char)
+            index += 1
+        return result
+
+    @staticmethod
+    def translate_path(segments: List[str]) -> str:
+        result = ''
+        for index, segment in enumerate(segments):
+            is_last = index == len(segments) - 1
+            if segment == '**':
+                result += '.*' if is_last else '(?:[^/]+/)*'
+            else:
+                result += PathPattern.translate(segment) + ('' if is_last else '/')
+        return result
+
+    def matches(self, path: str) -> bool:
+        return self.regex.match(path) is not None
+
+    def could_match_below(self, names: List[str]) -> bool:
+        """
+        Checks whether an entry below the folder with these names could still match.
+        """
+        if self.is_anywhere:
+            return True
+        return PathPattern.match_prefix(self.segment_patterns, 0, names, 0)
+
+    @staticmethod
+    def match_prefix(patterns: List[Union[None, re.Pattern]], pattern_index: int, names: List[str], name_index: int) -> bool:
+        if name_index == len(names):
+            return pattern_index < len(patterns)
+        if pattern_index == len(patterns):
+            return False
+        if patterns[pattern_index] is None:
+            return True
+        if not patterns[pattern_index].match(names[name_index]):
+            return False
+        return PathPattern.match_prefix(patterns, pattern_index + 1, names, name_index + 1)
+
+
+# <--------------------------- PathFilter ---------------------------->
+# <--------------------------- PathFilter ---------------------------->
+
+class PathFilter:
+    """
+    Selects the entries of a diagram while it is read. Excluded or too deep entries
+    are dropped with their whole subtree; with include patterns, only matching entries,
+    everything inside matching folders, and the folders leading to them are kept.
+    """
+
+    def __init__(self, includes: Union[None, List[str]] = None, excludes: Union[None, List[str]] = None, max_depth: Union[None, int] = None):
+        self.includes = [PathPattern(pattern) for pattern in includes or []]
+        self.excludes = [PathPattern(pattern) for pattern in excludes or []]
+        if max_depth is not None and max_depth < 1:
+            raise ValueError("Maximum depth must be at least 1.")
+        self.max_depth = max_depth
+
+    def is_active(self) -> bool:
+        return bool(self.includes or self.excludes or self.max_depth is not None)
+
+    def describe(self) -> str:
+        """
+        Returns a stable description, used to key cached results.
+        """
+        includes = ','.join(pattern.pattern for pattern in self.includes)
+        excludes = ','.join(pattern.pattern for pattern in self.excludes)
+        return f"include={includes};exclude={excludes};max_depth={self.max_depth}"
+
+    def select(self, entries: Iterable[Tuple[int, str, bool, Any]]) -> Iterator[Any]:
+        """
+        Yields the item of every selected (depth, name, is folder, item) entry.
+        """
+        names: List[str] = []
+        # Folders kept only as a way to a match, emitted once a match shows up below them.
+        pending: List[Tuple[int, Any]] = []
+        skip_depth = None
+        included_depth = None
+        for depth, name, is_folder, item in entries:
+            if skip_depth is not None:
+                if depth > skip_depth:
+                    continue
+                skip_depth = None
+            if self.max_depth is not None and depth >= self.max_depth:
+                continue
+            if depth > len(names):
+                # Malformed nesting is left for the parser to report.
+                yield item
+                continue
+            del names[depth:]
+            names.append(name)
+            while pending and pending[-1][0] >= depth:
+                pending.pop()
+            if included_depth is not None and depth <= included_depth:
+                included_depth = None
+            path = '/'.join(names)
+            if any(pattern.matches(path) for pattern in self.excludes):
+                skip_depth = depth
+                continue
+            if self.includes and included_depth is None:
+                if any(pattern.matches(path) for pattern in self.includes):
+                    if is_folder:
+                        included_depth = depth
+                elif is_folder and any(pattern.could_match_below(names) for pattern in self.includes):
+                    pending.append((depth, item))
+                    continue
+                else:
+                    skip_depth = depth
+                    continue
+            for _, pending_item in pending:
+                yield pending_item
+            pending.clear()
+            yield item
+
+    def filter_tokens(self, tokens: Iterable[Tuple[int, int, str, bool]]) -> Iterator[Tuple[int, int, str, bool]]:
+        if not self.is_active():
+            return iter(tokens)
+        return self.select((token[1], token[2], token[3], token) for token in tokens)
+
+    def filter_records(self, records: Iterable[DiagramRecord]) -> Iterator[DiagramRecord]:
+        if not self.is_active():
+            return iter(records)
+        return self.select((record.depth, record.name, record.is_folder, record) for record in records)
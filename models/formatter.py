@@ -0,0 +1,193 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+from itertools import zip_longest
+from utils.helpers import PathUtils
+from models.parser import DiagramParser
+from models.dialects import DialectRegistry, BoxDialect, AsciiDialect
+from typing import Union, List, Iterable, Iterator, Tuple
+
+
+
+# <--------------------------- Formatter ---------------------------->
+# <--------------------------- Formatter ---------------------------->
+
+class Formatter:
+    """
+    Rewrites diagrams with canonical `├──` / `└──` connectors and `│` bars.
+    """
+
+    BRANCH = '├── '
+    LAST_BRANCH = '└── '
+    BAR = '│   '
+    SPACE = '    '
+
+    @staticmethod
+    def parse_arguments(parser):
+        parser.add_argument('-w', '--write', action="store_true", default=False, help="Rewrite the files in place instead of printing them.")
+        parser.add_argument('--check', action="store_true", default=False, help="Only report files that aren't formatted, and fail if there are any.")
+        parser.add_argument('--dialect', type=str, choices=['auto'] + DialectRegistry.get_names(), default='auto', help="Notation of the diagrams. Default is 'auto'.")
+        parser.add_argument('sources', nargs='+', type=str, help="Diagram files to format, or '-' for stdin.")
+
+    @staticmethod
+    def handle_request(args):
+        request_data = {
+            "args": args.__dict__,
+        }
+        if request_data['args']['write'] and DiagramParser.STDIN in request_data['args']['sources']:
+            raise ValueError("Stdin can't be formatted in place.")
+        results = Formatter.handle_format(request_data)
+        return Formatter.handle_response(results)
+
+    @staticmethod
+    def get_last_flags(tokens: Iterable[Tuple[int, int, str, bool]]) -> bytearray:
+        """
+        First pass: returns a bitmap with the bit of every entry that has no later sibling.
+        """
+        flags = bytearray()
+        stack: List[Tuple[int, int]] = []
+        index = -1
+        for index, (_, depth, _, _) in enumerate(tokens):
+            if index & 7 == 0:
+                flags.append(0)
+            while stack and stack[-1][0] > depth:
+                last = stack.pop()[1]
+                flags[last >> 3] |= 1 << (last & 7)
+            if stack and stack[-1][0] == depth:
+                stack.pop()
+            stack.append((depth, index))
+        for _, last in stack:
+            flags[last >> 3] |= 1 << (last & 7)
+        return flags
+
+    @staticmethod
+    def format_tokens(tokens: Iterable[Tuple[int, int, str, bool]], flags: bytearray, has_roots: bool = False) -> Iterator[str]:
+        """
+        Second pass: yields the canonical line of every entry. With `has_roots`, top-level
+        entries are written as root lines and their children start in column 0.
+        """
+        # prefixes[depth] is the run of bars and spaces in front of an entry at that depth.
+        prefixes = ['']
+        for index, (_, depth, name, is_folder) in enumerate(tokens):
+            if has_roots and depth == 0:
+                prefixes = ['', '']
+                yield name + ('/' if is_folder else '') + '\n'
+                continue
+            is_last = flags[index >> 3] & (1 << (index & 7))
+            del prefixes[depth + 1:]
+            prefix = prefixes[depth]
+            yield prefix + (Formatter.LAST_BRANCH if is_last else Formatter.BRANCH) + name + ('/' if is_folder else '') + '\n'
+            prefixes.append(prefix + (Formatter.SPACE if is_last else Formatter.BAR))
+
+    @staticmethod
+    def has_root_lines(source: str, dialect: Union[None, str] = None) -> bool:
+        """
+        Checks whether a box or ascii diagram opens with a root line such as `my-app/`,
+        so its formatted version keeps root lines.
+        """
+        with Formatter.get_opener(source)(source, 'rt', encoding='utf-8') as file:
+            sample = file.read(DialectRegistry.SAMPLE_SIZE)
+        resolved = DiagramParser.get_dialect(dialect) or DialectRegistry.sniff(sample)
+        if resolved.name not in (BoxDialect.name, AsciiDialect.name):
+            return False
+        return resolved.is_root_line(next((line for line in resolved.strip_listing(sample.splitlines()) if line.strip()), ' '))
+
+    @staticmethod
+    def format_lines(source: str, dialect: Union[None, str] = None) -> Iterator[str]:
+        """
+        Yields the formatted lines of a diagram file, reading it twice so only one bit
+        per entry is kept between the passes.
+        """
+        tokens = lambda: DiagramParser.tokens(source, DiagramParser.Modes.MMAP, dialect)
+        # Validate while taking the flags, so a broken diagram is never rewritten.
+        records = DiagramParser.iter_records(tokens())
+        flags = Formatter.get_last_flags((0, record.depth, record.name, record.is_folder) for record in records)
+        return Formatter.format_tokens(tokens(), flags, Formatter.has_root_lines(source, dialect))
+
+    @staticmethod
+    def get_opener(path: str):
+        return DiagramParser.COMPRESSED_OPENERS.get(PathUtils.get_file_extension(path).lower(), open)
+
+    @staticmethod
+    def is_formatted(source: str, lines: Iterable[str]) -> bool:
+        """
+        Compares a file with formatted lines, one line at a time.
+        """
+        with Formatter.get_opener(source)(source, 'rt', encoding='utf-8', newline='') as file:
+            for line, formatted_line in zip_longest(file, lines):
+                if line != formatted_line:
+                    return False
+            return True
+
+    @staticmethod
+    def write_lines(source: str, lines: Iterable[str]) -> bool:
+        """
+        Replaces a file with the formatted lines, keeping its compression. Returns
+        False and leaves the file untouched when nothing changed.
+        """
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(source)), suffix='.tmp')
+        os.close(descriptor)
+        try:
+            opener = Formatter.get_opener(source)
+            with opener(temp_path, 'wt', encoding='utf-8', newline='\n') as file:
+                file.writelines(lines)
+            with opener(temp_path, 'rt', encoding='utf-8', newline='') as file:
+                if Formatter.is_formatted(source, file):
+                    os.remove(temp_path)
+                    return False
+            shutil.copymode(source, temp_path)
+            os.replace(temp_path, source)
+            return True
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def spool_stdin() -> str:
+        """
+        Copies stdin to a temporary file, since formatting reads the diagram twice.
+        """
+        descriptor, temp_path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(descriptor, 'wb') as file:
+            shutil.copyfileobj(sys.stdin.buffer, file)
+        return temp_path
+
+    @staticmethod
+    def handle_format(request_data):
+        args = request_data['args']
+        dialect = None if args['dialect'] == 'auto' else args['dialect']
+        unformatted = []
+        for source in args['sources']:
+            path = Formatter.spool_stdin() if DiagramParser.is_stdin(source) else source
+            try:
+                lines = Formatter.format_lines(path, dialect)
+                if args['check']:
+                    if not Formatter.is_formatted(path, lines):
+                        unformatted.append(source)
+                elif args['write']:
+                    if Formatter.write_lines(path, lines):
+                        unformatted.append(source)
+                        logging.info(f"Formatted diagram: {source}")
+                else:
+                    sys.stdout.writelines(lines)
+            except ValueError as error:
+                raise ValueError(f"{source}: {error}")
+            finally:
+                if path is not source:
+                    os.remove(path)
+        if args['check'] and unformatted:
+            return {"status": False, "message": '\n'.join(f"Would reformat: {source}" for source in unformatted)}
+        if args['write']:
+            return {"status": True, "message": f"Formatted {len(unformatted)} of {len(args['sources'])} diagrams."}
+        return {"status": True, "message": ""}
+
+    @staticmethod
+    def handle_response(results):
+        if results["message"]:
+            print(results["message"], file=sys.stdout if results["status"] else sys.stderr)
+        if not results["status"]:
+            sys.exit(1)
+        return results
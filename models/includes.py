@@ -0,0 +1,138 @@
+import os
+import logging
+from collections import OrderedDict
+from typing import Union, List, Iterable, Iterator, Dict, Tuple, TextIO
+
+
+
+# <--------------------------- DiagramIncluder ---------------------------->
+# <--------------------------- DiagramIncluder ---------------------------->
+
+class DiagramIncluder:
+    """
+    Splices `@include <path>` entries with the entries of another diagram, placed
+    under the include's parent. Every included file is parsed once and kept as a
+    subtree until it changes, or until the least recently used subtrees make room
+    for others.
+    """
+
+    DIRECTIVE = '@include'
+    # Tokens kept across all cached subtrees, so a long-running process stays bounded.
+    MAX_CACHED_TOKENS = 1 << 20
+    # path -> (mtime, resolved tokens, mtimes of the files it includes in turn), least recently used first.
+    __subtrees__: 'OrderedDict[str, Tuple[int, List[Tuple[int, int, str, bool]], Dict[str, int]]]' = OrderedDict()
+    __cached_tokens__ = 0
+
+    NESTED_ERROR = "'{name}' can't have nested entries."
+    MISSING_ERROR = "included file '{path}' does not exist."
+    CYCLE_ERROR = "include cycle: {cycle}."
+
+    def __init__(self):
+        # Path -> mtime of every file included so far, for cache invalidation.
+        self.dependencies: Dict[str, int] = {}
+
+    @staticmethod
+    def get_include_path(name: str) -> Union[None, str]:
+        """
+        Returns the path of an include entry, or None for a regular entry.
+        """
+        if not name.startswith(DiagramIncluder.DIRECTIVE):
+            return None
+        path = name[len(DiagramIncluder.DIRECTIVE):]
+        if path[:1] not in (' ', '\t'):
+            return None
+        return path.strip().strip('"\'') or None
+
+    @staticmethod
+    def get_base_dir(source: Union[str, TextIO]) -> str:
+        """
+        Returns the folder that relative includes of a source are resolved against.
+        """
+        from models.parser import DiagramParser
+        if isinstance(source, str) and not DiagramParser.is_stdin(source):
+            return os.path.dirname(os.path.abspath(source))
+        return os.getcwd()
+
+    @staticmethod
+    def is_fresh(dependencies: Dict[str, int]) -> bool:
+        """
+        Checks that none of the files changed since they were parsed.
+        """
+        for path, mtime in dependencies.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def clear():
+        DiagramIncluder.__subtrees__.clear()
+        DiagramIncluder.__cached_tokens__ = 0
+
+    @staticmethod
+    def store(path: str, cached: Tuple[int, List[Tuple[int, int, str, bool]], Dict[str, int]]):
+        """
+        Caches the subtree of a file in place of an older one, then drops the least
+        recently used subtrees until the cache fits in MAX_CACHED_TOKENS again.
+        """
+        previous = DiagramIncluder.__subtrees__.pop(path, None)
+        if previous is not None:
+            DiagramIncluder.__cached_tokens__ -= len(previous[1])
+        DiagramIncluder.__subtrees__[path] = cached
+        DiagramIncluder.__cached_tokens__ += len(cached[1])
+        while DiagramIncluder.__cached_tokens__ > DiagramIncluder.MAX_CACHED_TOKENS:
+            _, evicted = DiagramIncluder.__subtrees__.popitem(last=False)
+            DiagramIncluder.__cached_tokens__ -= len(evicted[1])
+
+    def resolve(self, tokens: Iterable[Tuple[int, int, str, bool]], base_dir: str, chain: Tuple[str, ...] = ()) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Yields the tokens with every include replaced by the cached subtree of its file,
+        shifted to the depth of the include.
+        """
+        from models.parser import DiagramParser
+        include = None
+        for token in tokens:
+            line_no, depth, name, is_folder = token
+            if include and depth > include[1]:
+                raise DiagramParser.line_error(line_no, DiagramIncluder.NESTED_ERROR, name=include[0])
+            include_path = DiagramIncluder.get_include_path(name)
+            if include_path is None:
+                include = None
+                yield token
+                continue
+            include = (name, depth)
+            for _, sub_depth, sub_name, sub_is_folder in self.get_subtree(os.path.join(base_dir, include_path), chain, line_no):
+                yield line_no, depth + sub_depth, sub_name, sub_is_folder
+
+    def get_subtree(self, path: str, chain: Tuple[str, ...], line_no: int) -> List[Tuple[int, int, str, bool]]:
+        """
+        Returns the resolved tokens of an included file, parsing it on first use.
+        """
+        from models.parser import DiagramParser
+        path = os.path.realpath(path)
+        if path in chain:
+            cycle = ' -> '.join(os.path.basename(item) for item in chain + (path,))
+            raise DiagramParser.line_error(line_no, DiagramIncluder.CYCLE_ERROR, cycle=cycle)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            raise DiagramParser.line_error(line_no, DiagramIncluder.MISSING_ERROR, path=path)
+        cached = DiagramIncluder.__subtrees__.get(path)
+        if cached is not None and cached[0] == mtime and DiagramIncluder.is_fresh(cached[2]):
+            DiagramIncluder.__subtrees__.move_to_end(path)
+        else:
+            nested = DiagramIncluder()
+            try:
+                subtree = list(nested.resolve(DiagramParser.tokens(path), os.path.dirname(path), chain + (path,)))
+                for _ in DiagramParser.iter_records(subtree):
+                    pass
+            except ValueError as error:
+                raise ValueError(f"In included file '{path}': {error}")
+            cached = (mtime, subtree, nested.dependencies)
+            DiagramIncluder.store(path, cached)
+            logging.info(f"Parsed included diagram: {path} ({len(subtree)} entries)")
+        self.dependencies[path] = mtime
+        self.dependencies.update(cached[2])
+        return cached[1]
@@ -0,0 +1,217 @@
+import os
+import logging
+from models.parser import DiagramParser
+from models.dialects import BoxDialect
+from models.tree2 import ContainerNode, Node, Tree
+from typing import Union, List, Iterable, Dict, Tuple, TextIO
+
+
+
+# <--------------------------- ParseState ---------------------------->
+# <--------------------------- ParseState ---------------------------->
+
+class ParseState:
+    """
+    Keeps the per-line parse of a diagram next to its tree, so line edits can be
+    patched into the existing nodes instead of re-parsing the whole diagram.
+    """
+
+    def __init__(self, tree: Tree, tokens: List[Union[None, Tuple[int, str, bool]]], shifts: List[Union[None, int]], nodes: List[Union[None, Node, ContainerNode]]):
+        self.tree = tree
+        self.tokens = tokens
+        # Depth added to every line by a root line above it, None for root lines themselves.
+        self.shifts = shifts
+        self.nodes = nodes
+
+    @staticmethod
+    def parse(source: Union[str, TextIO], root_name: Union[None, str] = None) -> 'ParseState':
+        """
+        Parses a whole diagram and keeps the state needed for incremental updates.
+        """
+        if root_name is None:
+            root_name = DiagramParser.get_root_name(source)
+        file = DiagramParser.open_source(source)
+        try:
+            tokens, shifts, _, _ = ParseState.tokenize(file, 0, False)
+        finally:
+            DiagramParser.close_source(file, source)
+        root = ContainerNode._create_root(root_name)
+        state = ParseState(Tree(root), tokens, shifts, [None] * len(tokens))
+        numbered = [(index + 1,) + token for index, token in enumerate(tokens) if token]
+        nodes = ParseState.build_nodes(numbered, [root])
+        state.insert(nodes, [root])
+        for (line_no, *_), node in zip(numbered, nodes):
+            state.nodes[line_no - 1] = node
+        return state
+
+    @staticmethod
+    def tokenize(lines: Iterable[str], shift: int, is_pending: bool) -> Tuple[List[Union[None, Tuple[int, str, bool]]], List[Union[None, int]], int, bool]:
+        """
+        Tokenizes lines with the root line rule of `BoxDialect`, starting from the state
+        left by the lines before them. Returns the tokens, their shifts and the state after them.
+        """
+        tokens, shifts = [], []
+        for line in lines:
+            token = DiagramParser.tokenize_line(line)
+            if token is None:
+                tokens.append(None)
+                shifts.append(0)
+                continue
+            is_root = DiagramParser.is_root_line(line)
+            depth, shift, is_pending = BoxDialect.nest_depth(token[0], is_root, shift, is_pending)
+            tokens.append((depth,) + token[1:])
+            shifts.append(None if is_root else shift)
+        return tokens, shifts, shift, is_pending
+
+    def get_nesting(self, start: int) -> Tuple[int, bool]:
+        """
+        Returns the (shift, is pending) state of the root line rule before a line.
+        """
+        for index in range(min(start, len(self.tokens)) - 1, -1, -1):
+            if self.tokens[index]:
+                shift = self.shifts[index]
+                return (0, True) if shift is None else (shift, False)
+        return 0, False
+
+    def renest(self, start: int, shift: int, is_pending: bool) -> Tuple[List[Union[None, Tuple[int, str, bool]]], List[Union[None, int]]]:
+        """
+        Re-applies the root line rule to the lines from `start` on, which now follow the
+        given state. Returns the tokens and shifts of the lines that change, which end at
+        the next root line at the latest.
+        """
+        for index in range(start, len(self.tokens)):
+            token = self.tokens[index]
+            if token is None:
+                continue
+            old_shift = self.shifts[index]
+            if old_shift is None:
+                break
+            if is_pending:
+                shift = 1 if token[0] - old_shift == 0 else 0
+            if shift == old_shift:
+                break
+            tokens, shifts = [], []
+            for index in range(start, len(self.tokens)):
+                token, old_shift = self.tokens[index], self.shifts[index]
+                if old_shift is None:
+                    break
+                tokens.append(token and (token[0] - old_shift + shift,) + token[1:])
+                shifts.append(shift if token else 0)
+            return tokens, shifts
+        return [], []
+
+    @staticmethod
+    def build_nodes(tokens: List[Tuple[int, int, str, bool]], chain: List[Union[Node, ContainerNode]]) -> List[Union[Node, ContainerNode]]:
+        """
+        Validates the tokens below an ancestor chain and creates their nodes, with
+        parents set but not yet linked into the tree.
+        """
+        seed = []
+        for ancestor in chain[1:]:
+            seed.append((os.path.join(seed[-1][0], ancestor.name) if seed else ancestor.name, ancestor.is_container()))
+        # Validate everything first, so a bad edit never leaves a half patched tree.
+        records = list(DiagramParser.iter_records(tokens, seed))
+        stack = list(chain)
+        nodes = []
+        for record in records:
+            del stack[record.depth + 1:]
+            node = ContainerNode(record.name) if record.is_folder else Node(record.name)
+            node.parent = stack[-1]
+            stack.append(node)
+            nodes.append(node)
+        return nodes
+
+    def apply(self, start: int, end: int, lines: Iterable[str]) -> Dict:
+        """
+        Replaces the lines [start, end) (0-based) with new lines and patches the tree.
+        """
+        new_tokens, new_shifts, shift, is_pending = ParseState.tokenize(lines, *self.get_nesting(start))
+        # Adding or removing a root line moves the entries below it up to the next one.
+        nested_tokens, nested_shifts = self.renest(end, shift, is_pending)
+        nested_end = end + len(nested_tokens)
+        depths = [token[0] for token in self.tokens[start:nested_end] + new_tokens + nested_tokens if token]
+        if not depths:
+            self.tokens[start:end] = new_tokens
+            self.shifts[start:end] = new_shifts
+            self.nodes[start:end] = [None] * len(new_tokens)
+            return {"status": True, "message": "No entries changed.", "removed": 0, "added": 0}
+        # Entries after the edit that are deeper than anything it touched may now hang
+        # under a different parent, so they are re-parsed with it.
+        min_depth = min(depths)
+        stop = nested_end
+        while stop < len(self.tokens) and (self.tokens[stop] is None or self.tokens[stop][0] > min_depth):
+            stop += 1
+        region_tokens = new_tokens + nested_tokens + self.tokens[nested_end:stop]
+        region_shifts = new_shifts + nested_shifts + self.shifts[nested_end:stop]
+        chain = self.get_chain(start)
+        numbered = [(start + index + 1,) + token for index, token in enumerate(region_tokens) if token]
+        new_nodes = ParseState.build_nodes(numbered, chain)
+
+        removed = [node for node in self.nodes[start:stop] if node]
+        self.detach(removed)
+        self.insert(new_nodes, chain)
+
+        region_nodes: List[Union[None, Node, ContainerNode]] = [None] * len(region_tokens)
+        for (line_no, *_), node in zip(numbered, new_nodes):
+            region_nodes[line_no - start - 1] = node
+        self.tokens[start:stop] = region_tokens
+        self.shifts[start:stop] = region_shifts
+        self.nodes[start:stop] = region_nodes
+        logging.info(f"Re-parsed lines {start + 1}-{start + len(region_tokens)}: {len(removed)} removed, {len(new_nodes)} added.")
+        return {"status": True, "message": "Diagram updated.", "removed": len(removed), "added": len(new_nodes)}
+
+    def get_chain(self, start: int) -> List[Union[Node, ContainerNode]]:
+        """
+        Returns the root and the ancestors-or-self of the last entry before a line.
+        """
+        chain = []
+        for index in range(min(start, len(self.nodes)) - 1, -1, -1):
+            node = self.nodes[index]
+            if node:
+                while node is not self.tree.base_dir:
+                    chain.append(node)
+                    node = node.parent
+                break
+        chain.append(self.tree.base_dir)
+        chain.reverse()
+        return chain
+
+    def detach(self, nodes: List[Union[Node, ContainerNode]]):
+        """
+        Removes nodes from parents that stay in the tree.
+        """
+        removed = set(map(id, nodes))
+        parents = {id(node.parent): node.parent for node in nodes if id(node.parent) not in removed}
+        for parent in parents.values():
+            parent.children[:] = [child for child in parent.children if id(child) not in removed]
+            ParseState.renumber(parent, 0)
+
+    def insert(self, nodes: List[Union[Node, ContainerNode]], chain: List[Union[Node, ContainerNode]]):
+        """
+        Links new nodes into the tree, splicing the ones under the chain right after
+        the chain's own children.
+        """
+        chain_ids = {id(ancestor): index for index, ancestor in enumerate(chain)}
+        spliced: Dict[int, List[Union[Node, ContainerNode]]] = {}
+        for node in nodes:
+            parent = node.parent
+            index = chain_ids.get(id(parent))
+            if index is None:
+                parent.attach(node)
+            else:
+                spliced.setdefault(index, []).append(node)
+                node.path = os.path.join(parent.path, node.name)
+                node.level = parent.level + 1
+        for index, children in spliced.items():
+            parent = chain[index]
+            cursor = parent.children.index(chain[index + 1]) + 1 if index + 1 < len(chain) else 0
+            parent.children[cursor:cursor] = children
+            ParseState.renumber(parent, cursor)
+
+    @staticmethod
+    def renumber(parent: ContainerNode, start: int):
+        """
+        Refreshes the positions of a container's children from an index on.
+        """
+        for index in range(start, len(parent.children)):
+            parent.children[index].pos = index + 1
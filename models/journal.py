@@ -0,0 +1,136 @@
+import os
+import struct
+import hashlib
+import logging
+from models.plan import BuildPlan
+from models.parser import DiagramRecord
+from typing import Union, List, Iterator, Callable
+
+
+
+# <--------------------------- BuildJournal ---------------------------->
+# <--------------------------- BuildJournal ---------------------------->
+
+class BuildJournal:
+    """
+    Append-only record of the progress of a '--journal' build, kept next to the
+    destination as `.<name>.journal` and deleted once the build succeeds. Entries are built in plan
+    order, so progress is a count of completed operations, written once per batch; a
+    sharded build writes the index of every shard it completes instead.
+
+    Stored as the magic, the version and a fingerprint of the plan and its layout,
+    followed by one little-endian 64 bit number per record. A record torn by a crash
+    is ignored.
+    """
+
+    MAGIC = b'FGJL'
+    VERSION = 1
+    SUFFIX = '.journal'
+    HEADER = struct.Struct('<4sI16s')
+    RECORD = struct.Struct('<Q')
+    # Layout of a build that isn't sharded.
+    ORDERED_LAYOUT = 'ordered'
+    # Operations between two records of an ordered build; at most this many are redone on resume.
+    INTERVAL = 256
+
+    def __init__(self, path: str, descriptor: int, completed: List[int], is_resumed: bool = False):
+        self.path = path
+        self.descriptor = descriptor
+        self.completed = completed
+        # Whether an interrupted build is continued, so entries past its last record may exist.
+        self.is_resumed = is_resumed
+
+    @staticmethod
+    def get_path(dist: str) -> str:
+        dist = os.path.abspath(os.path.normpath(dist))
+        return os.path.join(os.path.dirname(dist), '.' + os.path.basename(dist) + BuildJournal.SUFFIX)
+
+    @staticmethod
+    def get_fingerprint(plan: BuildPlan, layout: str) -> bytes:
+        """
+        Identifies a plan and how it is split, so a journal only resumes the build that wrote it.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(layout.encode('utf-8'))
+        digest.update(plan.depths.tobytes())
+        digest.update(bytes(plan.operations))
+        for name in plan.names:
+            digest.update(name.encode('utf-8', 'surrogatepass') + b'\0')
+        return digest.digest()
+
+    @staticmethod
+    def create(dist: str, fingerprint: bytes) -> 'BuildJournal':
+        path = BuildJournal.get_path(dist)
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o666)
+        os.write(descriptor, BuildJournal.HEADER.pack(BuildJournal.MAGIC, BuildJournal.VERSION, fingerprint))
+        return BuildJournal(path, descriptor, [])
+
+    @staticmethod
+    def open(dist: str, fingerprint: bytes) -> 'BuildJournal':
+        """
+        Opens the journal of an interrupted build to continue it.
+        """
+        path = BuildJournal.get_path(dist)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            raise ValueError(f"No journal of an interrupted build was found for {dist}.")
+        if len(data) < BuildJournal.HEADER.size:
+            raise ValueError(f"'{path}' is not a build journal.")
+        magic, version, stored = BuildJournal.HEADER.unpack_from(data)
+        if magic != BuildJournal.MAGIC:
+            raise ValueError(f"'{path}' is not a build journal.")
+        if version != BuildJournal.VERSION:
+            raise ValueError(f"Build journal version {version} is not supported.")
+        if stored != fingerprint:
+            raise ValueError(f"The journal of {dist} was written by a different build. Resume with the same source, filters and '--processes'.")
+        end = len(data) - (len(data) - BuildJournal.HEADER.size) % BuildJournal.RECORD.size
+        completed = [value for value, in BuildJournal.RECORD.iter_unpack(data[BuildJournal.HEADER.size:end])]
+        descriptor = os.open(path, os.O_WRONLY | os.O_APPEND)
+        # Drops a torn record, so new ones stay aligned.
+        os.ftruncate(descriptor, end)
+        logging.info(f"Resuming from {path}: {len(completed)} records.")
+        return BuildJournal(path, descriptor, completed, is_resumed=True)
+
+    def get_done(self) -> int:
+        """
+        Returns the number of plan operations completed by an ordered build.
+        """
+        return self.completed[-1] if self.completed else 0
+
+    def write(self, value: int):
+        os.write(self.descriptor, BuildJournal.RECORD.pack(value))
+        self.completed.append(value)
+
+    def track(self, plan: BuildPlan, start: int, interval: int, exists: Union[None, Callable[[DiagramRecord], bool]] = None) -> Iterator[DiagramRecord]:
+        """
+        Yields the records of a plan from `start` and records progress every `interval`
+        records. An engine asks for a record only once those before it, or before its
+        batch of `interval` records, are created.
+
+        The interrupted build may have created up to `interval` files past its last
+        record; those `exists` finds are done, and skipped.
+        """
+        ancestors = len(plan.get_ancestors(start)) if start < len(plan) else 0
+        for position, record in enumerate(plan.records(start)):
+            if position > ancestors and position % interval == 0:
+                self.write(start + position - ancestors)
+            if exists and not record.is_folder and position - ancestors < interval and exists(record):
+                continue
+            yield record
+
+    def close(self):
+        if self.descriptor is not None:
+            os.close(self.descriptor)
+            self.descriptor = None
+
+    def finish(self):
+        """
+        Deletes the journal of a build that completed.
+        """
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,403 @@
+import os
+import re
+import json
+import logging
+from json.decoder import scanstring
+from utils.helpers import PathUtils
+from models.parser import DiagramParser, DiagramRecord
+from models.tree2 import ContainerNode, Tree
+from typing import Union, List, Iterable, Iterator, Tuple, TextIO, Any
+from enum import Enum
+
+
+
+# <--------------------------- JsonTokenizer ---------------------------->
+# <--------------------------- JsonTokenizer ---------------------------->
+
+class JsonTokenizer:
+    """
+    Reads JSON tokens from a file in fixed size chunks, so only the current token
+    is ever held in memory.
+    """
+
+    CHUNK_SIZE = 1 << 16
+    PUNCTUATION = '{}[]:,'
+    WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+    NUMBER_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+    # Text a number can start with, such as `12.` or `1e-`, which the next chunk may continue.
+    NUMBER_PREFIX_PATTERN = re.compile(r'-?(?:(?:0|[1-9]\d*)(?:\.\d*)?(?:[eE][-+]?\d*)?)?')
+    LITERALS = {'true': True, 'false': False, 'null': None}
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.buffer = ''
+        self.position = 0
+        self.is_eof = False
+
+    def fill(self) -> bool:
+        """
+        Drops the consumed text and reads the next chunk; False at the end of the file.
+        """
+        chunk = self.file.read(JsonTokenizer.CHUNK_SIZE)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        if not chunk:
+            self.is_eof = True
+        return bool(chunk)
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"Invalid JSON: {message}")
+
+    def tokens(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Yields (kind, value) tokens, where kind is a punctuation char, 'string' or 'value'.
+        """
+        while True:
+            self.position = JsonTokenizer.WHITESPACE_PATTERN.match(self.buffer, self.position).end()
+            if self.position >= len(self.buffer):
+                if self.fill():
+                    continue
+                return
+            char = self.buffer[self.position]
+            if char in JsonTokenizer.PUNCTUATION:
+                self.position += 1
+                yield char, None
+            elif char == '"':
+                try:
+                    value, end = scanstring(self.buffer, self.position + 1)
+                except ValueError:
+                    # The string may just continue in the next chunk.
+                    if self.fill():
+                        continue
+                    raise self.error("unterminated string.")
+                self.position = end
+                yield 'string', value
+            else:
+                token = self.read_scalar()
+                if token is None:
+                    continue
+                yield token
+
+    def read_scalar(self) -> Union[None, Tuple[str, Any]]:
+        """
+        Reads a number or literal, or returns None when more input is needed first.
+        """
+        if not self.is_eof and JsonTokenizer.NUMBER_PREFIX_PATTERN.fullmatch(self.buffer, self.position) and self.fill():
+            return None
+        match = JsonTokenizer.NUMBER_PATTERN.match(self.buffer, self.position)
+        if match and match.end() > self.position:
+            self.position = match.end()
+            text = match.group()
+            return 'value', float(text) if any(char in text for char in '.eE') else int(text)
+        for literal, value in JsonTokenizer.LITERALS.items():
+            if self.buffer.startswith(literal, self.position):
+                self.position += len(literal)
+                return 'value', value
+            if literal.startswith(self.buffer[self.position:]) and not self.is_eof and self.fill():
+                return None
+        raise self.error(f"unexpected character {self.buffer[self.position]!r}.")
+
+
+# <--------------------------- TreeJson ---------------------------->
+# <--------------------------- TreeJson ---------------------------->
+
+class TreeJson:
+    """
+    Streaming import and export of trees as nested JSON or NDJSON.
+
+    Nested JSON:  {"name": "root", "kind": "folder", "children": [{"name": "a.txt", "kind": "file"}]}
+    NDJSON:       one {"path": "src/a.txt", "kind": "file"} per line, parents before children.
+    """
+
+    class JsonFormats(Enum):
+        JSON = 'json'
+        NDJSON = 'ndjson'
+
+    Formats = JsonFormats
+
+    FILE_EXTENSIONS = {'.json': JsonFormats.JSON, '.ndjson': JsonFormats.NDJSON, '.jsonl': JsonFormats.NDJSON}
+    KIND_FOLDER = 'folder'
+    KIND_FILE = 'file'
+
+    @staticmethod
+    def is_json(path: str) -> bool:
+        return PathUtils.get_file_extension(DiagramParser.strip_compression(path)) in TreeJson.FILE_EXTENSIONS
+
+    @staticmethod
+    def get_format(path: str, format: Union[None, str, 'TreeJson.Formats'] = None) -> 'TreeJson.Formats':
+        """
+        Returns the given format, or the one matching the file extension.
+        """
+        if format is not None:
+            return TreeJson.Formats(format)
+        extension = PathUtils.get_file_extension(DiagramParser.strip_compression(path))
+        if extension not in TreeJson.FILE_EXTENSIONS:
+            raise ValueError(f"Unknown JSON tree extension '{extension}'. Use one of: {', '.join(TreeJson.FILE_EXTENSIONS)}.")
+        return TreeJson.FILE_EXTENSIONS[extension]
+
+    @staticmethod
+    def get_kind(value: Any, where: str) -> bool:
+        """
+        Returns whether a kind value names a folder.
+        """
+        if value not in (TreeJson.KIND_FOLDER, TreeJson.KIND_FILE):
+            raise ValueError(f"{where}: kind must be '{TreeJson.KIND_FOLDER}' or '{TreeJson.KIND_FILE}', got {value!r}.")
+        return value == TreeJson.KIND_FOLDER
+
+    # <--------------------------- Import ---------------------------->
+
+    @staticmethod
+    def records(path: str, format: Union[None, str, 'TreeJson.Formats'] = None) -> Iterator[DiagramRecord]:
+        """
+        Yields a record for every entry below the root of a JSON tree file.
+        """
+        format = TreeJson.get_format(path, format)
+        file = DiagramParser.open_source(path)
+        try:
+            if format == TreeJson.Formats.NDJSON:
+                yield from TreeJson.ndjson_records(file)
+            else:
+                yield from TreeJson.nested_records(file)
+        finally:
+            DiagramParser.close_source(file, path)
+
+    @staticmethod
+    def ndjson_records(file: TextIO) -> Iterator[DiagramRecord]:
+        """
+        Yields records from NDJSON lines, checking that every parent was listed first.
+        """
+        stack: List[Tuple[str, bool]] = []
+        for line_no, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                path = item['path']
+                is_folder = TreeJson.get_kind(item.get('kind', TreeJson.KIND_FILE), f"Line {line_no}")
+            except (ValueError, TypeError, KeyError) as error:
+                raise ValueError(f"Line {line_no}: invalid NDJSON entry ({error}).")
+            parts = [part for part in path.strip('/').split('/') if part]
+            if not parts:
+                raise DiagramParser.line_error(line_no, DiagramParser.EMPTY_NAME_ERROR)
+            depth = len(parts) - 1
+            if depth > len(stack) or [name for name, _ in stack[:depth]] != parts[:depth]:
+                raise ValueError(f"Line {line_no}: '{path}' is not listed right after its parent folder.")
+            del stack[depth:]
+            if stack and not stack[-1][1]:
+                raise DiagramParser.line_error(line_no, DiagramParser.FILE_PARENT_ERROR, name=parts[-1], parent=stack[-1][0])
+            stack.append((parts[-1], is_folder))
+            yield DiagramRecord(depth, parts[-1], is_folder, os.path.join(*parts))
+
+    @staticmethod
+    def nested_records(file: TextIO) -> Iterator[DiagramRecord]:
+        """
+        Yields records from a nested JSON document. An entry is emitted as soon as its
+        name is known, so `name` (and `kind`) must come before `children`.
+        """
+        for _, record in TreeJson.read_nested(JsonTokenizer(file).tokens()):
+            if record:
+                yield record
+
+    @staticmethod
+    def read_root_name(path: str) -> Union[None, str]:
+        """
+        Returns the name of the root object of a nested JSON tree file.
+        """
+        file = DiagramParser.open_source(path)
+        try:
+            for root_name, _ in TreeJson.read_nested(JsonTokenizer(file).tokens()):
+                return root_name
+        finally:
+            DiagramParser.close_source(file, path)
+        return None
+
+    @staticmethod
+    def next_token(tokens: Iterator[Tuple[str, Any]], *expected: str) -> Tuple[str, Any]:
+        token = next(tokens, ('end', None))
+        if expected and token[0] not in expected:
+            raise ValueError(f"Invalid JSON tree: expected {' or '.join(repr(kind) for kind in expected)}, got {token[0]!r}.")
+        return token
+
+    @staticmethod
+    def skip_value(tokens: Iterator[Tuple[str, Any]]):
+        """
+        Consumes one value of a key the tree format doesn't use.
+        """
+        depth = 0
+        while True:
+            kind, _ = TreeJson.next_token(tokens)
+            if kind in '{[':
+                depth += 1
+            elif kind in '}]':
+                depth -= 1
+            elif kind == 'end':
+                raise ValueError("Invalid JSON tree: unexpected end of document.")
+            if depth == 0:
+                return
+
+    @staticmethod
+    def read_nested(tokens: Iterator[Tuple[str, Any]]) -> Iterator[Tuple[str, Union[None, DiagramRecord]]]:
+        """
+        Walks a nested JSON tree with an explicit stack and yields (root name, record),
+        first with no record once the root name is known.
+        """
+        TreeJson.next_token(tokens, '{')
+        # Every frame is [name, is folder (None until known), full path, depth, is emitted].
+        stack: List[list] = [[None, True, '', -1, False]]
+        root_name = None
+        while stack:
+            frame = stack[-1]
+            kind, key = TreeJson.next_token(tokens, 'string', '}', ',')
+            if kind == ',':
+                kind, key = TreeJson.next_token(tokens, 'string')
+            if kind == '}':
+                if not frame[4]:
+                    record = TreeJson.emit(frame, stack)
+                    if record:
+                        yield root_name, record
+                stack.pop()
+                if len(stack) > 0:
+                    kind, _ = TreeJson.next_token(tokens, ',', ']')
+                    if kind == ',':
+                        TreeJson.next_token(tokens, '{')
+                        stack.append(TreeJson.child_frame(stack[-1]))
+                    else:
+                        continue
+                continue
+            TreeJson.next_token(tokens, ':')
+            if key == 'name':
+                frame[0] = TreeJson.next_token(tokens, 'string')[1]
+                if frame[3] < 0:
+                    root_name = frame[0]
+                    yield root_name, None
+            elif key == 'kind':
+                is_folder = TreeJson.get_kind(TreeJson.next_token(tokens)[1], f"'{frame[0]}'")
+                if frame[4] and not is_folder:
+                    raise ValueError(f"'{frame[0]}' has children but is marked as a file.")
+                frame[1] = is_folder
+            elif key == 'children':
+                if frame[1] is False:
+                    raise ValueError(f"'{frame[0]}' is a file and can't have children.")
+                frame[1] = True
+                record = TreeJson.emit(frame, stack)
+                if record:
+                    yield root_name, record
+                TreeJson.next_token(tokens, '[')
+                kind, _ = TreeJson.next_token(tokens, '{', ']')
+                if kind == '{':
+                    stack.append(TreeJson.child_frame(frame))
+            else:
+                TreeJson.skip_value(tokens)
+        if TreeJson.next_token(tokens)[0] != 'end':
+            raise ValueError("Invalid JSON tree: unexpected content after the root object.")
+
+    @staticmethod
+    def child_frame(parent: list) -> list:
+        return [None, None, parent[2], parent[3] + 1, False]
+
+    @staticmethod
+    def emit(frame: list, stack: List[list]) -> Union[None, DiagramRecord]:
+        """
+        Marks a frame as emitted and returns its record; the root has none.
+        """
+        frame[4] = True
+        if frame[3] < 0:
+            return None
+        if not frame[0]:
+            raise ValueError("Invalid JSON tree: every entry needs a 'name' before its 'children'.")
+        frame[2] = os.path.join(frame[2], frame[0]) if frame[2] else frame[0]
+        return DiagramRecord(frame[3], frame[0], bool(frame[1]), frame[2])
+
+    @staticmethod
+    def load_tree(path: str, format: Union[None, str, 'TreeJson.Formats'] = None) -> Tree:
+        """
+        Builds a tree from a JSON tree file.
+        """
+        format = TreeJson.get_format(path, format)
+        root_name = TreeJson.read_root_name(path) if format == TreeJson.Formats.JSON else None
+        root = ContainerNode._create_root(root_name or DiagramParser.get_root_name(path))
+        count = 0
+        for _ in DiagramParser.attach_records(TreeJson.records(path, format), root):
+            count += 1
+        logging.info(f"Loaded {count} entries from '{path}'.")
+        return Tree(root)
+
+    # <--------------------------- Export ---------------------------->
+
+    @staticmethod
+    def tree_records(tree: Tree) -> Iterator[DiagramRecord]:
+        """
+        Yields a record for every node below the root of a tree, in diagram order.
+        """
+        stack = [(iter(tree.base_dir.children), '')]
+        while stack:
+            children, parent_path = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                continue
+            full_path = os.path.join(parent_path, node.name) if parent_path else node.name
+            is_folder = node.is_container()
+            yield DiagramRecord(len(stack) - 1, node.name, is_folder, full_path)
+            if is_folder:
+                stack.append((iter(node.children), full_path))
+
+    @staticmethod
+    def write(records: Iterable[DiagramRecord], path: str, root_name: str, format: Union[None, str, 'TreeJson.Formats'] = None) -> int:
+        """
+        Writes records to a JSON tree file, one entry at a time. Returns the number of entries.
+        """
+        format = TreeJson.get_format(path, format)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            if format == TreeJson.Formats.NDJSON:
+                count = TreeJson.write_ndjson(records, file)
+            else:
+                count = TreeJson.write_nested(records, file, root_name)
+        os.replace(temp_path, path)
+        logging.info(f"Wrote {count} entries to '{path}'.")
+        return count
+
+    @staticmethod
+    def write_ndjson(records: Iterable[DiagramRecord], file: TextIO) -> int:
+        count = 0
+        for record in records:
+            kind = TreeJson.KIND_FOLDER if record.is_folder else TreeJson.KIND_FILE
+            file.write(json.dumps({"path": record.full_path.replace(os.sep, '/'), "kind": kind}, ensure_ascii=False) + '\n')
+            count += 1
+        return count
+
+    @staticmethod
+    def write_nested(records: Iterable[DiagramRecord], file: TextIO, root_name: str) -> int:
+        """
+        Writes records as nested objects, closing folders as the depth drops.
+        """
+        file.write('{"name": ' + json.dumps(root_name, ensure_ascii=False) + ', "kind": "folder", "children": [')
+        # One flag per open children array: whether an entry was written to it yet.
+        has_entries = [False]
+        count = 0
+        for record in records:
+            while len(has_entries) > record.depth + 1:
+                file.write(']}')
+                has_entries.pop()
+            file.write(',\n' if has_entries[-1] else '\n')
+            has_entries[-1] = True
+            name = json.dumps(record.name, ensure_ascii=False)
+            if record.is_folder:
+                file.write('{"name": ' + name + ', "kind": "folder", "children": [')
+                has_entries.append(False)
+            else:
+                file.write('{"name": ' + name + ', "kind": "file"}')
+            count += 1
+        while len(has_entries) > 1:
+            file.write(']}')
+            has_entries.pop()
+        file.write(']}\n')
+        return count
+
+    @staticmethod
+    def save_tree(tree: Tree, path: str, format: Union[None, str, 'TreeJson.Formats'] = None) -> int:
+        """
+        Writes a tree to a JSON tree file.
+        """
+        return TreeJson.write(TreeJson.tree_records(tree), path, tree.base_dir.name, format)
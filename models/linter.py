@@ -0,0 +1,154 @@
+import re
+import sys
+import json
+from models.parser import DiagramParser
+from models.dialects import DialectRegistry
+from models.includes import DiagramIncluder
+from typing import Union, List, Iterable, Iterator, Set, Tuple, NamedTuple
+from enum import Enum
+
+
+
+# <--------------------------- LintIssue ---------------------------->
+# <--------------------------- LintIssue ---------------------------->
+
+class LintIssue(NamedTuple):
+    source: str
+    line: int
+    code: str
+    message: str
+    path: str
+
+
+# <--------------------------- Linter ---------------------------->
+# <--------------------------- Linter ---------------------------->
+
+class Linter:
+    """
+    Checks diagrams in one streaming pass and reports every problem, not just the first.
+    """
+
+    class IssueCodes(Enum):
+        DEPTH_JUMP = 'depth-jump'
+        DUPLICATE_NAME = 'duplicate-name'
+        EMPTY_NAME = 'empty-name'
+        ILLEGAL_CHARACTERS = 'illegal-characters'
+        RESERVED_NAME = 'reserved-name'
+        FILE_PARENT = 'file-parent'
+        NAME_TOO_LONG = 'name-too-long'
+        PATH_TOO_LONG = 'path-too-long'
+
+    Codes = IssueCodes
+
+    class OutputFormats(Enum):
+        TEXT = 'text'
+        JSON = 'json'
+
+    Formats = OutputFormats
+
+    # Characters no file system accepts in a name.
+    ILLEGAL_PATTERN = re.compile(r'[/\x00]')
+    # With --portable, also the ones Windows rejects, which are fine on POSIX systems.
+    PORTABLE_PATTERN = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+    RESERVED_NAMES = {'con', 'prn', 'aux', 'nul'} | {f'com{index}' for index in range(1, 10)} | {f'lpt{index}' for index in range(1, 10)}
+    MAX_NAME_LENGTH = 255
+    MAX_PATH_LENGTH = 4096
+
+    @staticmethod
+    def parse_arguments(parser):
+        parser.add_argument('--format', type=str, choices=[format.value for format in Linter.Formats], default=Linter.Formats.TEXT.value, help="Output format. Default is 'text'.")
+        parser.add_argument('--dialect', type=str, choices=['auto'] + DialectRegistry.get_names(), default='auto', help="Notation of the diagrams. Default is 'auto'.")
+        parser.add_argument('--max-name-length', type=int, default=Linter.MAX_NAME_LENGTH, help=f"Longest allowed entry name, in UTF-8 bytes. Default is {Linter.MAX_NAME_LENGTH}.")
+        parser.add_argument('--portable', action="store_true", default=False, help="Also report names that only Windows rejects: reserved names such as 'con', trailing dots or spaces and the characters < > : \" \\ | ? *.")
+        parser.add_argument('--max-path-length', type=int, default=Linter.MAX_PATH_LENGTH, help=f"Longest allowed path below the destination, in UTF-8 bytes. Default is {Linter.MAX_PATH_LENGTH}.")
+        parser.add_argument('sources', nargs='+', type=str, help="Diagram files to lint, or '-' for stdin.")
+
+    @staticmethod
+    def handle_request(args):
+        request_data = {
+            "args": args.__dict__,
+        }
+        results = Linter.handle_lint(request_data)
+        return Linter.handle_response(results)
+
+    @staticmethod
+    def check_name(name: str, max_name_length: int, portable: bool = False) -> Iterator[Tuple['Linter.Codes', str]]:
+        """
+        Yields the problems of a single entry name, including the Windows only ones when
+        `portable` is set.
+        """
+        if not name:
+            yield Linter.Codes.EMPTY_NAME, DiagramParser.EMPTY_NAME_ERROR
+            return
+        illegal = sorted(set((Linter.PORTABLE_PATTERN if portable else Linter.ILLEGAL_PATTERN).findall(name)))
+        if illegal:
+            yield Linter.Codes.ILLEGAL_CHARACTERS, f"'{name}' contains illegal characters: {' '.join(repr(char) for char in illegal)}."
+        if name in DiagramParser.RELATIVE_NAMES:
+            yield Linter.Codes.RESERVED_NAME, DiagramParser.RELATIVE_NAME_ERROR.format(name=name)
+            return
+        if portable and (name.split('.')[0].lower() in Linter.RESERVED_NAMES or name[-1] in ' .'):
+            yield Linter.Codes.RESERVED_NAME, f"'{name}' is reserved or ends with a dot or space on Windows."
+        if len(name.encode('utf-8')) > max_name_length:
+            yield Linter.Codes.NAME_TOO_LONG, f"'{name}' is longer than {max_name_length} bytes."
+
+    @staticmethod
+    def lint_tokens(source: str, tokens: Iterable[Tuple[int, int, str, bool]], max_name_length: int = MAX_NAME_LENGTH, max_path_length: int = MAX_PATH_LENGTH, portable: bool = False) -> Iterator[LintIssue]:
+        """
+        Yields every issue of a token stream, recovering after each one so later
+        problems are still found.
+        """
+        # One frame per open folder: (path, path length in bytes, is folder, names of its children).
+        stack: List[Tuple[str, int, bool, Set[str]]] = [('', 0, True, set())]
+        for line_no, depth, name, is_folder in tokens:
+            if depth > len(stack) - 1:
+                parent_path = stack[-1][0]
+                yield LintIssue(source, line_no, Linter.Codes.DEPTH_JUMP.value, DiagramParser.DEPTH_JUMP_ERROR.format(name=name), parent_path + '/' + name if parent_path else name)
+                depth = len(stack) - 1
+            del stack[depth + 1:]
+            parent_path, parent_length, parent_is_folder, siblings = stack[-1]
+            path = parent_path + '/' + name if parent_path else name
+            path_length = parent_length + len(name.encode('utf-8')) + (1 if parent_path else 0)
+            if not parent_is_folder:
+                yield LintIssue(source, line_no, Linter.Codes.FILE_PARENT.value, DiagramParser.FILE_PARENT_ERROR.format(name=name, parent=parent_path), path)
+            if DiagramIncluder.get_include_path(name) is None:
+                for code, message in Linter.check_name(name, max_name_length, portable):
+                    yield LintIssue(source, line_no, code.value, message, path)
+                if name in siblings:
+                    yield LintIssue(source, line_no, Linter.Codes.DUPLICATE_NAME.value, f"'{name}' is listed more than once in the same folder.", path)
+                siblings.add(name)
+                if path_length > max_path_length:
+                    yield LintIssue(source, line_no, Linter.Codes.PATH_TOO_LONG.value, f"Path is longer than {max_path_length} bytes.", path)
+            stack.append((path, path_length, is_folder, set()))
+
+    @staticmethod
+    def lint_source(source: str, dialect: Union[None, str] = None, max_name_length: int = MAX_NAME_LENGTH, max_path_length: int = MAX_PATH_LENGTH, portable: bool = False) -> Iterator[LintIssue]:
+        tokens = DiagramParser.tokens(source, DiagramParser.Modes.MMAP, dialect)
+        return Linter.lint_tokens(source, tokens, max_name_length, max_path_length, portable)
+
+    @staticmethod
+    def handle_lint(request_data):
+        args = request_data['args']
+        dialect = None if args['dialect'] == 'auto' else args['dialect']
+        is_json = Linter.Formats(args['format']) == Linter.Formats.JSON
+        count = 0
+        if is_json:
+            sys.stdout.write('[')
+        for source in args['sources']:
+            for issue in Linter.lint_source(source, dialect, args['max_name_length'], args['max_path_length'], args.get('portable', False)):
+                if is_json:
+                    sys.stdout.write((',\n' if count else '\n') + json.dumps(issue._asdict(), ensure_ascii=False))
+                else:
+                    print(f"{issue.source}:{issue.line}: {issue.code} {issue.message}")
+                count += 1
+        if is_json:
+            sys.stdout.write('\n]\n' if count else ']\n')
+        message = f"Found {count} issues in {len(args['sources'])} diagrams." if count else ""
+        return {"status": count == 0, "message": "" if is_json else message}
+
+    @staticmethod
+    def handle_response(results):
+        if results["message"]:
+            print(results["message"], file=sys.stderr)
+        if not results["status"]:
+            sys.exit(1)
+        return results
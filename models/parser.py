@@ -0,0 +1,576 @@
+import os
+import io
+import sys
+import bz2
+import gzip
+import lzma
+import mmap
+import marshal
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from utils.helpers import PathUtils
+from models.tree2 import ContainerNode, Node, Tree
+from models.dialects import DiagramDialect, DialectRegistry, BoxDialect
+from models.expansion import BraceExpander
+from models.includes import DiagramIncluder
+from typing import Union, List, Iterable, Iterator, Tuple, NamedTuple, TextIO
+from enum import Enum
+
+
+
+# <--------------------------- DiagramRecord ---------------------------->
+# <--------------------------- DiagramRecord ---------------------------->
+
+class DiagramRecord(NamedTuple):
+    depth: int
+    name: str
+    is_folder: bool
+    full_path: str
+
+
+# <--------------------------- DiagramParser ---------------------------->
+# <--------------------------- DiagramParser ---------------------------->
+
+class DiagramParser:
+    """
+    Streams an ASCII folder diagram into records or tree nodes.
+    """
+
+    class ParseModes(Enum):
+        LINES = 'lines'
+        MMAP = 'mmap'
+        PARALLEL = 'parallel'
+
+    Modes = ParseModes
+
+    # Bump whenever a change to the parser alters the records it produces.
+    VERSION = 7
+
+    PREFIX_CHARS = BoxDialect.PREFIX_CHARS
+    CONNECTOR_CHARS = BoxDialect.CONNECTOR_CHARS
+    INDENT_WIDTH = BoxDialect.INDENT_WIDTH
+    PREFIX_BYTES = PREFIX_CHARS.encode('utf-8')
+    MMAP_CHUNK_SIZE = 1 << 20
+    PARALLEL_CHUNKS_PER_JOB = 4
+
+    EMPTY_NAME_ERROR = "entry has an empty name."
+    DEPTH_JUMP_ERROR = "'{name}' is nested deeper than its parent allows."
+    FILE_PARENT_ERROR = "'{name}' is placed under the file '{parent}'."
+    RELATIVE_NAME_ERROR = "'{name}' refers to a folder instead of naming an entry."
+    # Names that would place an entry in its own folder or above it, even outside the destination.
+    RELATIVE_NAMES = {'.', '..'}
+
+    STDIN = '-'
+    COMPRESSED_OPENERS = {'.gz': gzip.open, '.xz': lzma.open, '.bz2': bz2.open}
+
+    @staticmethod
+    def open_source(source: Union[str, TextIO]) -> TextIO:
+        """
+        Opens the diagram source for line by line reading. '-' reads stdin, and
+        compressed files are decompressed while they are read.
+        """
+        if isinstance(source, io.IOBase):
+            return source
+        if DiagramParser.is_stdin(source):
+            if isinstance(sys.stdin, io.TextIOWrapper) and sys.stdin.encoding.lower() != 'utf-8':
+                sys.stdin.reconfigure(encoding='utf-8')
+            return sys.stdin
+        opener = DiagramParser.COMPRESSED_OPENERS.get(PathUtils.get_file_extension(source).lower())
+        if opener:
+            return opener(source, 'rt', encoding='utf-8')
+        return open(source, 'r', encoding='utf-8')
+
+    @staticmethod
+    def close_source(file: TextIO, source: Union[str, TextIO]):
+        """
+        Closes a file opened by `open_source`, leaving caller owned streams and stdin open.
+        """
+        if file is not source and file is not sys.stdin:
+            file.close()
+
+    @staticmethod
+    def is_stdin(source: Union[str, TextIO]) -> bool:
+        return isinstance(source, str) and source == DiagramParser.STDIN
+
+    @staticmethod
+    def is_compressed(source: Union[str, TextIO]) -> bool:
+        return isinstance(source, str) and PathUtils.get_file_extension(source).lower() in DiagramParser.COMPRESSED_OPENERS
+
+    @staticmethod
+    def is_plain_file(source: Union[str, TextIO]) -> bool:
+        """
+        Checks whether the source is an uncompressed file that can be memory mapped.
+        """
+        return isinstance(source, str) and not DiagramParser.is_stdin(source) and not DiagramParser.is_compressed(source)
+
+    @staticmethod
+    def strip_compression(path: str) -> str:
+        """
+        Returns the path without its compression extension.
+        """
+        return os.path.splitext(path)[0] if DiagramParser.is_compressed(path) else path
+
+    @staticmethod
+    def get_root_name(source: Union[str, TextIO]) -> str:
+        """
+        Returns the default root folder name for a source.
+        """
+        if isinstance(source, str) and not DiagramParser.is_stdin(source):
+            return PathUtils.get_file_name(DiagramParser.strip_compression(source))
+        return 'base_dir'
+
+    @staticmethod
+    def tokenize_line(line: str) -> Union[None, Tuple[int, str, bool]]:
+        """
+        Splits a single box diagram line into its depth, name and folder flag.
+        """
+        return DialectRegistry.get(BoxDialect.name).tokenize_line(line)
+
+    @staticmethod
+    def is_root_line(line: str) -> bool:
+        """
+        Checks whether a box diagram entry line is a root line, see `BoxDialect`.
+        """
+        return DialectRegistry.get(BoxDialect.name).is_root_line(line)
+
+    @staticmethod
+    def get_dialect(dialect: Union[None, str, DiagramDialect]) -> Union[None, DiagramDialect]:
+        """
+        Resolves a dialect name, keeping None for automatic detection.
+        """
+        if dialect is None or isinstance(dialect, DiagramDialect):
+            return dialect
+        resolved = DialectRegistry.get(dialect)
+        if resolved is None:
+            raise ValueError(f"Unknown diagram dialect '{dialect}'. Available dialects: {', '.join(DialectRegistry.get_names())}.")
+        return resolved
+
+    @staticmethod
+    def sniff(path: str) -> DiagramDialect:
+        """
+        Detects the dialect of a diagram file from its first few kilobytes.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            return DialectRegistry.sniff(file.read(DialectRegistry.SAMPLE_SIZE))
+
+    @staticmethod
+    def tokens(source: Union[str, TextIO], mode: 'DiagramParser.Modes' = ParseModes.LINES, dialect: Union[None, str, DiagramDialect] = None, max_depth: Union[None, int] = None) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Yields (line number, depth, name, is folder) for every entry line of the source.
+        The mmap scanner may already drop lines at `max_depth` or deeper.
+        """
+        dialect = DiagramParser.get_dialect(dialect)
+        if mode != DiagramParser.Modes.LINES and DiagramParser.is_plain_file(source):
+            # The raw byte scanner only understands box diagrams.
+            if (dialect or DiagramParser.sniff(source)).name == BoxDialect.name:
+                return DiagramParser.mmap_tokens(source, max_depth)
+        return DiagramParser.line_tokens(source, dialect)
+
+    @staticmethod
+    def line_tokens(source: Union[str, TextIO], dialect: Union[None, str, DiagramDialect] = None) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Tokenizes the source one decoded line at a time, detecting its dialect from
+        the first few kilobytes unless one is given.
+        """
+        file = DiagramParser.open_source(source)
+        try:
+            sample = file.read(DialectRegistry.SAMPLE_SIZE)
+            sample_lines = sample.splitlines(keepends=True)
+            dialect = (DiagramParser.get_dialect(dialect) or DialectRegistry.sniff(sample)).prepare(sample_lines)
+            tokens = dialect.tokenize(DiagramParser.continue_lines(sample_lines, file))
+            if dialect.infer_folders:
+                tokens = DiagramParser.infer_folders(tokens)
+            yield from tokens
+        finally:
+            DiagramParser.close_source(file, source)
+
+    @staticmethod
+    def continue_lines(sample_lines: List[str], file: TextIO) -> Iterator[str]:
+        """
+        Yields the already read sample lines followed by the rest of the file.
+        """
+        partial = sample_lines.pop() if sample_lines and not sample_lines[-1].endswith('\n') else ''
+        yield from sample_lines
+        for line in file:
+            if partial:
+                line, partial = partial + line, ''
+            yield line
+        if partial:
+            yield partial
+
+    @staticmethod
+    def infer_folders(tokens: Iterable[Tuple[int, int, str, bool]]) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Marks every entry followed by a deeper one as a folder.
+        """
+        pending = None
+        for token in tokens:
+            if pending:
+                if token[1] > pending[1] and not pending[3]:
+                    pending = pending[:3] + (True,)
+                yield pending
+            pending = token
+        if pending:
+            yield pending
+
+    @staticmethod
+    def mmap_tokens(path: str, max_depth: Union[None, int] = None) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Tokenizes a memory mapped source, decoding only the name of every line.
+        Lines at `max_depth` or deeper are dropped before their name is decoded.
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield from DiagramParser.tokenize_buffer(buffer, 0, len(buffer), max_depth=max_depth)
+
+    @staticmethod
+    def tokenize_buffer(buffer: Union[bytes, mmap.mmap], start: int, end: int, first_line: int = 1, max_depth: Union[None, int] = None, state: Union[None, List[int]] = None) -> Iterator[Tuple[int, int, str, bool]]:
+        """
+        Tokenizes the raw UTF-8 lines between two byte offsets of a buffer.
+
+        `state` holds the [shift, is pending, root lines] of the root line rule of
+        `BoxDialect`, starting from the state left by the lines before `start`, and is
+        kept up to date as the lines are read.
+        """
+        prefix_bytes = DiagramParser.PREFIX_BYTES
+        indent_width = DiagramParser.INDENT_WIDTH
+        if state is None:
+            state = [0, False, 0]
+        shift, is_pending = state[0], state[1]
+        # Diagrams repeat a handful of connector prefixes, so each distinct one is resolved only once.
+        prefixes = {}
+        line_no = first_line - 1
+        position = start
+        while position < end:
+            chunk_end = DiagramParser.find_chunk_end(buffer, position, end)
+            chunk = buffer[position:chunk_end]
+            lines = chunk.split(b'\n')
+            if chunk.endswith(b'\n'):
+                lines.pop()
+            for line in lines:
+                line_no += 1
+                item = line.lstrip(prefix_bytes)
+                prefix = line[:len(line) - len(item)]
+                columns = prefixes.get(prefix)
+                if columns is None:
+                    columns = prefixes[prefix] = DiagramParser.measure_prefix(prefix)
+                if columns is False:
+                    text = line.decode('utf-8')
+                    token = DiagramParser.tokenize_line(text)
+                    if not token:
+                        continue
+                    is_root = DiagramParser.is_root_line(text)
+                    depth, shift, is_pending = BoxDialect.nest_depth(token[0], is_root, shift, is_pending)
+                    state[:] = shift, is_pending, state[2] + is_root
+                    if max_depth is None or depth < max_depth:
+                        yield (line_no, depth) + token[1:]
+                    continue
+                connector, prefix_length = columns
+                name = None
+                if connector >= 0:
+                    depth = connector // indent_width
+                else:
+                    # Only lines without a connector can be blank or root lines.
+                    name = item.decode('utf-8').strip()
+                    if not name:
+                        continue
+                    depth = prefix_length // indent_width
+                    if not prefix:
+                        shift, is_pending = 0, True
+                        state[:] = 0, True, state[2] + 1
+                if is_pending and prefix:
+                    shift, is_pending = (1 if depth == 0 else 0), False
+                    state[0], state[1] = shift, False
+                depth += shift
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                if name is None:
+                    name = item.decode('utf-8').strip()
+                is_folder = name.endswith('/')
+                if is_folder:
+                    name = name[:-1]
+                yield line_no, depth, name, is_folder
+            position = chunk_end
+
+    @staticmethod
+    def find_chunk_end(buffer: Union[bytes, mmap.mmap], position: int, end: int) -> int:
+        """
+        Returns the offset just past the last newline of the next chunk.
+        """
+        limit = position + DiagramParser.MMAP_CHUNK_SIZE
+        if limit >= end:
+            return end
+        return (buffer.rfind(b'\n', position, limit) + 1) or (buffer.find(b'\n', limit, end) + 1) or end
+
+    @staticmethod
+    def measure_prefix(prefix: bytes) -> Union[bool, Tuple[int, int]]:
+        """
+        Returns the connector column and width of a raw prefix, or False when the byte
+        level strip also consumed part of the name.
+        """
+        text = prefix.decode('utf-8', 'replace')
+        if text.lstrip(DiagramParser.PREFIX_CHARS):
+            return False
+        return max(text.rfind(char) for char in DiagramParser.CONNECTOR_CHARS), len(text)
+
+    @staticmethod
+    def records(source: Union[str, TextIO], mode: 'DiagramParser.Modes' = ParseModes.LINES, jobs: Union[None, int] = None, dialect: Union[None, str, DiagramDialect] = None, expand: bool = True, includer: Union[None, DiagramIncluder] = None, path_filter: Union[None, 'PathFilter'] = None) -> Iterator[DiagramRecord]:
+        """
+        Yields a record for every entry of the source, keeping only the depth stack in memory.
+        `@include` entries are spliced with the cached subtree of their file, and brace
+        expressions such as `shard_{000..999}/` are expanded lazily unless `expand` is off.
+        A `models.filters.PathFilter` drops unselected subtrees before their paths are built.
+        """
+        dialect = DiagramParser.get_dialect(dialect)
+        path_filter = path_filter if path_filter and path_filter.is_active() else None
+        if mode == DiagramParser.Modes.PARALLEL:
+            reason = DiagramParser.get_serial_reason(source, dialect, expand)
+            if reason is None:
+                records = DiagramParser.parallel_records(source, jobs)
+                return path_filter.filter_records(records) if path_filter else records
+            logging.warning(f"Parsing on a single process, since {reason}.")
+        chain = (os.path.realpath(source),) if DiagramParser.is_plain_file(source) else ()
+        tokens = DiagramParser.tokens(source, mode, dialect, path_filter.max_depth if path_filter else None)
+        tokens = (includer or DiagramIncluder()).resolve(tokens, DiagramIncluder.get_base_dir(source), chain)
+        if expand:
+            tokens = BraceExpander.expand_tokens(tokens)
+        if path_filter:
+            tokens = path_filter.filter_tokens(tokens)
+        return DiagramParser.iter_records(tokens)
+
+    @staticmethod
+    def get_serial_reason(source: Union[str, TextIO], dialect: Union[None, DiagramDialect] = None, expand: bool = True) -> Union[None, str]:
+        """
+        Returns why a source can't be parsed in parallel chunks, or None if it can.
+        """
+        if not DiagramParser.is_plain_file(source):
+            return "only uncompressed files can be split"
+        if (dialect or DiagramParser.sniff(source)).name != BoxDialect.name:
+            return f"only {BoxDialect.name} diagrams can be split"
+        # Chunks are parsed independently, so an expanded or included subtree can't span them.
+        if DiagramParser.contains(source, [DiagramIncluder.DIRECTIVE.encode('utf-8')]):
+            return f"it has {DiagramIncluder.DIRECTIVE} entries"
+        if expand and DiagramParser.contains(source, [b'{']):
+            return "it has brace expressions"
+        return None
+
+    @staticmethod
+    def contains(path: str, needles: List[bytes]) -> bool:
+        """
+        Checks whether a file has any of the byte strings, without decoding it.
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return any(buffer.find(needle) >= 0 for needle in needles)
+
+    @staticmethod
+    def iter_records(tokens: Iterable[Tuple[int, int, str, bool]], stack: Union[None, List[Tuple[str, bool]]] = None) -> Iterator[DiagramRecord]:
+        """
+        Resolves the full path of every token against the current depth stack,
+        optionally seeded with the (path, is folder) of already open ancestors.
+        """
+        stack = list(stack) if stack else []
+        for line_no, depth, name, is_folder in tokens:
+            if not name:
+                raise DiagramParser.line_error(line_no, DiagramParser.EMPTY_NAME_ERROR)
+            if name in DiagramParser.RELATIVE_NAMES:
+                raise DiagramParser.line_error(line_no, DiagramParser.RELATIVE_NAME_ERROR, name=name)
+            if depth > len(stack):
+                raise DiagramParser.line_error(line_no, DiagramParser.DEPTH_JUMP_ERROR, name=name)
+            del stack[depth:]
+            if stack:
+                parent_path, parent_is_folder = stack[-1]
+                if not parent_is_folder:
+                    raise DiagramParser.line_error(line_no, DiagramParser.FILE_PARENT_ERROR, name=name, parent=parent_path)
+                full_path = os.path.join(parent_path, name)
+            else:
+                full_path = name
+            stack.append((full_path, is_folder))
+            yield DiagramRecord(depth, name, is_folder, full_path)
+
+    @staticmethod
+    def line_error(line_no: int, message: str, **values) -> ValueError:
+        """
+        Builds the error raised for an invalid diagram line.
+        """
+        return ValueError(f"Line {line_no}: " + message.format(**values))
+
+    @staticmethod
+    def parallel_records(path: str, jobs: Union[None, int] = None) -> Iterator[DiagramRecord]:
+        """
+        Parses newline aligned byte ranges of the source on separate processes and
+        stitches the chunks back into a single record stream.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        ranges = DiagramParser.split_ranges(path, jobs * DiagramParser.PARALLEL_CHUNKS_PER_JOB)
+        if jobs < 2 or len(ranges) < 2:
+            yield from DiagramParser.iter_records(DiagramParser.mmap_tokens(path))
+            return
+        starts, ends = zip(*ranges)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunks = executor.map(DiagramParser.parse_chunk, [path] * len(ranges), starts, ends)
+            yield from DiagramParser.stitch_chunks(marshal.loads(chunk) for chunk in chunks)
+
+    @staticmethod
+    def split_ranges(path: str, count: int) -> List[Tuple[int, int]]:
+        """
+        Splits the source into about `count` byte ranges that end on a newline.
+        """
+        ranges = []
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return ranges
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                start = 0
+                for index in range(1, count + 1):
+                    end = (buffer.find(b'\n', max(start, size * index // count - 1)) + 1) or size
+                    if end > start:
+                        ranges.append((start, end))
+                        start = end
+                    if start >= size:
+                        break
+        return ranges
+
+    @staticmethod
+    def parse_chunk(path: str, start: int, end: int) -> bytes:
+        """
+        Resolves a byte range of the source without knowing what precedes it.
+
+        Every record carries the depth of its first ancestor inside the chunk
+        ("base") and its path relative to that ancestor's parent, which lies in an
+        earlier chunk unless the base is 0. The entries before the first root line
+        of the chunk ("head") are resolved as if no root line came before them.
+        """
+        records = []
+        error = None
+        head = None
+        # [shift, is pending, root lines] of the root line rule, see `tokenize_buffer`.
+        state = [0, False, 0]
+        # Depths below the shallowest entry seen so far belong to earlier chunks.
+        floor = None
+        stack: List[Union[None, Tuple[str, bool, int]]] = []
+        with open(path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                line_count = sum(buffer[position:min(end, position + DiagramParser.MMAP_CHUNK_SIZE)].count(b'\n')
+                                 for position in range(start, end, DiagramParser.MMAP_CHUNK_SIZE))
+                for line_no, depth, name, is_folder in DiagramParser.tokenize_buffer(buffer, start, end, state=state):
+                    if head is None and state[2]:
+                        head = len(records)
+                    if not name:
+                        error = (line_no, DiagramParser.EMPTY_NAME_ERROR, name, 0, '')
+                        break
+                    if name in DiagramParser.RELATIVE_NAMES:
+                        error = (line_no, DiagramParser.RELATIVE_NAME_ERROR, name, 0, '')
+                        break
+                    if floor is None or depth <= floor:
+                        floor = depth
+                        del stack[depth:]
+                        stack.extend([None] * (depth - len(stack)))
+                        base, relative_path = depth, name
+                    else:
+                        if depth > len(stack):
+                            error = (line_no, DiagramParser.DEPTH_JUMP_ERROR, name, 0, '')
+                            break
+                        del stack[depth:]
+                        parent_path, parent_is_folder, base = stack[-1]
+                        if not parent_is_folder:
+                            error = (line_no, DiagramParser.FILE_PARENT_ERROR, name, base, parent_path)
+                            break
+                        relative_path = os.path.join(parent_path, name)
+                    stack.append((relative_path, is_folder, base))
+                    records.append((line_no, depth, name, is_folder, base, relative_path))
+        return marshal.dumps((line_count, records, error, stack, len(records) if head is None else head, state))
+
+    @staticmethod
+    def stitch_chunks(chunks: Iterable[Tuple[int, list, Union[None, tuple], list, int, list]]) -> Iterator[DiagramRecord]:
+        """
+        Replays parsed chunks in order, resolving every chunk against the depth
+        stack and the root line state left behind by the previous ones.
+        """
+        stack: List[Tuple[str, bool]] = []
+        shift, is_pending = 0, False
+        line_offset = 0
+        for line_count, records, error, chunk_stack, head, (chunk_shift, chunk_pending, roots) in chunks:
+            # The head is nested under a root line of an earlier chunk, if any.
+            if is_pending:
+                offset = 1 if records[:1] and records[0][1] == 0 else 0
+            else:
+                offset = shift
+            prefixes = {}
+            for index, (line_no, depth, name, is_folder, base, relative_path) in enumerate(records):
+                if index < head:
+                    depth, base = depth + offset, base + offset
+                if base == depth and depth > 0:
+                    if depth > len(stack):
+                        raise DiagramParser.line_error(line_offset + line_no, DiagramParser.DEPTH_JUMP_ERROR, name=name)
+                    parent_path, parent_is_folder = stack[depth - 1]
+                    if not parent_is_folder:
+                        raise DiagramParser.line_error(line_offset + line_no, DiagramParser.FILE_PARENT_ERROR, name=name, parent=parent_path)
+                if base == 0:
+                    full_path = relative_path
+                elif relative_path.startswith(os.sep):
+                    full_path = os.path.join(stack[base - 1][0], relative_path)
+                else:
+                    prefix = prefixes.get(base)
+                    if prefix is None:
+                        prefix = prefixes[base] = os.path.join(stack[base - 1][0], '')
+                    full_path = prefix + relative_path
+                yield DiagramRecord(depth, name, is_folder, full_path)
+            if error:
+                line_no, message, name, base, parent_path = error
+                base += 0 if roots else offset
+                if base and parent_path:
+                    parent_path = os.path.join(stack[base - 1][0], parent_path)
+                raise DiagramParser.line_error(line_offset + line_no, message, name=name, parent=parent_path)
+            if chunk_stack:
+                # The chunk only replaced the levels from its shallowest entry down.
+                # Entries left open by a root line of the chunk are already resolved.
+                stack_offset = 0 if roots else offset
+                floor = chunk_stack.count(None)
+                stack = stack[:floor + stack_offset] + [(relative_path if base + stack_offset == 0 else os.path.join(stack[base + stack_offset - 1][0], relative_path), is_folder)
+                                                        for relative_path, is_folder, base in chunk_stack[floor:]]
+            if roots:
+                shift, is_pending = chunk_shift, chunk_pending
+            elif records:
+                shift, is_pending = offset, False
+            line_offset += line_count
+
+    @staticmethod
+    def nodes(source: Union[str, TextIO], root: ContainerNode, mode: 'DiagramParser.Modes' = ParseModes.LINES, dialect: Union[None, str, DiagramDialect] = None) -> Iterator[Union[Node, ContainerNode]]:
+        """
+        Yields tree nodes for every entry of the source, attached under the given root.
+        """
+        return DiagramParser.attach_records(DiagramParser.records(source, mode, dialect=dialect), root)
+
+    @staticmethod
+    def attach_records(records: Iterable[DiagramRecord], root: ContainerNode) -> Iterator[Union[Node, ContainerNode]]:
+        """
+        Yields a tree node for every record, attached under the given root.
+        """
+        stack: List[ContainerNode] = [root]
+        for record in records:
+            del stack[record.depth + 1:]
+            node = ContainerNode(record.name) if record.is_folder else Node(record.name)
+            stack[-1].attach(node)
+            if record.is_folder:
+                stack.append(node)
+            yield node
+
+    @staticmethod
+    def parse_tree(source: Union[str, TextIO], root_name: Union[None, str] = None, mode: 'DiagramParser.Modes' = ParseModes.LINES, dialect: Union[None, str, DiagramDialect] = None) -> Tree:
+        """
+        Parses the whole source into a tree.
+        """
+        if root_name is None:
+            root_name = DiagramParser.get_root_name(source)
+        root = ContainerNode._create_root(root_name)
+        count = 0
+        for _ in DiagramParser.nodes(source, root, mode, dialect):
+            count += 1
+        logging.info(f"Parsed {count} entries into '{root_name}'.")
+        return Tree(root)
@@ -0,0 +1,235 @@
+import os
+import marshal
+import itertools
+import logging
+from array import array
+from models.parser import DiagramRecord
+from typing import Union, List, Iterable, Iterator, Dict, Tuple, Set
+from enum import Enum
+
+
+
+# <--------------------------- BuildPlan ---------------------------->
+# <--------------------------- BuildPlan ---------------------------->
+
+class BuildPlan:
+    """
+    The operations that build a tree, compiled before anything is created: one `mkdir`
+    per folder and one `create` per file, parents first, with repeated files dropped.
+    A folder listed again keeps its place as a `reopen`, since its entries follow it,
+    and costs a single failing `mkdir`. Appending to a destination drops what already
+    exists the same way.
+
+    Repeats are found among the entries of each folder listing, like `BuildArchive`
+    does, so memory stays bounded by the widest folder instead of the whole tree. The
+    entries of a folder listed twice are only compared within each listing; a repeat
+    across them is created again and fails as already existing.
+
+    Serialized as the magic followed by a marshalled
+    (version, depths, names, operations, skipped) tuple.
+    """
+
+    MAGIC = b'FGPL'
+    VERSION = 1
+    FILE_EXTENSION = '.fgp'
+
+    class PlanOperations(Enum):
+        CREATE = 'create'
+        MKDIR = 'mkdir'
+        REOPEN = 'reopen'
+
+    Operations = PlanOperations
+
+    # Stored operation codes, in the order of the enum.
+    CODES = {operation: code for code, operation in enumerate(PlanOperations)}
+    # Syscalls of an operation when executed from the plan.
+    PLANNED_SYSCALLS = {Operations.CREATE: 2, Operations.MKDIR: 1, Operations.REOPEN: 1}
+    # Syscalls of the same entry created one by one by its full path: exists, then a
+    # parent exists and mkdir, or utime, open and close. A repeat is one exists.
+    UNPLANNED_SYSCALLS = {Operations.CREATE: 4, Operations.MKDIR: 3, Operations.REOPEN: 1}
+
+    def __init__(self):
+        self.depths = array('I')
+        self.names: List[str] = []
+        self.operations = bytearray()
+        # Repeated or already existing entries left out of the plan.
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def compile(records: Iterable[DiagramRecord]) -> 'BuildPlan':
+        plan = BuildPlan()
+        for operation, record in BuildPlan.get_operations(records):
+            if operation is None:
+                plan.skipped += 1
+            else:
+                plan.append(record.depth, record.name, operation)
+        logging.info(f"Compiled build plan: {len(plan)} operations, {plan.skipped} repeated files skipped.")
+        return plan
+
+    @staticmethod
+    def get_operations(records: Iterable[DiagramRecord]) -> Iterator[Tuple[Union[None, 'BuildPlan.Operations'], DiagramRecord]]:
+        """
+        Yields the operation of every record, or None for a repeated file.
+        """
+        # Names of the children of every open folder, the destination first.
+        siblings: List[Set[str]] = [set()]
+        for record in records:
+            del siblings[record.depth + 1:]
+            names = siblings[-1]
+            if record.name in names:
+                operation = BuildPlan.Operations.REOPEN if record.is_folder else None
+            else:
+                names.add(record.name)
+                operation = BuildPlan.Operations.MKDIR if record.is_folder else BuildPlan.Operations.CREATE
+            if record.is_folder:
+                siblings.append(set())
+            yield operation, record
+
+    @staticmethod
+    def unique(records: Iterable[DiagramRecord]) -> Iterator[DiagramRecord]:
+        """
+        Streams the records a compiled plan would build, without compiling it.
+        """
+        for operation, record in BuildPlan.get_operations(records):
+            if operation is not None:
+                yield record
+
+    def append(self, depth: int, name: str, operation: 'BuildPlan.Operations'):
+        self.depths.append(depth)
+        self.names.append(name)
+        self.operations.append(BuildPlan.CODES[operation])
+
+    def get_missing(self, existing: Dict[str, bool]) -> 'BuildPlan':
+        """
+        Returns the plan of the entries missing from a snapshot of relative path -> is
+        folder. An existing folder is kept, as a reopen, only when an entry is missing
+        below it.
+        """
+        plan = BuildPlan()
+        create = BuildPlan.CODES[BuildPlan.Operations.CREATE]
+        paths: List[str] = []
+        # Existing folders emitted once a missing entry shows up below them.
+        pending: List[Tuple[int, str]] = []
+        # Everything below a missing folder is missing too, so it isn't looked up.
+        missing_depth = None
+        for depth, name, code in zip(self.depths, self.names, self.operations):
+            if missing_depth is not None:
+                if depth > missing_depth:
+                    plan.depths.append(depth)
+                    plan.names.append(name)
+                    plan.operations.append(code)
+                    continue
+                missing_depth = None
+            del paths[depth:]
+            full_path = os.path.join(paths[-1], name) if paths else name
+            paths.append(full_path)
+            while pending and pending[-1][0] >= depth:
+                pending.pop()
+            is_folder = existing.get(full_path)
+            if is_folder is None:
+                for pending_depth, pending_name in pending:
+                    plan.append(pending_depth, pending_name, BuildPlan.Operations.REOPEN)
+                pending.clear()
+                plan.depths.append(depth)
+                plan.names.append(name)
+                plan.operations.append(code)
+                if code != create:
+                    missing_depth = depth
+                continue
+            if is_folder != (code != create):
+                raise ValueError(f"'{full_path}' already exists as a {'folder' if is_folder else 'file'}.")
+            if is_folder:
+                pending.append((depth, name))
+        plan.skipped = self.skipped + len(self) - len(plan)
+        logging.info(f"Build plan without existing entries: {len(plan)} operations.")
+        return plan
+
+    def get_ancestors(self, index: int) -> List[int]:
+        """
+        Returns the indexes of the folders an operation is in, outermost first.
+        """
+        ancestors: List[int] = []
+        depth = self.depths[index]
+        while depth:
+            index -= 1
+            if self.depths[index] < depth:
+                depth = self.depths[index]
+                ancestors.append(index)
+        return ancestors[::-1]
+
+    def steps(self, start: int = 0) -> Iterator[Tuple['BuildPlan.Operations', DiagramRecord]]:
+        """
+        Yields every operation from `start` with the record of its entry. The folders
+        the first one is in come before it as reopens.
+        """
+        operations = list(BuildPlan.Operations)
+        paths: List[str] = []
+        if 0 < start < len(self):
+            for index in self.get_ancestors(start):
+                name = self.names[index]
+                full_path = os.path.join(paths[-1], name) if paths else name
+                paths.append(full_path)
+                yield BuildPlan.Operations.REOPEN, DiagramRecord(self.depths[index], name, True, full_path)
+        for depth, name, code in zip(self.depths[start:], itertools.islice(self.names, start, None), self.operations[start:]):
+            del paths[depth:]
+            full_path = os.path.join(paths[-1], name) if paths else name
+            paths.append(full_path)
+            operation = operations[code]
+            yield operation, DiagramRecord(depth, name, operation != BuildPlan.Operations.CREATE, full_path)
+
+    def records(self, start: int = 0) -> Iterator[DiagramRecord]:
+        """
+        Yields the record of every operation, so any build engine can execute the plan.
+        """
+        for _, record in self.steps(start):
+            yield record
+
+    def get_stats(self) -> Dict[str, int]:
+        counts = {operation: self.operations.count(BuildPlan.CODES[operation]) for operation in BuildPlan.Operations}
+        syscalls = sum(BuildPlan.PLANNED_SYSCALLS[operation] * count for operation, count in counts.items())
+        unplanned = sum(BuildPlan.UNPLANNED_SYSCALLS[operation] * count for operation, count in counts.items()) + self.skipped
+        return {
+            **{operation.value: count for operation, count in counts.items()},
+            "skipped": self.skipped,
+            "max_depth": max(self.depths) + 1 if self.depths else 0,
+            "syscalls": syscalls,
+            "syscalls_saved": unplanned - syscalls,
+        }
+
+    def describe(self) -> str:
+        stats = self.get_stats()
+        return f"{stats['mkdir']} mkdir, {stats['create']} create, {stats['reopen']} reopen, {stats['skipped']} skipped, {stats['max_depth']} levels deep; {stats['syscalls']} syscalls, {stats['syscalls_saved']} fewer than creating entry by entry."
+
+    @staticmethod
+    def is_plan(path: str) -> bool:
+        try:
+            with open(path, 'rb') as file:
+                return file.read(len(BuildPlan.MAGIC)) == BuildPlan.MAGIC
+        except OSError:
+            return False
+
+    def save(self, path: str):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(BuildPlan.MAGIC)
+            marshal.dump((BuildPlan.VERSION, self.depths.tobytes(), self.names, bytes(self.operations), self.skipped), file)
+        os.replace(temp_path, path)
+        logging.info(f"Saved build plan: {path}")
+
+    @staticmethod
+    def load(path: str) -> 'BuildPlan':
+        with open(path, 'rb') as file:
+            if file.read(len(BuildPlan.MAGIC)) != BuildPlan.MAGIC:
+                raise ValueError(f"'{path}' is not a build plan.")
+            version, depths, names, operations, skipped = marshal.load(file)
+        if version != BuildPlan.VERSION:
+            raise ValueError(f"Build plan version {version} is not supported.")
+        plan = BuildPlan()
+        plan.depths.frombytes(depths)
+        plan.names = names
+        plan.operations = bytearray(operations)
+        plan.skipped = skipped
+        return plan
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import errno
+import ctypes
+import logging
+import threading
+import contextlib
+from models.trash import TrashBin
+from typing import Union, List
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+
+# <--------------------------- StagedBuild ---------------------------->
+# <--------------------------- StagedBuild ---------------------------->
+
+class StagedBuild:
+    """
+    Builds into a hidden sibling of the destination and swaps it into place, so readers
+    see either the previous tree or the complete new one. On Linux both trees are
+    exchanged in one `renameat2(RENAME_EXCHANGE)`; elsewhere the destination is renamed
+    away and the stage renamed in, which leaves it missing for an instant but never
+    half built.
+
+    Two siblings stay next to the destination after a build. The replaced tree is kept
+    as `.<name>.previous` for rollback until the next swap replaces it. `.<name>.lock`
+    is left in place too, since unlinking a lock file another build already opened
+    would let a third one lock a new file and swap concurrently.
+    """
+
+    # Stages are named `.<destination name>.stage-<time ns>-<pid>`.
+    STAGE_MARKER = '.stage-'
+    PREVIOUS_SUFFIX = '.previous'
+    LOCK_SUFFIX = '.lock'
+
+    AT_FDCWD = -100
+    RENAME_EXCHANGE = 2
+
+    @staticmethod
+    def get_sibling(dist: str, suffix: str) -> str:
+        dist = os.path.abspath(os.path.normpath(dist))
+        return os.path.join(os.path.dirname(dist), '.' + os.path.basename(dist) + suffix)
+
+    @staticmethod
+    def get_previous(dist: str) -> str:
+        return StagedBuild.get_sibling(dist, StagedBuild.PREVIOUS_SUFFIX)
+
+    @staticmethod
+    def create_stage(dist: str) -> str:
+        """
+        Creates an empty stage next to the destination, after clearing the stages of
+        builds that died before swapping.
+        """
+        StagedBuild.clean_stale(dist)
+        stage = StagedBuild.get_sibling(dist, f"{StagedBuild.STAGE_MARKER}{time.time_ns()}-{os.getpid()}")
+        os.makedirs(stage)
+        logging.info(f"Staging build in {stage}")
+        return stage
+
+    @staticmethod
+    def clean_stale(dist: str) -> Union[None, threading.Thread]:
+        """
+        Deletes, in the background, the stages whose build process no longer runs.
+        Stages of concurrent builds are left alone.
+        """
+        prefix = StagedBuild.get_sibling(dist, StagedBuild.STAGE_MARKER)
+        stale: List[str] = []
+        with os.scandir(os.path.dirname(prefix)) as entries:
+            for entry in entries:
+                if entry.path.startswith(prefix) and StagedBuild.is_stale(entry.name):
+                    stale.append(entry.path)
+        if not stale:
+            return None
+        return TrashBin.delete_in_background(stale)
+
+    @staticmethod
+    def is_stale(stage_name: str) -> bool:
+        """
+        Checks whether the process that created a stage is gone. On Windows, where a
+        process can't be probed this way, no stage is considered stale.
+        """
+        try:
+            pid = int(stage_name.rsplit('-', 1)[-1])
+        except ValueError:
+            return False
+        if os.name == 'nt':
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            # Exists, but belongs to another user.
+            return False
+        return False
+
+    @staticmethod
+    @contextlib.contextmanager
+    def lock(dist: str):
+        """
+        Serializes swaps of the same destination between processes, where flock exists.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(StagedBuild.get_sibling(dist, StagedBuild.LOCK_SUFFIX), 'a') as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def exchange(first: str, second: str) -> bool:
+        """
+        Atomically swaps two paths with renameat2. Returns False when the platform or
+        the file system can't.
+        """
+        if not sys.platform.startswith('linux'):
+            return False
+        renameat2 = getattr(ctypes.CDLL(None, use_errno=True), 'renameat2', None)
+        if renameat2 is None:
+            return False
+        result = renameat2(StagedBuild.AT_FDCWD, os.fsencode(first), StagedBuild.AT_FDCWD, os.fsencode(second), ctypes.c_uint(StagedBuild.RENAME_EXCHANGE))
+        if result == 0:
+            return True
+        error = ctypes.get_errno()
+        if error in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+            return False
+        raise OSError(error, os.strerror(error), first)
+
+    @staticmethod
+    def swap(stage: str, dist: str) -> Union[None, str]:
+        """
+        Puts a finished stage in place of the destination and keeps the replaced tree
+        as the previous one, whose own predecessor goes to the trash. Returns the path
+        of the previous tree, or None when there was no destination.
+        """
+        dist = os.path.abspath(os.path.normpath(dist))
+        previous = StagedBuild.get_previous(dist)
+        with StagedBuild.lock(dist):
+            if not os.path.lexists(dist):
+                os.rename(stage, dist)
+                logging.info(f"Moved {stage} to {dist}")
+                return None
+            if os.path.lexists(previous):
+                TrashBin.move(previous, recreate=False)
+            if StagedBuild.exchange(stage, dist):
+                os.rename(stage, previous)
+            else:
+                os.rename(dist, previous)
+                os.rename(stage, dist)
+        TrashBin.clean(previous)
+        logging.info(f"Swapped {stage} into {dist}, previous tree kept in {previous}")
+        return previous
+
+    @staticmethod
+    def rollback(dist: str) -> str:
+        """
+        Swaps the previous tree back in; the replaced one becomes the previous tree, so
+        a second rollback undoes the first.
+        """
+        dist = os.path.abspath(os.path.normpath(dist))
+        previous = StagedBuild.get_previous(dist)
+        if not os.path.isdir(previous):
+            raise ValueError(f"There is no previous tree of {dist} to roll back to.")
+        with StagedBuild.lock(dist):
+            if not StagedBuild.exchange(previous, dist):
+                temp_path = StagedBuild.get_sibling(dist, f"{StagedBuild.STAGE_MARKER}{time.time_ns()}-{os.getpid()}")
+                os.rename(dist, temp_path)
+                os.rename(previous, dist)
+                os.rename(temp_path, previous)
+        logging.info(f"Rolled {dist} back to its previous tree")
+        return previous
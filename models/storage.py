@@ -0,0 +1,244 @@
+import os
+import time
+import errno
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, NamedTuple
+
+
+
+# <--------------------------- StorageEntry ---------------------------->
+# <--------------------------- StorageEntry ---------------------------->
+
+class StorageEntry(NamedTuple):
+    name: str
+    path: str
+    is_folder: bool
+    is_link: bool
+
+
+# <--------------------------- StorageBackend ---------------------------->
+# <--------------------------- StorageBackend ---------------------------->
+
+class StorageBackend(ABC):
+    """
+    Where a build creates its tree. Operations fail with the same OSError subclasses as
+    the os functions they stand for, e.g. FileExistsError or FileNotFoundError.
+    """
+
+    name = ''
+    # Paths name real entries of this machine, so code that calls the operating system
+    # directly, such as renames, descriptors or other processes, sees the same tree.
+    is_local = False
+
+    @abstractmethod
+    def mkdir(self, path: str, parents: bool = False):
+        """
+        Creates a folder, and its missing parents when asked to.
+        """
+        pass
+
+    @abstractmethod
+    def create_file(self, path: str):
+        """
+        Creates an empty file that must not exist yet.
+        """
+        pass
+
+    @abstractmethod
+    def exists(self, path: str) -> bool:
+        pass
+
+    @abstractmethod
+    def is_folder(self, path: str) -> bool:
+        pass
+
+    @abstractmethod
+    def remove(self, path: str):
+        """
+        Removes a file, or a folder with everything below it.
+        """
+        pass
+
+    @abstractmethod
+    def scandir(self, path: str) -> Iterator[StorageEntry]:
+        """
+        Yields the entries of a folder.
+        """
+        pass
+
+    def is_empty(self, path: str) -> bool:
+        for _ in self.scandir(path):
+            return False
+        return True
+
+
+# <--------------------------- LocalStorage ---------------------------->
+# <--------------------------- LocalStorage ---------------------------->
+
+class LocalStorage(StorageBackend):
+    name = 'local'
+    is_local = True
+
+    def mkdir(self, path: str, parents: bool = False):
+        if parents:
+            os.makedirs(path)
+        else:
+            os.mkdir(path)
+
+    def create_file(self, path: str):
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def is_folder(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def remove(self, path: str):
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    def scandir(self, path: str) -> Iterator[StorageEntry]:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                yield StorageEntry(entry.name, entry.path, entry.is_dir(), entry.is_symlink())
+
+
+# <--------------------------- MemoryStorage ---------------------------->
+# <--------------------------- MemoryStorage ---------------------------->
+
+class MemoryStorage(StorageBackend):
+    """
+    A file system held in a dict of folder path -> {child name: is folder}, which starts
+    with only the root. Safe to share between threads, but not between processes.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self.folders: Dict[str, Dict[str, bool]] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    @staticmethod
+    def get_error(code: int, path: str) -> OSError:
+        # OSError picks the subclass of the code, e.g. FileExistsError for EEXIST.
+        return OSError(code, os.strerror(code), path)
+
+    def get_children(self, path: str) -> Dict[str, bool]:
+        """
+        Returns the children of a folder, raising like the os functions when it isn't one.
+        """
+        children = self.folders.get(path)
+        if children is not None:
+            return children
+        parent, name = os.path.split(path)
+        if parent == path:
+            return self.folders.setdefault(path, {})
+        if self.get_children(parent).get(name) is False:
+            raise MemoryStorage.get_error(errno.ENOTDIR, path)
+        raise MemoryStorage.get_error(errno.ENOENT, path)
+
+    def add(self, path: str, is_folder: bool, parents: bool = False):
+        parent, name = os.path.split(path)
+        if parent == path:
+            raise MemoryStorage.get_error(errno.EEXIST, path)
+        try:
+            children = self.get_children(parent)
+        except FileNotFoundError:
+            if not parents:
+                raise
+            self.add(parent, True, True)
+            children = self.folders[parent]
+        if name in children:
+            raise MemoryStorage.get_error(errno.EEXIST, path)
+        children[name] = is_folder
+        if is_folder:
+            self.folders[path] = {}
+
+    def mkdir(self, path: str, parents: bool = False):
+        with self.lock:
+            self.add(MemoryStorage.normalize(path), True, parents)
+
+    def create_file(self, path: str):
+        with self.lock:
+            self.add(MemoryStorage.normalize(path), False)
+
+    def exists(self, path: str) -> bool:
+        path = MemoryStorage.normalize(path)
+        parent, name = os.path.split(path)
+        return parent == path or name in self.folders.get(parent, ())
+
+    def is_folder(self, path: str) -> bool:
+        path = MemoryStorage.normalize(path)
+        return path in self.folders or os.path.dirname(path) == path
+
+    def remove(self, path: str):
+        path = MemoryStorage.normalize(path)
+        parent, name = os.path.split(path)
+        with self.lock:
+            children = self.folders.get(parent, {})
+            if name not in children:
+                raise MemoryStorage.get_error(errno.ENOENT, path)
+            if children.pop(name):
+                folders = [path]
+                while folders:
+                    folder = folders.pop()
+                    for child, is_folder in self.folders.pop(folder).items():
+                        if is_folder:
+                            folders.append(os.path.join(folder, child))
+
+    def scandir(self, path: str) -> Iterator[StorageEntry]:
+        path = MemoryStorage.normalize(path)
+        with self.lock:
+            children = list(self.get_children(path).items())
+        for name, is_folder in children:
+            yield StorageEntry(name, os.path.join(path, name), is_folder, False)
+
+
+# <--------------------------- LatencyStorage ---------------------------->
+# <--------------------------- LatencyStorage ---------------------------->
+
+class LatencyStorage(StorageBackend):
+    """
+    Delays every operation of another backend by a fixed time, to stand in for slow or
+    remote storage. A scandir is delayed once, not per entry.
+    """
+
+    name = 'latency'
+
+    def __init__(self, storage: StorageBackend, latency: float):
+        self.storage = storage
+        self.latency = latency
+        self.is_local = storage.is_local
+
+    def mkdir(self, path: str, parents: bool = False):
+        time.sleep(self.latency)
+        self.storage.mkdir(path, parents)
+
+    def create_file(self, path: str):
+        time.sleep(self.latency)
+        self.storage.create_file(path)
+
+    def exists(self, path: str) -> bool:
+        time.sleep(self.latency)
+        return self.storage.exists(path)
+
+    def is_folder(self, path: str) -> bool:
+        time.sleep(self.latency)
+        return self.storage.is_folder(path)
+
+    def remove(self, path: str):
+        time.sleep(self.latency)
+        self.storage.remove(path)
+
+    def scandir(self, path: str) -> Iterator[StorageEntry]:
+        time.sleep(self.latency)
+        return self.storage.scandir(path)
@@ -0,0 +1,130 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Union, List
+
+
+
+# <--------------------------- TrashBin ---------------------------->
+# <--------------------------- TrashBin ---------------------------->
+
+class TrashBin:
+    """
+    Moves an old destination aside with a single rename to a hidden sibling, so a new
+    build can start at once, and deletes it on background threads. A trash folder
+    left by a crashed run is just another trash folder and is removed on the next one.
+    """
+
+    # Trash folders are named `.<destination name>.trash-<time ns>-<pid>`, so they sort oldest first.
+    MARKER = '.trash-'
+    DELETE_JOBS = 4
+
+    @staticmethod
+    def get_prefix(dist: str) -> str:
+        return '.' + os.path.basename(os.path.normpath(dist)) + TrashBin.MARKER
+
+    @staticmethod
+    def find(dist: str) -> List[str]:
+        """
+        Returns the trash folders of a destination, oldest first.
+        """
+        parent = os.path.dirname(os.path.abspath(os.path.normpath(dist)))
+        prefix = TrashBin.get_prefix(dist)
+        try:
+            with os.scandir(parent) as entries:
+                names = [entry.name for entry in entries if entry.name.startswith(prefix) and entry.is_dir(follow_symlinks=False)]
+        except FileNotFoundError:
+            return []
+        return [os.path.join(parent, name) for name in sorted(names)]
+
+    @staticmethod
+    def move(dist: str, recreate: bool = True) -> Union[None, str]:
+        """
+        Renames the destination to a new trash folder and, unless told not to, recreates
+        it empty. Returns None, after deleting it in place, when it can't be renamed
+        (e.g. a mount point).
+        """
+        dist = os.path.abspath(os.path.normpath(dist))
+        trash_path = os.path.join(os.path.dirname(dist), f"{TrashBin.get_prefix(dist)}{time.time_ns()}-{os.getpid()}")
+        try:
+            os.rename(dist, trash_path)
+        except OSError as error:
+            logging.warning(f"Can't move {dist} to the trash ({error.strerror}), deleting it in place.")
+            shutil.rmtree(dist)
+            trash_path = None
+        if recreate:
+            os.makedirs(dist, exist_ok=True)
+        if trash_path:
+            logging.info(f"Moved {dist} to {trash_path}")
+        return trash_path
+
+    @staticmethod
+    def clean(dist: str, retention: int = 0, jobs: int = DELETE_JOBS) -> Union[None, threading.Thread]:
+        """
+        Deletes all but the `retention` newest trash folders of a destination in the
+        background, returning the thread to join to wait for it.
+        """
+        paths = TrashBin.find(dist)
+        paths = paths[:len(paths) - retention] if retention else paths
+        if not paths:
+            return None
+        return TrashBin.delete_in_background(paths, jobs)
+
+    @staticmethod
+    def delete_in_background(paths: List[str], jobs: int = DELETE_JOBS) -> threading.Thread:
+        """
+        Spreads the top level entries of the folders over `jobs` threads and returns the
+        thread that removes the folders themselves once those are done. Every thread is
+        started here, because none can be started once the interpreter begins to exit.
+        """
+        entries: Queue = Queue()
+        for path in paths:
+            try:
+                with os.scandir(path) as children:
+                    for child in children:
+                        entries.put((child.path, child.is_dir(follow_symlinks=False)))
+            except FileNotFoundError:
+                pass
+        workers = [threading.Thread(target=TrashBin.drain, args=(entries,), name='trash-cleaner') for _ in range(max(1, min(jobs, entries.qsize())))]
+        finisher = threading.Thread(target=TrashBin.finish, args=(paths, workers), name='trash-cleaner')
+        for worker in workers:
+            worker.start()
+        finisher.start()
+        return finisher
+
+    @staticmethod
+    def delete(paths: List[str], jobs: int = DELETE_JOBS):
+        TrashBin.delete_in_background(paths, jobs).join()
+
+    @staticmethod
+    def drain(entries: Queue):
+        while True:
+            try:
+                path, is_folder = entries.get_nowait()
+            except Empty:
+                return
+            TrashBin.remove(path, is_folder)
+
+    @staticmethod
+    def finish(paths: List[str], workers: List[threading.Thread]):
+        for worker in workers:
+            worker.join()
+        for path in paths:
+            TrashBin.remove(path, True)
+            logging.info(f"Deleted trash: {path}")
+
+    @staticmethod
+    def remove(path: str, is_folder: bool):
+        # Another run may be cleaning the same trash, so entries that vanished are fine.
+        try:
+            if is_folder:
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            logging.warning(f"Can't delete trash entry {path}: {error.strerror}")
@@ -453,6 +453,16 @@ class ContainerNode(BasicNode):
         node.parent = self
         self.reload_all()
 
+    def attach(self, node:Union['Node', 'ContainerNode']):
+        """
+        Appends a new child node without reloading the whole subtree.
+        """
+        self.children.append(node)
+        node.parent = self
+        node.path = os.path.join(self.path, node.name)
+        node.level = self.level + 1
+        node.pos = len(self.children)
+
 
     def remove(self, node:Union['Node', 'ContainerNode']):
         """
@@ -644,6 +654,36 @@ class Tree:
     def to_detailed_string(self):
         return self.base_dir.to_detailed_string()
 
+    def save_binary(self, path: str) -> int:
+        """
+        Writes the tree to a compact binary file, see `models.binary.BinaryTree`.
+        """
+        from models.binary import BinaryTree
+        return BinaryTree.save_tree(self, path)
+
+    @staticmethod
+    def load_binary(path: str) -> 'Tree':
+        """
+        Memory-maps a binary tree file; nodes are created when they are first accessed.
+        """
+        from models.binary import BinaryTree
+        return BinaryTree.load(path)
+
+    def save_json(self, path: str, format: Union[None, str] = None) -> int:
+        """
+        Streams the tree to a nested JSON or NDJSON file, see `models.jsontree.TreeJson`.
+        """
+        from models.jsontree import TreeJson
+        return TreeJson.save_tree(self, path, format)
+
+    @staticmethod
+    def load_json(path: str, format: Union[None, str] = None) -> 'Tree':
+        """
+        Builds a tree from a nested JSON or NDJSON file without loading the whole document.
+        """
+        from models.jsontree import TreeJson
+        return TreeJson.load_tree(path, format)
+
     def __str__(self):
         return self.print(self.base_dir)
     
@@ -0,0 +1,334 @@
+import os
+import time
+import shutil
+import logging
+import asyncio
+import itertools
+import tempfile
+from utils.printer import PrinterHelper
+from models.parser import DiagramParser
+from models.cache import DiagramCache
+from models.dialects import DialectRegistry
+from models.binary import BinaryTree
+from models.jsontree import TreeJson
+from models.tree2 import Tree
+from models.builder import Builder
+from models.formatter import Formatter
+from models.incremental import ParseState
+from models.linter import Linter
+from models.plan import BuildPlan
+from models.trash import TrashBin
+from models.journal import BuildJournal
+from models.archive import BuildArchive, zstandard
+from models.storage import StorageBackend, LocalStorage, MemoryStorage, LatencyStorage
+from typing import Union, List, Iterable, Dict, Callable
+
+
+
+def run():
+
+    diagram_path = generate_diagram(os.path.join(tempfile.gettempdir(), 'fg_benchmark_diagram.txt'), breadth=8, depth=6)
+
+    PrinterHelper.print('\nDiagram: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print(f"{diagram_path} ({os.path.getsize(diagram_path) / (1024 * 1024):.1f} MB)")
+
+    PrinterHelper.print('\nParse Modes (tokens): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for mode in DiagramParser.Modes:
+        print_result(mode.value, measure(lambda: consume(DiagramParser.tokens(diagram_path, mode))), diagram_path)
+
+    PrinterHelper.print('\nParse Modes (records): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for mode in DiagramParser.Modes:
+        print_result(mode.value, measure(lambda: consume(DiagramParser.records(diagram_path, mode))), diagram_path)
+
+    PrinterHelper.print('\nParallel Parse (records): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for jobs in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+        print_result(f"{jobs} jobs", measure(lambda: consume(DiagramParser.records(diagram_path, DiagramParser.Modes.PARALLEL, jobs))), diagram_path)
+
+    PrinterHelper.print('\nDialects (records): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for dialect in DialectRegistry.get_names():
+        dialect_path = generate_diagram(os.path.join(tempfile.gettempdir(), f'fg_benchmark_diagram_{dialect}.txt'), breadth=8, depth=6, dialect=dialect)
+        print_result(dialect, measure(lambda: consume(DiagramParser.records(dialect_path))), dialect_path)
+
+    spec_path = generate_spec(os.path.join(tempfile.gettempdir(), 'fg_benchmark_spec.txt'))
+    PrinterHelper.print('\nBrace Expansion (records): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print(f"{spec_path} ({os.path.getsize(spec_path)} bytes)")
+    print_result('expanded', measure(lambda: consume(DiagramParser.records(spec_path))))
+
+    PrinterHelper.print('\nFiltered Build: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for label, include, max_depth in [('max-depth 3', [], 3), ('max-depth 4', [], 4), ('one branch', ['folder_1_0/folder_2_0/**'], None), ('max-depth 5', [], 5)]:
+        print_result(label, measure_build(diagram_path, include, max_depth))
+
+    PrinterHelper.print('\nBuild Plan: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('compile', measure(lambda: len(BuildPlan.compile(DiagramParser.records(diagram_path, DiagramParser.Modes.MMAP)))), diagram_path)
+    print(BuildPlan.compile(DiagramParser.records(diagram_path, DiagramParser.Modes.MMAP)).describe())
+
+    build_path = generate_diagram(os.path.join(tempfile.gettempdir(), 'fg_benchmark_build.txt'), breadth=8, depth=3)
+    PrinterHelper.print('\nThreaded Build (1 ms per syscall): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for jobs in [1, 4, 16, 64]:
+        print_result(f"{jobs} jobs", measure_build(build_path, [], None, latency=0.001, jobs=jobs))
+
+    PrinterHelper.print('\nAppend Build (1 ms per syscall): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for label, missing_ratio in [('full build', 1), ('10% missing', 0.1), ('none missing', 0)]:
+        print_result(label, measure_append(build_path, missing_ratio, latency=0.001))
+
+    shard_path = generate_diagram(os.path.join(tempfile.gettempdir(), 'fg_benchmark_shards.txt'), breadth=8, depth=5)
+    PrinterHelper.print('\nSharded Build: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+        print_result(f"{processes} processes", measure_build(shard_path, [], None, processes=processes))
+
+    PrinterHelper.print('\nArchive (instead of building): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for format in BuildArchive.Formats:
+        if format != BuildArchive.Formats.TAR_ZST or zstandard is not None:
+            print_result(format.value, measure_archive(shard_path, format))
+
+    PrinterHelper.print('\nOverride (time until the build can start): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for mode in Builder.Overrides:
+        print_result(mode.value, measure_override(shard_path, mode))
+
+    deep_path = generate_diagram(os.path.join(tempfile.gettempdir(), 'fg_benchmark_deep.txt'), breadth=2, depth=13)
+    # Built in memory when possible, so disk latency doesn't hide the path lookups.
+    memory_root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    PrinterHelper.print('\nBuild Engines (16k entries, 13 levels): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for engine in Builder.Engines:
+        print_result(engine.value, measure_build(deep_path, [], None, root=memory_root, engine=engine.value))
+
+    PrinterHelper.print('\nResume (0.2 ms per syscall): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('no journal', measure_build(deep_path, [], None, latency=0.0002, root=memory_root))
+    for label, done_ratio in [('full build', 0), ('50% done', 0.5), ('90% done', 0.9)]:
+        print_result(label, measure_resume(deep_path, done_ratio, latency=0.0002, root=memory_root))
+
+    PrinterHelper.print('\nAsync Build (1 ms per syscall): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for builds in [1, 4]:
+        print_result(f"{builds} concurrent", measure_async_builds(build_path, builds, jobs=8, latency=0.001))
+
+    PrinterHelper.print('\nStorage Backends: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('local', measure_build(shard_path, [], None))
+    print_result('memory', measure_build(shard_path, [], None, storage=MemoryStorage()))
+    print_result('memory + 0.1 ms', measure_build(build_path, [], None, latency=0.0001, storage=MemoryStorage()))
+
+    PrinterHelper.print('\nIncremental Re-parse: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('full parse', measure(lambda: sum(1 for node in ParseState.parse(diagram_path).nodes if node)), diagram_path)
+    state = ParseState.parse(diagram_path)
+    with open(diagram_path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+    # Renaming the last file re-parses one line, renaming the first nested folder its whole subtree.
+    print_result('edit a file', measure_edit(state, len(lines) - 1, lines[-1].replace('.ts', '.js')))
+    print_result('edit a folder', measure_edit(state, 1, lines[1].replace('folder_', 'renamed_')))
+
+    PrinterHelper.print('\nFormatter: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('format', measure(lambda: consume(Formatter.format_lines(diagram_path))), diagram_path)
+    small_paths = generate_small_diagrams(os.path.join(tempfile.gettempdir(), 'fg_benchmark_small'), count=1000)
+    print_result('check 1000 files', measure(lambda: sum(1 for path in small_paths if Formatter.is_formatted(path, Formatter.format_lines(path)))))
+
+    PrinterHelper.print('\nLinter: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('lint', measure(lambda: consume(Linter.lint_source(diagram_path))), diagram_path)
+    print_result('lint 1000 files', measure(lambda: sum(consume(Linter.lint_source(path)) for path in small_paths)))
+
+    cache = DiagramCache(tempfile.mkdtemp(prefix='fg_benchmark_cache_'))
+    parse = lambda: DiagramParser.records(diagram_path, DiagramParser.Modes.MMAP)
+
+    PrinterHelper.print('\nDiagram Cache (records): ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('cold', measure(lambda: consume(cache.records(diagram_path, parse))), diagram_path)
+    print_result('warm', measure(lambda: consume(cache.records(diagram_path, parse))), diagram_path)
+    print(f"hits: {cache.hits}, misses: {cache.misses}")
+
+    binary_path = os.path.join(tempfile.gettempdir(), 'fg_benchmark_tree' + BinaryTree.FILE_EXTENSION)
+    PrinterHelper.print('\nBinary Tree: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print_result('save', measure(lambda: BinaryTree.save_records(DiagramParser.records(diagram_path, DiagramParser.Modes.MMAP), 'benchmark', binary_path)), diagram_path)
+    print(f"{binary_path} ({os.path.getsize(binary_path) / (1024 * 1024):.1f} MB)")
+    print_result('open', measure(lambda: Tree.load_binary(binary_path).base_dir.count()))
+    print_result('records', measure(lambda: consume(BinaryTree.records(binary_path))), binary_path)
+
+    PrinterHelper.print('\nJSON Tree: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    for format in TreeJson.Formats:
+        json_path = os.path.join(tempfile.gettempdir(), f'fg_benchmark_tree.{format.value}')
+        print_result(f"{format.value} write", measure(lambda: TreeJson.write(DiagramParser.records(diagram_path, DiagramParser.Modes.MMAP), json_path, 'benchmark')), diagram_path)
+        print_result(f"{format.value} read", measure(lambda: consume(TreeJson.records(json_path))), json_path)
+
+    print('')
+
+
+def generate_diagram(path: str, breadth: int, depth: int, dialect: str = 'box') -> str:
+    """
+    Writes a synthetic diagram with `breadth` folders and files on every level.
+    """
+    connectors = {
+        'box': ('├── ', '└── ', '│   ', '    '),
+        'gnu': ('├── ', '└── ', '│\xa0\xa0 ', '\xa0\xa0\xa0 '),
+        'ascii': ('|-- ', '`-- ', '|   ', '    '),
+    }
+    def write_entry(file, indent: str, is_last: bool, level: int, name: str):
+        if dialect == 'tabs':
+            file.write('\t' * (level - 1) + name + '\n')
+        elif dialect == 'markdown':
+            file.write('  ' * (level - 1) + '- ' + name + '\n')
+        else:
+            file.write(indent + connectors[dialect][1 if is_last else 0] + name + '\n')
+    def write_level(file, indent: str, level: int):
+        for index in range(breadth):
+            is_last = index == breadth - 1
+            if level < depth:
+                write_entry(file, indent, is_last, level, f"folder_{level}_{index}/")
+                write_level(file, indent + connectors.get(dialect, connectors['box'])[3 if is_last else 2], level + 1)
+            else:
+                write_entry(file, indent, is_last, level, f"file_{level}_{index}.ts")
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as file:
+            if dialect == 'gnu':
+                file.write('.\n')
+            write_level(file, '', 1)
+    return path
+
+def generate_spec(path: str) -> str:
+    """
+    Writes a short diagram that expands to a few hundred thousand entries.
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(
+            "├── README.md\n"
+            "└── shard_{000..999}/\n"
+            "    ├── user_{model,controller,service}.ts\n"
+            "    ├── index.ts\n"
+            "    └── part_{a..z}/\n"
+            "        ├── {1..10}.json\n"
+            "        └── cfg_{x,y}/\n"
+        )
+    return path
+
+def get_storage(latency: float = 0, storage: Union[None, StorageBackend] = None) -> StorageBackend:
+    """
+    Returns the storage of a measured build, slowed down to stand in for a network
+    file system when a latency is given.
+    """
+    storage = storage or LocalStorage()
+    return LatencyStorage(storage, latency) if latency else storage
+
+def measure_build(diagram_path: str, include: List[str], max_depth: Union[None, int], latency: float = 0, root: Union[None, str] = None, storage: Union[None, StorageBackend] = None, **options) -> Dict[str, float]:
+    """
+    Times building the selected part of a diagram into a new temporary folder, with
+    any other build arguments passed as options.
+    """
+    dist = tempfile.mkdtemp(prefix='fg_benchmark_build_', dir=root)
+    if storage:
+        storage.mkdir(dist, parents=True)
+    request_data = {"args": {"source": diagram_path, "dist": dist, "parse_mode": DiagramParser.Modes.MMAP.value, "include": include, "exclude": [], "max_depth": max_depth, "no_cache": True, **options}, "storage": get_storage(latency, storage)}
+    result = measure(lambda: Builder.handle_generate(request_data) and 0)
+    result["count"] = len(Builder.snapshot(dist, storage or LocalStorage()))
+    shutil.rmtree(dist)
+    if storage:
+        storage.remove(dist)
+    return result
+
+def measure_append(diagram_path: str, missing_ratio: float, latency: float) -> Dict[str, float]:
+    """
+    Times appending to a full build of a diagram from which a share of the files was removed.
+    """
+    dist = tempfile.mkdtemp(prefix='fg_benchmark_append_')
+    request_data = {"args": {"source": diagram_path, "dist": dist, "parse_mode": DiagramParser.Modes.MMAP.value, "no_cache": True}}
+    if missing_ratio < 1:
+        Builder.handle_generate(request_data)
+        files = sorted(os.path.join(folder, name) for folder, _, names in os.walk(dist) for name in names)
+        for path in files[:int(len(files) * missing_ratio)]:
+            os.remove(path)
+    request_data["args"]["append"] = True
+    request_data["storage"] = get_storage(latency)
+    result = measure(lambda: Builder.handle_generate(request_data) and 0)
+    result["count"] = sum(len(folders) + len(files) for _, folders, files in os.walk(dist))
+    shutil.rmtree(dist)
+    return result
+
+def measure_archive(diagram_path: str, format) -> Dict[str, float]:
+    """
+    Times streaming a diagram into an archive file, which is all the file system sees.
+    """
+    path = os.path.join(tempfile.gettempdir(), f'fg_benchmark_archive.{format.value}')
+    records = Builder.get_records({"args": {"source": diagram_path, "parse_mode": DiagramParser.Modes.MMAP.value, "no_cache": True}})
+    result = measure(lambda: BuildArchive.write(records, path, format))
+    os.remove(path)
+    return result
+
+def measure_override(diagram_path: str, mode) -> Dict[str, float]:
+    """
+    Times clearing a built destination for '-o', then waits for any background deletion.
+    """
+    dist = tempfile.mkdtemp(prefix='fg_benchmark_override_')
+    request_data = {"args": {"source": diagram_path, "dist": dist, "parse_mode": DiagramParser.Modes.MMAP.value, "no_cache": True, "override_mode": mode.value}}
+    Builder.handle_generate(request_data)
+    count = sum(len(folders) + len(files) for _, folders, files in os.walk(dist))
+    result = measure(lambda: Builder.clear_dist(request_data) or count)
+    cleaner = TrashBin.clean(dist)
+    if cleaner:
+        cleaner.join()
+    shutil.rmtree(dist)
+    return result
+
+def measure_resume(diagram_path: str, done_ratio: float, latency: float, root: Union[None, str] = None) -> Dict[str, float]:
+    """
+    Times resuming a build that was interrupted once a share of its plan was created.
+    """
+    dist = tempfile.mkdtemp(prefix='fg_benchmark_resume_', dir=root)
+    request_data = {"args": {"source": diagram_path, "dist": dist, "parse_mode": DiagramParser.Modes.MMAP.value, "no_cache": True, "journal": True}}
+    if done_ratio:
+        plan = Builder.get_plan(request_data)
+        journal = BuildJournal.create(dist, BuildJournal.get_fingerprint(plan, BuildJournal.ORDERED_LAYOUT))
+        for record in itertools.islice(journal.track(plan, 0, BuildJournal.INTERVAL), int(len(plan) * done_ratio)):
+            Builder.create_entry(os.path.join(dist, record.full_path), record.is_folder, LocalStorage())
+        journal.close()
+        request_data["args"]["resume"] = True
+    request_data["storage"] = get_storage(latency)
+    result = measure(lambda: Builder.handle_generate(request_data) and 0)
+    result["count"] = sum(len(folders) + len(files) for _, folders, files in os.walk(dist))
+    shutil.rmtree(dist)
+    return result
+
+def measure_async_builds(diagram_path: str, builds: int, jobs: int, latency: float) -> Dict[str, float]:
+    """
+    Times several async builds of a diagram multiplexed on one event loop.
+    """
+    dists = [tempfile.mkdtemp(prefix='fg_benchmark_async_') for _ in range(builds)]
+    async def build(dist: str) -> int:
+        request_data = {"args": {"source": diagram_path, "dist": dist, "jobs": jobs, "no_cache": True}, "storage": get_storage(latency)}
+        count = 0
+        async for _ in Builder.generate_async(request_data):
+            count += 1
+        return count
+    async def build_all() -> int:
+        return sum(await asyncio.gather(*(build(dist) for dist in dists)))
+    result = measure(lambda: asyncio.run(build_all()))
+    for dist in dists:
+        shutil.rmtree(dist)
+    return result
+
+def measure_edit(state: ParseState, index: int, line: str) -> Dict[str, float]:
+    return measure(lambda: state.apply(index, index + 1, [line])["added"])
+
+def generate_small_diagrams(folder: str, count: int) -> List[str]:
+    """
+    Writes `count` copies of a small diagram, as found in a repository full of layouts.
+    """
+    os.makedirs(folder, exist_ok=True)
+    small_path = generate_diagram(os.path.join(folder, 'template.txt'), breadth=3, depth=3)
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f'diagram_{index}.txt')
+        if not os.path.exists(path):
+            shutil.copyfile(small_path, path)
+        paths.append(path)
+    return paths
+
+def consume(iterable: Iterable) -> int:
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+def measure(function: Callable[[], int]) -> Dict[str, float]:
+    start = time.perf_counter()
+    count = function()
+    return {"count": count, "seconds": time.perf_counter() - start}
+
+def print_result(label: str, result: Dict[str, float], diagram_path: Union[None, str] = None):
+    text = f"{label:<16} {result['count']:>10} entries  {result['seconds']:8.3f}s"
+    if diagram_path:
+        text += f"  {os.path.getsize(diagram_path) / (1024 * 1024) / result['seconds']:8.1f} MB/s"
+    print(text)
@@ -0,0 +1,192 @@
+import os
+import shutil
+import logging
+import tempfile
+from models.builder import Builder
+from models.journal import BuildJournal
+from models.plan import BuildPlan
+from models.storage import LocalStorage
+from typing import List, Dict
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_builder_')
+    try:
+        check_append(folder)
+        check_resume(folder)
+    finally:
+        shutil.rmtree(folder)
+    print('Builder tests passed.')
+
+
+def check_append(folder: str):
+    """
+    Appending to a partly deleted build recreates exactly the missing entries and
+    leaves the remaining ones alone.
+    """
+    source = write(folder, 'diagram.txt',
+        "app/\n"
+        "├── src/\n"
+        "│   ├── index.js\n"
+        "│   ├── users/\n"
+        "│   │   ├── model.js\n"
+        "│   │   └── view.js\n"
+        "│   └── posts/\n"
+        "│       └── model.js\n"
+        "├── README.md\n"
+        "└── docs/\n"
+        "    └── guide.md\n"
+    )
+    dist = os.path.join(folder, 'dist')
+    os.mkdir(dist)
+    request_data = {"args": {"source": source, "dist": dist, "override": False, "no_cache": True}}
+    Builder.handle_generate(request_data)
+    full = Builder.snapshot(dist, LocalStorage())
+    assert len(full) == 11, full
+
+    # A whole subtree, a file next to kept siblings and a file that empties its folder.
+    shutil.rmtree(os.path.join(dist, 'app', 'src', 'users'))
+    os.remove(os.path.join(dist, 'app', 'README.md'))
+    os.remove(os.path.join(dist, 'app', 'docs', 'guide.md'))
+    kept = get_identities(dist)
+    with open(os.path.join(dist, 'app', 'src', 'index.js'), 'w', encoding='utf-8') as file:
+        file.write('edited')
+    missing = set(full) - set(Builder.snapshot(dist, LocalStorage()))
+    assert missing == {os.path.join('app', 'src', 'users'), os.path.join('app', 'src', 'users', 'model.js'), os.path.join('app', 'src', 'users', 'view.js'), os.path.join('app', 'README.md'), os.path.join('app', 'docs', 'guide.md')}, missing
+
+    append_data = {"args": {**request_data["args"], "append": True}}
+    plan = Builder.get_plan(append_data)
+    created = {record.full_path for operation, record in plan.steps() if operation != BuildPlan.Operations.REOPEN}
+    assert created == missing, created
+
+    Builder.handle_generate(append_data)
+    assert Builder.snapshot(dist, LocalStorage()) == full
+    identities = get_identities(dist)
+    assert {path: identities[path] for path in kept} == kept
+    with open(os.path.join(dist, 'app', 'src', 'index.js'), 'r', encoding='utf-8') as file:
+        assert file.read() == 'edited'
+
+    # Nothing is missing any more, so appending again plans and creates nothing.
+    assert len(Builder.get_plan(append_data)) == 0
+    storage = CountingStorage()
+    with CapturedLogs() as logs:
+        Builder.handle_generate({**append_data, "storage": storage})
+    assert storage.created == [], storage.created
+    assert logs.messages == [], logs.messages
+    assert get_identities(dist) == identities
+
+    # An entry that exists with the other type can't be appended to.
+    shutil.rmtree(os.path.join(dist, 'app', 'docs'))
+    write(os.path.join(dist, 'app'), 'docs', '')
+    try:
+        Builder.get_plan(append_data)
+    except ValueError as error:
+        assert str(error) == f"'{os.path.join('app', 'docs')}' already exists as a file.", error
+    else:
+        raise AssertionError("Appending over a file in place of a folder should fail.")
+
+
+def check_resume(folder: str):
+    """
+    Resuming an interrupted journaled build creates the rest of the tree, quietly
+    skipping the entries built after the last journal record.
+    """
+    lines = ["resume/"]
+    for section in range(6):
+        lines.append(f"├── section{section}/")
+        lines.extend(f"│   ├── file{index}.txt" for index in range(99))
+        lines.append("│   └── last.txt")
+    lines.append("└── end.txt")
+    source = write(folder, 'resume.txt', '\n'.join(lines) + '\n')
+    dist = os.path.join(folder, 'resumed')
+    os.mkdir(dist)
+    request_data = {"args": {"source": source, "dist": dist, "no_cache": True, "journal": True}}
+    # Stops past a journal record, so some of the entries left to build exist already.
+    stopped = BuildJournal.INTERVAL + 100
+    try:
+        Builder.handle_generate({**request_data, "storage": InterruptedStorage(stopped)})
+    except Interrupted:
+        pass
+    else:
+        raise AssertionError("The build should have been interrupted.")
+    assert len(Builder.snapshot(dist, LocalStorage())) < 608
+    assert os.path.exists(BuildJournal.get_path(dist))
+
+    with CapturedLogs() as logs:
+        results = Builder.handle_generate({"args": {**request_data["args"], "journal": False, "resume": True}})
+    assert results["status"], results
+    assert logs.messages == [], logs.messages
+    assert len(Builder.snapshot(dist, LocalStorage())) == 608
+    assert not os.path.exists(BuildJournal.get_path(dist))
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def get_identities(dist: str) -> Dict[str, int]:
+    """
+    Returns the inode of every entry below the destination, by relative path.
+    """
+    return {path: os.stat(os.path.join(dist, path)).st_ino for path in Builder.snapshot(dist, LocalStorage())}
+
+
+
+class CountingStorage(LocalStorage):
+    """
+    Local storage that records every entry it's asked to create.
+    """
+
+    def __init__(self):
+        self.created: List[str] = []
+
+    def mkdir(self, path: str, parents: bool = False):
+        self.created.append(path)
+        super().mkdir(path, parents)
+
+    def create_file(self, path: str):
+        self.created.append(path)
+        super().create_file(path)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptedStorage(LocalStorage):
+    """
+    Local storage that stops the build when it's asked for one file too many.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def create_file(self, path: str):
+        if self.limit == 0:
+            raise Interrupted(path)
+        self.limit -= 1
+        super().create_file(path)
+
+
+class CapturedLogs(logging.Handler):
+    """
+    Collects the warnings logged while it's open.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+    def __enter__(self) -> 'CapturedLogs':
+        logging.getLogger().addHandler(self)
+        return self
+
+    def __exit__(self, *_):
+        logging.getLogger().removeHandler(self)
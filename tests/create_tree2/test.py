@@ -10,6 +10,7 @@ from utils.tree.helper import TreeExample
 from utils.printer import PrinterHelper
 from models.abstractGenerator import AbstarctGenerator
 from models.tree2 import ContainerNode, Node, Tree, TreeData, NodeRegistry
+from models.parser import DiagramParser
 from typing import Union, List, Iterable, Dict, Literal
 
 
@@ -57,6 +58,13 @@ def run():
 
 
     
+    print('')
+
+    diagram_tree = generate_tree_from_diagram('d/express_diagram.txt')
+
+    PrinterHelper.print('\nTree #2 (Diagram) Structure: ', [PrinterHelper.Formats.UNDERLINE, PrinterHelper.Colors.PURPLE])
+    print(str(TreePrinter.ContainerPrinter.get_structure_text(diagram_tree.base_dir)))
+
     print('')
 
     #print('')
@@ -75,6 +83,10 @@ def generate_tree() -> Tree:
     tree = TreeExample.get_tree()
     return tree
 
+def generate_tree_from_diagram(diagram_path: str) -> Tree:
+    tree = DiagramParser.parse_tree(diagram_path)
+    return tree
+
 def get_nodes_group(tree: Tree, paths: Union[str, List[str]]) -> Union[List[Union['Node', 'ContainerNode']] , None]:
     results = tree.get(paths) 
     if results is None:
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from models.parser import DiagramParser
+from models.dialects import DialectRegistry
+from typing import List
+
+
+
+BOX = (
+    "├── src/\n"
+    "│   ├── index.js\n"
+    "│   └── lib/\n"
+    "│       └── a.js\n"
+    "└── README.md\n"
+)
+
+# The same tree in every dialect, as written by hand or printed by `tree`.
+DIALECTS = [
+    ('gnu', (
+        ".\n"
+        "├── src\n"
+        "│\xa0\xa0 ├── index.js\n"
+        "│\xa0\xa0 └── lib\n"
+        "│\xa0\xa0     └── a.js\n"
+        "└── README.md\n"
+        "\n"
+        "2 directories, 3 files\n"
+    )),
+    ('ascii', (
+        ".\n"
+        "|-- src\n"
+        "|   |-- index.js\n"
+        "|   `-- lib\n"
+        "|       `-- a.js\n"
+        "`-- README.md\n"
+        "\n"
+        "2 directories, 3 files\n"
+    )),
+    ('ascii', (
+        "+-- src/\n"
+        "|   +-- index.js\n"
+        "|   `-- lib/\n"
+        "|       `-- a.js\n"
+        "`-- README.md\n"
+    )),
+    ('markdown', (
+        "# Layout\n"
+        "\n"
+        "- src/\n"
+        "  - index.js\n"
+        "  - `lib`\n"
+        "    - a.js\n"
+        "- README.md\n"
+    )),
+    ('tabs', (
+        "src\n"
+        "\tindex.js\n"
+        "\tlib\n"
+        "\t\ta.js\n"
+        "README.md\n"
+    )),
+]
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_dialects_')
+    try:
+        check_dialects(folder)
+        check_root_lines(folder)
+    finally:
+        shutil.rmtree(folder)
+    print('Dialect tests passed.')
+
+
+def check_dialects(folder: str):
+    """
+    Every dialect is sniffed from its own text and parses to the records of the box form.
+    """
+    expected = get_records(write(folder, 'box.txt', BOX))
+    assert DiagramParser.sniff(os.path.join(folder, 'box.txt')).name == 'box'
+    for index, (name, text) in enumerate(DIALECTS):
+        path = write(folder, f'{name}_{index}.txt', text)
+        assert DiagramParser.sniff(path).name == name, (name, DiagramParser.sniff(path).name)
+        # Only box diagrams are parsed in parallel, so the other modes are enough.
+        for mode in (DiagramParser.Modes.LINES, DiagramParser.Modes.MMAP):
+            assert get_records(path, mode) == expected, (name, mode)
+        assert get_records(path, dialect=name) == expected, name
+    assert sorted(DialectRegistry.get_names()) == sorted({'box'} | {name for name, _ in DIALECTS})
+
+def check_root_lines(folder: str):
+    """
+    A root line other than `.` stays the parent of the entries below it in ascii
+    diagrams too, and needs no trailing slash there.
+    """
+    expected = get_records(write(folder, 'box_root.txt', "my-app/\n" + BOX))
+    for text in ["my-app\n|-- src\n|   |-- index.js\n|   `-- lib\n|       `-- a.js\n`-- README.md\n", "my-app/\n" + DIALECTS[2][1]]:
+        assert get_records(write(folder, 'ascii_root.txt', text)) == expected, text
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def get_records(path: str, mode=DiagramParser.Modes.LINES, dialect: str = None) -> List[tuple]:
+    return [tuple(record) for record in DiagramParser.records(path, mode, 2, dialect)]
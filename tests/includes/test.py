@@ -0,0 +1,138 @@
+import os
+import time
+import shutil
+import tempfile
+from models.parser import DiagramParser
+from models.includes import DiagramIncluder
+from typing import Union, List
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_includes_')
+    try:
+        DiagramIncluder.clear()
+        check_cycles(folder)
+        check_touched_files(folder)
+        check_brace_expansion(folder)
+        check_cache_limit(folder)
+    finally:
+        DiagramIncluder.clear()
+        shutil.rmtree(folder)
+    print('Include tests passed.')
+
+
+def check_cycles(folder: str):
+    """
+    A file including itself, directly or through another file, is an error.
+    """
+    direct = write(folder, 'direct.txt', "├── a.txt\n└── @include direct.txt\n")
+    assert get_error(direct) == "Line 2: include cycle: direct.txt -> direct.txt."
+
+    first = write(folder, 'first.txt', "└── docs/\n    └── @include second.txt\n")
+    write(folder, 'second.txt', "├── guide.md\n└── @include first.txt\n")
+    assert get_error(first) == f"In included file '{os.path.realpath(os.path.join(folder, 'second.txt'))}': Line 2: include cycle: first.txt -> second.txt -> first.txt."
+
+    # Including the same file twice side by side isn't a cycle.
+    write(folder, 'leaf.txt', "└── leaf.md\n")
+    twice = write(folder, 'twice.txt', "├── a/\n│   └── @include leaf.txt\n└── b/\n    └── @include leaf.txt\n")
+    assert get_paths(twice) == ['a', 'a/leaf.md', 'b', 'b/leaf.md']
+
+def check_touched_files(folder: str):
+    """
+    Editing an included file, or a file it includes, between two parses is picked up
+    instead of reusing the cached subtree.
+    """
+    parent = write(folder, 'parent.txt', "└── app/\n    └── @include child.txt\n")
+    child = write(folder, 'child.txt', "├── src/\n│   └── @include grandchild.txt\n└── old.md\n")
+    grandchild = write(folder, 'grandchild.txt', "└── index.js\n")
+    assert get_paths(parent) == ['app', 'app/src', 'app/src/index.js', 'app/old.md']
+    assert DiagramIncluder.__subtrees__[os.path.realpath(child)][0] == mtime(child)
+
+    touch(child, "├── src/\n│   └── @include grandchild.txt\n└── new.md\n")
+    assert get_paths(parent) == ['app', 'app/src', 'app/src/index.js', 'app/new.md']
+    # The new version replaces the old one instead of being kept next to it.
+    assert DiagramIncluder.__subtrees__[os.path.realpath(child)][0] == mtime(child)
+
+    # The child itself is unchanged, but its cached subtree includes a changed file.
+    touch(grandchild, "└── main.js\n")
+    includer = DiagramIncluder()
+    assert get_paths(parent, includer) == ['app', 'app/src', 'app/src/main.js', 'app/new.md']
+    assert includer.dependencies == {os.path.realpath(child): mtime(child), os.path.realpath(grandchild): mtime(grandchild)}
+
+    os.remove(grandchild)
+    assert get_error(parent) == f"In included file '{os.path.realpath(child)}': Line 2: included file '{os.path.realpath(grandchild)}' does not exist."
+
+def check_brace_expansion(folder: str):
+    """
+    An include under an expanded folder is spliced into every copy of it, and braces in
+    the included file are expanded too.
+    """
+    write(folder, 'shard.txt', "├── index.ts\n└── part_{a,b}.json\n")
+    spec = write(folder, 'spec.txt', "└── shard_{1..2}/\n    └── @include shard.txt\n")
+    assert get_paths(spec) == [
+        'shard_1', 'shard_1/index.ts', 'shard_1/part_a.json', 'shard_1/part_b.json',
+        'shard_2', 'shard_2/index.ts', 'shard_2/part_a.json', 'shard_2/part_b.json',
+    ]
+    assert get_paths(spec, expand=False) == ['shard_{1..2}', 'shard_{1..2}/index.ts', 'shard_{1..2}/part_{a,b}.json']
+
+def check_cache_limit(folder: str):
+    """
+    The cached subtrees stay within MAX_CACHED_TOKENS, dropping the least recently
+    used ones first.
+    """
+    DiagramIncluder.clear()
+    limit = DiagramIncluder.MAX_CACHED_TOKENS
+    DiagramIncluder.MAX_CACHED_TOKENS = 4
+    try:
+        parts = [write(folder, f'part{index}.txt', "├── a.md\n└── b.md\n") for index in range(3)]
+        for index in range(3):
+            write(folder, f'use{index}.txt', f"└── @include part{index}.txt\n")
+        assert get_paths(os.path.join(folder, 'use0.txt')) == ['a.md', 'b.md']
+        assert get_paths(os.path.join(folder, 'use1.txt')) == ['a.md', 'b.md']
+        # Using part0 again makes part1 the least recently used.
+        get_paths(os.path.join(folder, 'use0.txt'))
+        get_paths(os.path.join(folder, 'use2.txt'))
+        assert list(DiagramIncluder.__subtrees__) == [os.path.realpath(parts[0]), os.path.realpath(parts[2])]
+        assert DiagramIncluder.__cached_tokens__ == 4
+
+        # A subtree larger than the whole cache is used but not kept.
+        big = write(folder, 'big.txt', ''.join(f"├── {index}.md\n" for index in range(5)))
+        write(folder, 'use_big.txt', "└── @include big.txt\n")
+        assert len(get_paths(os.path.join(folder, 'use_big.txt'))) == 5
+        assert os.path.realpath(big) not in DiagramIncluder.__subtrees__
+        assert DiagramIncluder.__cached_tokens__ <= 4
+    finally:
+        DiagramIncluder.MAX_CACHED_TOKENS = limit
+        DiagramIncluder.clear()
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def touch(path: str, text: str):
+    """
+    Rewrites a file with a later mtime, even on file systems with coarse timestamps.
+    """
+    previous = mtime(path)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    if mtime(path) <= previous:
+        os.utime(path, ns=(time.time_ns(), previous + 1_000_000_000))
+
+def mtime(path: str) -> int:
+    return os.stat(path).st_mtime_ns
+
+def get_paths(path: str, includer: Union[None, DiagramIncluder] = None, expand: bool = True) -> List[str]:
+    return [record.full_path.replace(os.sep, '/') for record in DiagramParser.records(path, includer=includer, expand=expand)]
+
+def get_error(path: str) -> Union[None, str]:
+    try:
+        get_paths(path)
+    except ValueError as error:
+        return str(error)
+    return None
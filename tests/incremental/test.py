@@ -0,0 +1,117 @@
+import io
+import os
+import random
+from models.incremental import ParseState
+from typing import Union, List, Tuple
+
+
+
+def run():
+
+    check_edits()
+    check_rejected_edit()
+    check_random_edits(seed=5, diagrams=500, edits=8)
+    print('Incremental tests passed.')
+
+
+def check_edits():
+    """
+    Inserting, replacing and deleting lines gives the tree of a full re-parse.
+    """
+    lines = [
+        "├── src/\n",
+        "│   ├── index.js\n",
+        "│   └── utils/\n",
+        "│       └── math.js\n",
+        "└── README.md\n",
+    ]
+    state = parse(lines)
+    # Insert a sibling of index.js.
+    lines = edit(state, lines, 2, 2, ["│   ├── app.js\n"])
+    # Replace the utils folder line, moving math.js under the renamed folder.
+    lines = edit(state, lines, 3, 4, ["│   └── helpers/\n"])
+    # Deleting only the folder line would leave math.js under the file app.js.
+    assert apply_error(state, lines, 3, 4, []) == f"Line 4: 'math.js' is placed under the file '{os.path.join('src', 'app.js')}'."
+    # Delete the folder with its entry.
+    lines = edit(state, lines, 3, 5, [])
+    # Add and then remove a root line, which nests and un-nests everything below it.
+    lines = edit(state, lines, 0, 0, ["my-app/\n"])
+    assert [child.name for child in state.tree.base_dir.children] == ['my-app']
+    lines = edit(state, lines, 0, 1, [])
+    assert [child.name for child in state.tree.base_dir.children] == ['src', 'README.md']
+
+def check_rejected_edit():
+    """
+    An edit that doesn't parse raises and leaves the state untouched.
+    """
+    lines = ["├── notes.txt\n", "└── docs/\n", "    └── guide.md\n"]
+    state = parse(lines)
+    tree, tokens, shifts = dump(state.tree.base_dir), list(state.tokens), list(state.shifts)
+    assert apply_error(state, lines, 1, 2, ["│   ├── a\n"]) == "Line 2: 'a' is placed under the file 'notes.txt'."
+    assert dump(state.tree.base_dir) == tree
+    assert (state.tokens, state.shifts) == (tokens, shifts)
+    # The state is still usable afterwards.
+    edit(state, lines, 2, 3, ["    └── index.md\n"])
+
+def check_random_edits(seed: int, diagrams: int, edits: int):
+    """
+    Random edits on random diagrams, checked against a full re-parse after every one.
+    """
+    rng = random.Random(seed)
+    applied = rejected = 0
+    for _ in range(diagrams):
+        lines = [generate_line(rng) for _ in range(rng.randint(0, 20))]
+        try:
+            state = parse(lines)
+        except ValueError:
+            continue
+        for _ in range(edits):
+            start = rng.randint(0, len(lines))
+            end = rng.randint(start, min(len(lines), start + 3))
+            new_lines = [generate_line(rng) for _ in range(rng.choice([0, 1, 1, 2, 3]))]
+            before = dump(state.tree.base_dir)
+            try:
+                expected = parse(lines[:start] + new_lines + lines[end:])
+            except ValueError:
+                expected = None
+            try:
+                state.apply(start, end, new_lines)
+            except ValueError:
+                assert expected is None, (lines, start, end, new_lines)
+                assert dump(state.tree.base_dir) == before, (lines, start, end, new_lines)
+                rejected += 1
+                continue
+            assert expected is not None, (lines, start, end, new_lines)
+            assert dump(state.tree.base_dir) == dump(expected.tree.base_dir), (lines, start, end, new_lines)
+            assert (state.tokens, state.shifts) == (expected.tokens, expected.shifts), (lines, start, end, new_lines)
+            lines = lines[:start] + new_lines + lines[end:]
+            applied += 1
+    assert applied and rejected, (applied, rejected)
+
+
+def parse(lines: List[str]) -> ParseState:
+    return ParseState.parse(io.StringIO(''.join(lines)), 'root')
+
+def edit(state: ParseState, lines: List[str], start: int, end: int, new_lines: List[str]) -> List[str]:
+    lines = lines[:start] + new_lines + lines[end:]
+    state.apply(start, end, new_lines)
+    assert dump(state.tree.base_dir) == dump(parse(lines).tree.base_dir), lines
+    return lines
+
+def apply_error(state: ParseState, lines: List[str], start: int, end: int, new_lines: List[str]) -> Union[None, str]:
+    try:
+        state.apply(start, end, new_lines)
+    except ValueError as error:
+        return str(error)
+    return None
+
+def dump(node) -> List[Tuple]:
+    """
+    Returns everything below a node that a tree compares on, nested like the tree.
+    """
+    return [(child.name, child.is_container(), child.level, child.pos, child.path, dump(child) if child.is_container() else None) for child in node.children]
+
+def generate_line(rng: random.Random) -> str:
+    if rng.random() < 0.1:
+        return rng.choice(['app/\n', 'lib/\n', '\n'])
+    return '│   ' * rng.randint(0, 3) + rng.choice(['├── ', '└── ']) + rng.choice(['a/', 'b/', 'c.txt', 'd/']) + '\n'
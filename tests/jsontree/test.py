@@ -0,0 +1,80 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+from models.parser import DiagramParser
+from models.jsontree import JsonTokenizer, TreeJson
+from typing import Any, List
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_jsontree_')
+    try:
+        check_round_trip(folder)
+        check_chunk_boundaries(folder)
+    finally:
+        shutil.rmtree(folder)
+    print('JSON tree tests passed.')
+
+
+def check_round_trip(folder: str):
+    """
+    Exporting the records of a diagram and importing them again gives the same records,
+    in both formats.
+    """
+    source = write(folder, 'diagram.txt',
+        "├── src/\n"
+        "│   ├── index.js\n"
+        "│   └── \"quoted\" é/\n"
+        "│       └── empty/\n"
+        "└── README.md\n"
+    )
+    records = list(DiagramParser.records(source))
+    for format in TreeJson.Formats:
+        path = os.path.join(folder, 'tree.' + format.value)
+        assert TreeJson.write(DiagramParser.records(source), path, 'app') == len(records)
+        assert list(TreeJson.records(path)) == records, format
+        tree = TreeJson.load_tree(path)
+        assert list(TreeJson.tree_records(tree)) == records, format
+    assert TreeJson.read_root_name(os.path.join(folder, 'tree.json')) == 'app'
+
+def check_chunk_boundaries(folder: str):
+    """
+    Numbers, strings and literals split between two chunks are read whole.
+    """
+    values = [12.5, -0.25e-3, 1E5, 0, -7, 1e+21, "a \"b\" c", True, False, None]
+    text = json.dumps(values)
+    expected = get_values(JsonTokenizer(io.StringIO(text)))
+    assert expected == values, expected
+    chunk_size = JsonTokenizer.CHUNK_SIZE
+    try:
+        for JsonTokenizer.CHUNK_SIZE in range(1, 9):
+            assert get_values(JsonTokenizer(io.StringIO(text))) == values, JsonTokenizer.CHUNK_SIZE
+    finally:
+        JsonTokenizer.CHUNK_SIZE = chunk_size
+
+    # A tree file with a key it doesn't use, whose number ends or starts on every
+    # character around the end of the first chunk.
+    number = '12.5e-3'
+    for offset in range(len(number) + 1):
+        prefix = '{"name": "root", "kind": "folder", "pad": "'
+        suffix = '", "size": '
+        padding = 'x' * (JsonTokenizer.CHUNK_SIZE - offset - len(prefix) - len(suffix))
+        path = write(folder, 'boundary.json', prefix + padding + suffix + number + ', "children": [{"name": "a.txt", "kind": "file"}]}\n')
+        assert [record.full_path for record in TreeJson.records(path)] == ['a.txt'], offset
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def get_values(tokenizer: JsonTokenizer) -> List[Any]:
+    """
+    Returns the values of a flat JSON array.
+    """
+    return [value for kind, value in tokenizer.tokens() if kind in ('value', 'string')]
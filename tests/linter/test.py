@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from models.linter import Linter
+from models.parser import DiagramParser
+from typing import Union
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_linter_')
+    try:
+        check_names()
+        check_relative_names(folder)
+    finally:
+        shutil.rmtree(folder)
+    print('Linter tests passed.')
+
+
+def check_names():
+    """
+    Names no file system accepts are always reported, the ones only Windows rejects
+    only with `portable`.
+    """
+    for name, portable, expected in [
+        ('index.js', True, []),
+        ('a/b', False, ['illegal-characters']),
+        ('a\x00b', False, ['illegal-characters']),
+        ('a:b', False, []),
+        ('a:b', True, ['illegal-characters']),
+        ('con.txt', False, []),
+        ('con.txt', True, ['reserved-name']),
+        ('notes.', False, []),
+        ('notes.', True, ['reserved-name']),
+        ('.', False, ['reserved-name']),
+        ('..', False, ['reserved-name']),
+        ('..', True, ['reserved-name']),
+        ('...', False, []),
+        ('.env', True, []),
+        ('', False, ['empty-name']),
+        ('a' * 256, False, ['name-too-long']),
+    ]:
+        codes = [code.value for code, _ in Linter.check_name(name, Linter.MAX_NAME_LENGTH, portable)]
+        assert codes == expected, (name, portable, codes)
+
+
+def check_relative_names(folder: str):
+    """
+    `.` and `..` entries are reported by the linter and rejected by the parser, so
+    nothing is built outside the destination.
+    """
+    path = write(folder, 'escape.txt',
+        "app/\n"
+        "├── ../\n"
+        "│   └── escaped.txt\n"
+        "└── ./\n"
+    )
+    issues = list(Linter.lint_source(path))
+    assert [(issue.line, issue.code, issue.path) for issue in issues] == [(2, 'reserved-name', 'app/..'), (4, 'reserved-name', 'app/.')], issues
+    for mode in DiagramParser.Modes:
+        assert get_error(path, mode) == "Line 2: '..' refers to a folder instead of naming an entry.", mode
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def get_error(path: str, mode, jobs: Union[None, int] = 2) -> Union[None, str]:
+    try:
+        list(DiagramParser.records(path, mode, jobs))
+    except ValueError as error:
+        return str(error)
+    return None
@@ -0,0 +1,176 @@
+import os
+import random
+import shutil
+import marshal
+import logging
+import tempfile
+from models.parser import DiagramParser
+from models.formatter import Formatter
+from models.incremental import ParseState
+from typing import Union, List, Iterable, Callable
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_parser_')
+    try:
+        check_root_lines(folder)
+        check_parallel_chunks(folder, seed=1, diagrams=300)
+        check_parallel_fallback(folder)
+    finally:
+        shutil.rmtree(folder)
+    print('Parser tests passed.')
+
+
+def check_root_lines(folder: str):
+    """
+    A root line without a connector is the parent of the column 0 entries below it.
+    """
+    path = write(folder, 'root.txt',
+        "my-app/\n"
+        "├── src/\n"
+        "│   └── index.js\n"
+        "└── README.md\n"
+        "docs/\n"
+        "└── guide.md\n"
+    )
+    expected = ['my-app', 'my-app/src', 'my-app/src/index.js', 'my-app/README.md', 'docs', 'docs/guide.md']
+    for mode in DiagramParser.Modes:
+        assert get_paths(path, mode) == expected, mode
+    assert [node.path for node in walk(ParseState.parse(path, 'root').tree.base_dir)] == [os.path.join('\\root', *entry.split('/')) for entry in expected]
+
+    # Already indented children and plain lists don't move.
+    indented = write(folder, 'indented.txt', "my-app/\n    ├── src/\n    └── README.md\n")
+    flat = write(folder, 'flat.txt', "a/\nb/\n")
+    for mode in DiagramParser.Modes:
+        assert get_paths(indented, mode) == ['my-app', 'my-app/src', 'my-app/README.md'], mode
+        assert get_paths(flat, mode) == ['a', 'b'], mode
+
+    # A file can't hold the entries below it.
+    file_root = write(folder, 'file_root.txt', "notes.txt\n├── a\n")
+    for mode in DiagramParser.Modes:
+        assert get_error(file_root, mode) == "Line 2: 'a' is placed under the file 'notes.txt'.", mode
+
+    # fmt keeps root lines, and its output parses to the same entries.
+    formatted = ''.join(Formatter.format_lines(path))
+    assert formatted.startswith("my-app/\n├── src/\n"), formatted
+    assert get_paths(write(folder, 'formatted.txt', formatted), DiagramParser.Modes.LINES) == expected
+
+
+def check_parallel_chunks(folder: str, seed: int, diagrams: int):
+    """
+    Parsing chunks separately and stitching them gives the records, or the error, of a
+    single process parse, wherever the chunks are cut.
+    """
+    rng = random.Random(seed)
+    invalid = 0
+    for index in range(diagrams):
+        path = write(folder, 'chunks.txt', generate_diagram(rng))
+        expected = get_outcome(lambda: DiagramParser.records(path, DiagramParser.Modes.LINES))
+        invalid += isinstance(expected, str)
+        with open(path, 'rb') as file:
+            data = file.read()
+        # Every line in its own chunk, then a few random cuts.
+        cuts = [[position + 1 for position in range(len(data)) if data[position:position + 1] == b'\n']]
+        cuts += [rng.sample(range(len(data) + 1), min(len(data) + 1, count)) for count in (1, 2, 5)]
+        for positions in cuts:
+            assert get_outcome(lambda: stitch(path, data, positions)) == expected, (data, positions)
+    assert 0 < invalid < diagrams, invalid
+
+    # Through the process pool, on diagrams large enough to be split.
+    block = "├── src/\n│   ├── index.js\n│   └── utils/\n│       └── math.js\n└── README.md\n"
+    text = ''.join(f"app_{index}/\n" + block for index in range(500))
+    for name, text in [('large.txt', text), ('large_invalid.txt', text + "├── notes.txt\n│   └── a\n")]:
+        path = write(folder, name, text)
+        assert len(DiagramParser.split_ranges(path, 2 * DiagramParser.PARALLEL_CHUNKS_PER_JOB)) > 2
+        expected = get_outcome(lambda: DiagramParser.records(path, DiagramParser.Modes.LINES))
+        assert get_outcome(lambda: DiagramParser.records(path, DiagramParser.Modes.PARALLEL, 2)) == expected, name
+    assert isinstance(expected, str), expected
+
+def check_parallel_fallback(folder: str):
+    """
+    Diagrams that can't be split are parsed on a single process, with a warning.
+    """
+    write(folder, 'child.txt', "└── child.md\n")
+    for text, reason in [("├── a_{1..3}\n", "brace expressions"), ("├── @include child.txt\n", "@include entries")]:
+        path = write(folder, 'fallback.txt', text)
+        with CapturedLogs() as logs:
+            records = get_outcome(lambda: DiagramParser.records(path, DiagramParser.Modes.PARALLEL, 2))
+        assert records == get_outcome(lambda: DiagramParser.records(path, DiagramParser.Modes.LINES))
+        assert any(reason in message for message in logs.messages), logs.messages
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def get_paths(path: str, mode, jobs: Union[None, int] = 2) -> List[str]:
+    return [record.full_path.replace(os.sep, '/') for record in DiagramParser.records(path, mode, jobs)]
+
+def get_error(path: str, mode, jobs: Union[None, int] = 2) -> Union[None, str]:
+    try:
+        get_paths(path, mode, jobs)
+    except ValueError as error:
+        return str(error)
+    return None
+
+def walk(node) -> Iterable:
+    for child in node.children:
+        yield child
+        if child.is_container():
+            yield from walk(child)
+
+def stitch(path: str, data: bytes, positions: List[int]) -> Iterable:
+    """
+    Parses the chunks that end on the first newline after each position and stitches them.
+    """
+    ends = {data.find(b'\n', position) + 1 or len(data) for position in positions} | {len(data)}
+    bounds = [0] + sorted(end for end in ends if end > 0)
+    return DiagramParser.stitch_chunks(marshal.loads(DiagramParser.parse_chunk(path, start, end)) for start, end in zip(bounds, bounds[1:]) if end > start)
+
+def get_outcome(records: Callable[[], Iterable]) -> Union[str, List[tuple]]:
+    """
+    Returns the records as tuples, or the error message of an invalid diagram.
+    """
+    try:
+        return [tuple(record) for record in records()]
+    except ValueError as error:
+        return str(error)
+
+def generate_diagram(rng: random.Random) -> str:
+    """
+    Writes a random box diagram, with root lines, blank lines and invalid entries.
+    """
+    lines = []
+    depth = 0
+    for _ in range(rng.randint(1, 25)):
+        if rng.random() < 0.15:
+            lines.append(rng.choice(['app/', 'lib', 'x/', '']))
+            depth = 0
+            continue
+        depth = max(0, min(depth + rng.choice([-2, -1, 0, 0, 1, 1]), 4))
+        lines.append(rng.choice(['│   ', '    ']) * depth + rng.choice(['├── ', '└── ', '', '├──']) + rng.choice(['a/', 'b', 'c.txt', 'd/', '', 'e/']))
+    return '\n'.join(lines) + rng.choice(['', '\n'])
+
+
+class CapturedLogs(logging.Handler):
+    """
+    Collects the messages logged while it's open.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+    def __enter__(self) -> 'CapturedLogs':
+        logging.getLogger().addHandler(self)
+        return self
+
+    def __exit__(self, *_):
+        logging.getLogger().removeHandler(self)
@@ -0,0 +1,149 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from models.builder import Builder
+from models.staging import StagedBuild
+from models.trash import TrashBin
+from typing import Union, List, Dict
+
+
+
+def run():
+
+    folder = tempfile.mkdtemp(prefix='fg_test_staging_')
+    exchange = StagedBuild.exchange
+    try:
+        for label, is_exchange in [('renameat2', True), ('rename pair', False)]:
+            StagedBuild.exchange = exchange if is_exchange else staticmethod(lambda first, second: False)
+            check_swap(os.path.join(folder, label))
+            check_rollback(os.path.join(folder, label))
+        StagedBuild.exchange = exchange
+        check_stale_stages(os.path.join(folder, 'stale'))
+        check_staged_build(os.path.join(folder, 'build'))
+    finally:
+        StagedBuild.exchange = exchange
+        shutil.rmtree(folder)
+    print('Staging tests passed.')
+
+
+def check_swap(folder: str):
+    """
+    A stage takes the place of the destination, which becomes the previous tree; the
+    tree it replaced in turn goes to the trash.
+    """
+    dist = os.path.join(folder, 'dist')
+    assert StagedBuild.swap(make_stage(dist, 'v1'), dist) is None
+    assert read_tree(dist) == {'version.txt': 'v1'}
+    previous = StagedBuild.swap(make_stage(dist, 'v2'), dist)
+    assert previous == StagedBuild.get_previous(dist)
+    assert (read_tree(dist), read_tree(previous)) == ({'version.txt': 'v2'}, {'version.txt': 'v1'})
+    StagedBuild.swap(make_stage(dist, 'v3'), dist)
+    assert (read_tree(dist), read_tree(previous)) == ({'version.txt': 'v3'}, {'version.txt': 'v2'})
+    wait_for(lambda: not TrashBin.find(previous))
+    assert get_siblings(dist) == ['.dist.lock', '.dist.previous', 'dist']
+
+def check_rollback(folder: str):
+    """
+    Rolling back swaps the previous tree in, and a second rollback undoes the first.
+    """
+    dist = os.path.join(folder, 'dist')
+    StagedBuild.rollback(dist)
+    assert (read_tree(dist), read_tree(StagedBuild.get_previous(dist))) == ({'version.txt': 'v2'}, {'version.txt': 'v3'})
+    StagedBuild.rollback(dist)
+    assert (read_tree(dist), read_tree(StagedBuild.get_previous(dist))) == ({'version.txt': 'v3'}, {'version.txt': 'v2'})
+    assert get_siblings(dist) == ['.dist.lock', '.dist.previous', 'dist']
+
+    other = os.path.join(folder, 'other')
+    os.makedirs(other)
+    try:
+        StagedBuild.rollback(other)
+    except ValueError as error:
+        assert str(error) == f"There is no previous tree of {other} to roll back to.", error
+    else:
+        raise AssertionError("Rolling back without a previous tree should fail.")
+
+def check_stale_stages(folder: str):
+    """
+    Only the stages left by builds whose process is gone are cleaned up.
+    """
+    dist = os.path.join(folder, 'dist')
+    process = subprocess.Popen(['true'])
+    process.wait()
+    stale = make_stage(dist, 'stale', pid=process.pid)
+    running = make_stage(dist, 'running', pid=os.getpid())
+    unknown = StagedBuild.get_sibling(dist, f"{StagedBuild.STAGE_MARKER}unknown")
+    os.makedirs(unknown)
+    cleaner = StagedBuild.clean_stale(dist)
+    assert cleaner is not None
+    cleaner.join()
+    assert not os.path.exists(stale)
+    assert os.path.isdir(running) and os.path.isdir(unknown)
+    assert StagedBuild.clean_stale(dist) is None
+
+def check_staged_build(folder: str):
+    """
+    A staged build swaps in the complete tree, and a failed one leaves the destination
+    as it was and removes its stage.
+    """
+    os.makedirs(folder)
+    dist = os.path.join(folder, 'dist')
+    source = write(folder, 'diagram.txt', "├── src/\n│   └── index.js\n└── README.md\n")
+    args = argparse.Namespace(source=source, dist=dist, override=True, staged=True, no_cache=True)
+    Builder.handle_request(args)
+    assert read_tree(dist) == {'src/index.js': '', 'README.md': ''}
+    assert get_siblings(dist) == ['.dist.lock', 'diagram.txt', 'dist']
+
+    write(dist, 'kept.txt', 'kept')
+    Builder.handle_request(args)
+    assert read_tree(dist) == {'src/index.js': '', 'README.md': ''}
+    assert read_tree(StagedBuild.get_previous(dist)) == {'src/index.js': '', 'README.md': '', 'kept.txt': 'kept'}
+
+    write(folder, 'diagram.txt', "├── notes.txt\n│   └── a\n")
+    try:
+        Builder.handle_request(args)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Building an invalid diagram should fail.")
+    assert read_tree(dist) == {'src/index.js': '', 'README.md': ''}
+    assert get_siblings(dist) == ['.dist.lock', '.dist.previous', 'diagram.txt', 'dist']
+
+
+def make_stage(dist: str, version: str, pid: Union[None, int] = None) -> str:
+    """
+    Creates a stage holding a single file, named like the ones of a running build.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dist)), exist_ok=True)
+    stage = StagedBuild.get_sibling(dist, f"{StagedBuild.STAGE_MARKER}{time.time_ns()}-{pid or os.getpid()}")
+    os.makedirs(stage)
+    write(stage, 'version.txt', version)
+    return stage
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+def read_tree(folder: str) -> Dict[str, str]:
+    """
+    Returns the contents of every file below a folder, by relative path.
+    """
+    tree = {}
+    for parent, _, names in os.walk(folder):
+        for name in names:
+            with open(os.path.join(parent, name), 'r', encoding='utf-8') as file:
+                tree[os.path.relpath(os.path.join(parent, name), folder).replace(os.sep, '/')] = file.read()
+    return tree
+
+def get_siblings(dist: str) -> List[str]:
+    return sorted(os.listdir(os.path.dirname(os.path.abspath(dist))))
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the trash to be deleted."
+        time.sleep(0.01)